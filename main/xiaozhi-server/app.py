@@ -9,6 +9,8 @@ from core.utils.util import get_local_ip, validate_mcp_endpoint
 from core.http_server import SimpleHttpServer
 from core.websocket_server import WebSocketServer
 from core.utils.util import check_ffmpeg_installed
+from core.utils import http_client
+from core.utils.audio_assets import audio_assets
 
 TAG = __name__
 logger = setup_logging()
@@ -54,6 +56,12 @@ async def main():
         auth_key = str(uuid.uuid4().hex)
     config["server"]["auth_key"] = auth_key
 
+    # HTTP连接池参数
+    http_client.configure(config.get("http_client"))
+
+    # 预加载提示音等静态音频资源
+    audio_assets.start()
+
     # 添加 stdin 监控任务
     stdin_task = asyncio.create_task(monitor_stdin())
 
@@ -11,7 +11,6 @@ import traceback
 import subprocess
 import websockets
 from core.utils.util import (
-    extract_json_from_string,
     check_vad_update,
     check_asr_update,
     filter_sensitive_info,
@@ -27,7 +26,7 @@ from core.handle.reportHandle import report
 from core.providers.tts.default import DefaultTTS
 from concurrent.futures import ThreadPoolExecutor
 from core.utils.dialogue import Message, Dialogue
-from core.providers.asr.dto.dto import InterfaceType
+from core.providers.asr.dto.dto import InterfaceType, Utterance
 from core.handle.textHandle import handleTextMessage
 from core.providers.tools.unified_tool_handler import UnifiedToolHandler
 from plugins_func.loadplugins import auto_import_modules
@@ -39,6 +38,11 @@ from config.logger import setup_logging, build_module_string, create_connection_
 from core.utils.prompt_manager import PromptManager
 from core.utils.voiceprint_provider import VoiceprintProvider
 from core.utils import textUtils
+from core.utils.message_batcher import MessageBatcher
+from core.utils.llm_stream import LLMStreamParser
+from core.utils.llm_registry import llm_registry
+from core.utils.send_backpressure import SendBackpressure
+from core.utils.audio_pacer import get_audio_pacer
 from config.manage_api_client import DeviceNotFoundException, DeviceBindException, AgentNotFoundException, AgentVoiceNotBoundException
 from core.providers.llm.toptok.toptok import LLMProvider as ToptokLLMProvider
 
@@ -74,6 +78,11 @@ class ConnectionHandler:
         self.read_config_from_api = self.config.get("read_config_from_api", False)
 
         self.websocket = None
+        # 控制消息与音频帧合并写入
+        self.message_batcher = MessageBatcher()
+        # 客户端接收过慢时暂停TTS
+        self.send_backpressure = SendBackpressure(self)
+        self.message_batcher.on_write = self.send_backpressure.on_write
         self.headers = None
         self.device_id = None
         self.client_ip = None
@@ -109,6 +118,11 @@ class ConnectionHandler:
         self.llm = _llm
         self.memory = _memory
         self.intent = _intent
+        # 从共享注册表获取的LLM实例，连接关闭时释放
+        self.shared_llms = []
+        # 服务器级的主LLM在配置热更新时会被替换，连接持有引用直到关闭
+        if llm_registry.retain(_llm):
+            self.shared_llms.append(_llm)
 
         # 为每个连接单独管理声纹识别
         self.voiceprint_provider = None
@@ -194,6 +208,7 @@ class ConnectionHandler:
 
             # 认证通过,继续处理
             self.websocket = ws
+            self.message_batcher.websocket = ws
             self.device_id = self.headers.get("device-id", None)
 
             # 初始化活动时间戳
@@ -289,15 +304,13 @@ class ConnectionHandler:
             self.logger.bind(tag=TAG).info("收到服务器重启指令，准备执行...")
 
             # 发送确认响应
-            await self.websocket.send(
-                json.dumps(
-                    {
-                        "type": "server",
-                        "status": "success",
-                        "message": "服务器重启中...",
-                        "content": {"action": "restart"},
-                    }
-                )
+            await self.message_batcher.send_message(
+                {
+                    "type": "server",
+                    "status": "success",
+                    "message": "服务器重启中...",
+                    "content": {"action": "restart"},
+                }
             )
 
             # 异步执行重启操作
@@ -319,15 +332,13 @@ class ConnectionHandler:
 
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"重启失败: {str(e)}")
-            await self.websocket.send(
-                json.dumps(
-                    {
-                        "type": "server",
-                        "status": "error",
-                        "message": f"Restart failed: {str(e)}",
-                        "content": {"action": "restart"},
-                    }
-                )
+            await self.message_batcher.send_message(
+                {
+                    "type": "server",
+                    "status": "error",
+                    "message": f"Restart failed: {str(e)}",
+                    "content": {"action": "restart"},
+                }
             )
 
     def _initialize_components(self):
@@ -362,6 +373,7 @@ class ConnectionHandler:
             )
             if self.tts is None:
                 self.tts = self._initialize_tts()
+            self.send_backpressure.configure(self.config.get("send_backpressure"))
             # 打开语音合成通道
             asyncio.run_coroutine_threadsafe(
                 self.tts.open_audio_channels(self), self.loop
@@ -566,6 +578,7 @@ class ConnectionHandler:
             self.asr = modules["asr"]
         if modules.get("llm", None) is not None:
             self.llm = modules["llm"]
+            self.shared_llms.append(self.llm)
         if modules.get("intent", None) is not None:
             self.intent = modules["intent"]
         if modules.get("memory", None) is not None:
@@ -596,16 +609,13 @@ class ConnectionHandler:
                 "llm"
             ]
             if memory_llm_name and memory_llm_name in self.config["LLM"]:
-                # 如果配置了专用LLM，则创建独立的LLM实例
-                from core.utils import llm as llm_utils
-
+                # 如果配置了专用LLM，则使用该配置的共享LLM实例
                 memory_llm_config = self.config["LLM"][memory_llm_name]
                 memory_llm_type = memory_llm_config.get("type", memory_llm_name)
-                memory_llm = llm_utils.create_instance(
-                    memory_llm_type, memory_llm_config
-                )
+                memory_llm = llm_registry.acquire(memory_llm_name, memory_llm_config)
+                self.shared_llms.append(memory_llm)
                 self.logger.bind(tag=TAG).info(
-                    f"为记忆总结创建了专用LLM: {memory_llm_name}, 类型: {memory_llm_type}"
+                    f"为记忆总结使用专用LLM: {memory_llm_name}, 类型: {memory_llm_type}"
                 )
                 self.memory.set_llm(memory_llm)
             else:
@@ -638,16 +648,13 @@ class ConnectionHandler:
             ]
 
             if intent_llm_name and intent_llm_name in self.config["LLM"]:
-                # 如果配置了专用LLM，则创建独立的LLM实例
-                from core.utils import llm as llm_utils
-
+                # 如果配置了专用LLM，则使用该配置的共享LLM实例
                 intent_llm_config = self.config["LLM"][intent_llm_name]
                 intent_llm_type = intent_llm_config.get("type", intent_llm_name)
-                intent_llm = llm_utils.create_instance(
-                    intent_llm_type, intent_llm_config
-                )
+                intent_llm = llm_registry.acquire(intent_llm_name, intent_llm_config)
+                self.shared_llms.append(intent_llm)
                 self.logger.bind(tag=TAG).info(
-                    f"为意图识别创建了专用LLM: {intent_llm_name}, 类型: {intent_llm_type}"
+                    f"为意图识别使用专用LLM: {intent_llm_name}, 类型: {intent_llm_type}"
                 )
                 self.intent.set_llm(intent_llm)
             else:
@@ -669,166 +676,65 @@ class ConnectionHandler:
             # 更新系统prompt至上下文
             self.dialogue.update_system_message(self.prompt)
 
-    def chat(self, query, tool_call=False, depth=0):
-        self.logger.bind(tag=TAG).info(f"大模型收到用户消息: {query}")
-        self.llm_finish_task = False
-
-        if not tool_call:
-            self.dialogue.put(Message(role="user", content=query))
+    def submit_chat(self, query):
+        """开始一轮聊天：异步模式的LLM在事件循环中消费流式回复，其他LLM在线程池中执行"""
+        if getattr(self.llm, "async_mode", False):
+            future = asyncio.run_coroutine_threadsafe(self.chat_async(query), self.loop)
+            future.add_done_callback(self._log_chat_error)
+            return future
+        return self.executor.submit(self.chat, query)
 
-        # 为最顶层时新建会话ID和发送FIRST请求
-        if depth == 0:
-            self.sentence_id = str(uuid.uuid4().hex)
-            self.tts.tts_text_queue.put(
-                TTSMessageDTO(
-                    sentence_id=self.sentence_id,
-                    sentence_type=SentenceType.FIRST,
-                    content_type=ContentType.ACTION,
-                )
-            )
+    def _log_chat_error(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            self.logger.bind(tag=TAG).error(f"LLM 处理出错: {future.exception()}")
 
-        # Define intent functions
-        functions = None
-        if self.intent_type == "function_call" and hasattr(self, "func_handler"):
-            functions = self.func_handler.get_functions()
-        response_message = []
+    def chat(self, query, tool_call=False, depth=0):
+        utterance, query, functions = self._chat_begin(query, tool_call, depth)
 
         try:
             # 使用带记忆的对话
             memory_str = None
             if self.memory is not None:
                 future = asyncio.run_coroutine_threadsafe(
-                    self.memory.query_memory(query), self.loop
+                    self.memory.query_memory(self._memory_query(utterance, query)),
+                    self.loop,
                 )
                 memory_str = future.result()
+                if utterance is not None:
+                    utterance.mark("memory")
 
-            # 是 toptok 的 LLMProvider 实例
-            if isinstance(self.llm, ToptokLLMProvider):
+            use_functions, dialogue = self._llm_dialogue(memory_str, functions)
+            if use_functions:
                 # 使用支持functions的streaming接口
                 llm_responses = self.llm.response_with_functions(
-                    self.session_id,
-                    self.dialogue.get_dialogue(
-                        memory_str, self.config.get("voiceprint", {})
-                    ),
-                    self.device_id,
-                    functions=functions,
+                    self.session_id, dialogue, self.device_id, functions=functions
                 )
             else:
-                # 其他 LLMProvider 实例
-                if self.intent_type == "function_call" and functions is not None:
-                    # 使用支持functions的streaming接口
-                    llm_responses = self.llm.response_with_functions(
-                        self.session_id,
-                        self.dialogue.get_llm_dialogue_with_memory(
-                            memory_str, self.config.get("voiceprint", {})
-                        ),
-                        self.device_id,
-                        functions=functions,
-                    )
-                else:
-                    llm_responses = self.llm.response(
-                        self.session_id,
-                        self.dialogue.get_llm_dialogue_with_memory(
-                            memory_str, self.config.get("voiceprint", {})
-                        ),
-                        self.device_id,
-                    )
+                llm_responses = self.llm.response(
+                    self.session_id, dialogue, self.device_id
+                )
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"LLM 处理出错 {query}: {e}")
             return None
 
         # 处理流式响应
-        tool_call_flag = False
-        function_name = None
-        function_id = None
-        function_arguments = ""
-        content_arguments = ""
+        parser = LLMStreamParser(
+            self.intent_type == "function_call" and functions is not None
+        )
         self.client_abort = False
-        emotion_flag = True
         for response in llm_responses:
             if self.client_abort:
                 break
-            if self.intent_type == "function_call" and functions is not None:
-                content, tools_call = response
-                if "content" in response:
-                    content = response["content"]
-                    tools_call = None
-                if content is not None and len(content) > 0:
-                    content_arguments += content
-
-                if not tool_call_flag and content_arguments.startswith("<tool_call>"):
-                    # print("content_arguments", content_arguments)
-                    tool_call_flag = True
-
-                if tools_call is not None and len(tools_call) > 0:
-                    tool_call_flag = True
-                    if tools_call[0].id is not None:
-                        function_id = tools_call[0].id
-                    if tools_call[0].function.name is not None:
-                        function_name = tools_call[0].function.name
-                    if tools_call[0].function.arguments is not None:
-                        function_arguments += tools_call[0].function.arguments
-            else:
-                content = response
-
-            # 在llm回复中获取情绪表情，一轮对话只在开头获取一次
-            # if emotion_flag:
-            #     asyncio.run_coroutine_threadsafe(
-            #         textUtils.get_emotion(self, content),
-            #         self.loop,
-            #     )
-            #     emotion_flag = False
-
-            if content is not None and len(content) > 0:
-                if not tool_call_flag:
-                    response_message.append(content)
-                    self.tts.tts_text_queue.put(
-                        TTSMessageDTO(
-                            sentence_id=self.sentence_id,
-                            sentence_type=SentenceType.MIDDLE,
-                            content_type=ContentType.TEXT,
-                            content_detail=content,
-                        )
-                    )
-        # 处理function call
-        if tool_call_flag:
-            bHasError = False
-            if function_id is None:
-                a = extract_json_from_string(content_arguments)
-                if a is not None:
-                    try:
-                        content_arguments_json = json.loads(a)
-                        function_name = content_arguments_json["name"]
-                        function_arguments = json.dumps(
-                            content_arguments_json["arguments"], ensure_ascii=False
-                        )
-                        function_id = str(uuid.uuid4().hex)
-                    except Exception as e:
-                        bHasError = True
-                        response_message.append(a)
-                else:
-                    bHasError = True
-                    response_message.append(content_arguments)
-                if bHasError:
-                    self.logger.bind(tag=TAG).error(
-                        f"function call error: {content_arguments}"
-                    )
-            if not bHasError:
-                # 如需要大模型先处理一轮，添加相关处理后的日志情况
-                if len(response_message) > 0:
-                    self.dialogue.put(
-                        Message(role="assistant", content="".join(response_message))
-                    )
-                response_message.clear()
-                self.logger.bind(tag=TAG).debug(
-                    f"function_name={function_name}, function_id={function_id}, function_arguments={function_arguments}"
-                )
-                function_call_data = {
-                    "name": function_name,
-                    "id": function_id,
-                    "arguments": function_arguments,
-                }
+            content = parser.feed(response)
+            if utterance is not None and content:
+                self._log_utterance_timings(utterance)
+                utterance = None
+            self._speak_llm_content(parser, content)
 
+        # 处理function call
+        if parser.tool_call:
+            function_call_data = self._parse_function_call(parser)
+            if function_call_data is not None:
                 # 使用统一工具处理器处理所有工具调用
                 result = asyncio.run_coroutine_threadsafe(
                     self.func_handler.handle_llm_function_call(
@@ -836,12 +742,159 @@ class ConnectionHandler:
                     ),
                     self.loop,
                 ).result()
-                self._handle_function_result(result, function_call_data, depth=depth)
+                text = self._handle_function_result(result, function_call_data)
+                if text is not None:
+                    self.chat(text, tool_call=True, depth=depth + 1)
 
+        self._chat_end(parser, depth)
+        return True
+
+    async def chat_async(self, query, tool_call=False, depth=0):
+        """chat的异步版本，记忆查询、流式回复和工具调用都在事件循环中完成，不占用线程"""
+        utterance, query, functions = self._chat_begin(query, tool_call, depth)
+
+        try:
+            # 使用带记忆的对话
+            memory_str = None
+            if self.memory is not None:
+                memory_str = await self.memory.query_memory(
+                    self._memory_query(utterance, query)
+                )
+                if utterance is not None:
+                    utterance.mark("memory")
+
+            use_functions, dialogue = self._llm_dialogue(memory_str, functions)
+            if use_functions:
+                llm_responses = self.llm.response_with_functions_async(
+                    self.session_id, dialogue, self.device_id, functions=functions
+                )
+            else:
+                llm_responses = self.llm.response_async(
+                    self.session_id, dialogue, self.device_id
+                )
+        except Exception as e:
+            self.logger.bind(tag=TAG).error(f"LLM 处理出错 {query}: {e}")
+            return None
+
+        # 处理流式响应
+        parser = LLMStreamParser(
+            self.intent_type == "function_call" and functions is not None
+        )
+        self.client_abort = False
+        try:
+            async for response in llm_responses:
+                if self.client_abort:
+                    break
+                content = parser.feed(response)
+                if utterance is not None and content:
+                    self._log_utterance_timings(utterance)
+                    utterance = None
+                self._speak_llm_content(parser, content)
+        finally:
+            # 被打断提前结束时关闭流式响应，连接归还连接池
+            await llm_responses.aclose()
+
+        # 处理function call
+        if parser.tool_call:
+            function_call_data = self._parse_function_call(parser)
+            if function_call_data is not None:
+                result = await self.func_handler.handle_llm_function_call(
+                    self, function_call_data
+                )
+                text = self._handle_function_result(result, function_call_data)
+                if text is not None:
+                    await self.chat_async(text, tool_call=True, depth=depth + 1)
+
+        self._chat_end(parser, depth)
+        return True
+
+    def _chat_begin(self, query, tool_call, depth):
+        """一轮聊天开始：写入用户消息，返回(识别结果对象, 用户消息, 工具函数)"""
+        # 语音输入传入识别结果对象，对话历史中保存带说话人信息的文本
+        utterance = query if isinstance(query, Utterance) else None
+        if utterance is not None:
+            query = utterance.content
+        self.logger.bind(tag=TAG).info(f"大模型收到用户消息: {query}")
+        self.llm_finish_task = False
+
+        if not tool_call:
+            self.dialogue.put(Message(role="user", content=query))
+
+        # 为最顶层时新建会话ID和发送FIRST请求
+        if depth == 0:
+            self.sentence_id = str(uuid.uuid4().hex)
+            self.tts.tts_text_queue.put(
+                TTSMessageDTO(
+                    sentence_id=self.sentence_id,
+                    sentence_type=SentenceType.FIRST,
+                    content_type=ContentType.ACTION,
+                )
+            )
+
+        # Define intent functions
+        functions = None
+        if self.intent_type == "function_call" and hasattr(self, "func_handler"):
+            functions = self.func_handler.get_functions()
+        return utterance, query, functions
+
+    @staticmethod
+    def _memory_query(utterance, query):
+        # 记忆检索只使用说话内容
+        return utterance.text if utterance is not None else query
+
+    def _llm_dialogue(self, memory_str, functions):
+        """返回(是否使用functions接口, 发给LLM的对话)"""
+        voiceprint_config = self.config.get("voiceprint", {})
+        # 是 toptok 的 LLMProvider 实例
+        if isinstance(self.llm, ToptokLLMProvider):
+            return True, self.dialogue.get_dialogue(memory_str, voiceprint_config)
+        # 其他 LLMProvider 实例
+        return (
+            self.intent_type == "function_call" and functions is not None,
+            self.dialogue.get_llm_dialogue_with_memory(memory_str, voiceprint_config),
+        )
+
+    def _log_utterance_timings(self, utterance):
+        # 收到首个回复内容时输出这句话各阶段的耗时
+        utterance.mark("llm_first_token")
+        self.logger.bind(tag=TAG).debug(f"语音输入各阶段耗时(ms): {utterance.timings}")
+
+    def _speak_llm_content(self, parser, content):
+        # 回复文本送TTS，工具调用的内容不朗读
+        if content is not None and len(content) > 0 and not parser.tool_call:
+            self.tts.tts_text_queue.put(
+                TTSMessageDTO(
+                    sentence_id=self.sentence_id,
+                    sentence_type=SentenceType.MIDDLE,
+                    content_type=ContentType.TEXT,
+                    content_detail=content,
+                )
+            )
+
+    def _parse_function_call(self, parser):
+        """解析回复中的工具调用，失败时返回None"""
+        function_call_data = parser.function_call_data()
+        if function_call_data is None:
+            self.logger.bind(tag=TAG).error(
+                f"function call error: {parser.content_arguments}"
+            )
+            return None
+        # 如需要大模型先处理一轮，添加相关处理后的日志情况
+        if len(parser.response_message) > 0:
+            self.dialogue.put(
+                Message(role="assistant", content="".join(parser.response_message))
+            )
+        parser.response_message.clear()
+        self.logger.bind(tag=TAG).debug(
+            f"function_name={function_call_data['name']}, function_id={function_call_data['id']}, function_arguments={function_call_data['arguments']}"
+        )
+        return function_call_data
+
+    def _chat_end(self, parser, depth):
         # 存储对话内容
-        if len(response_message) > 0:
+        if len(parser.response_message) > 0:
             self.dialogue.put(
-                Message(role="assistant", content="".join(response_message))
+                Message(role="assistant", content="".join(parser.response_message))
             )
         if depth == 0:
             self.tts.tts_text_queue.put(
@@ -859,9 +912,8 @@ class ConnectionHandler:
             )
         )
 
-        return True
-
-    def _handle_function_result(self, result, function_call_data, depth):
+    def _handle_function_result(self, result, function_call_data):
+        """处理工具调用结果，需要再请求llm生成回复时返回工具结果文本"""
         if result.action == Action.RESPONSE:  # 直接回复前端
             text = result.response
             self.tts.tts_one_sentence(self, ContentType.TEXT, content_detail=text)
@@ -898,13 +950,12 @@ class ConnectionHandler:
                         content=text,
                     )
                 )
-                self.chat(text, tool_call=True, depth=depth + 1)
+                return text
         elif result.action == Action.NOTFOUND or result.action == Action.ERROR:
             text = result.response if result.response else result.result
             self.tts.tts_one_sentence(self, ContentType.TEXT, content_detail=text)
             self.dialogue.put(Message(role="assistant", content=text))
-        else:
-            pass
+        return None
 
     def _report_worker(self):
         """聊天记录上报工作线程"""
@@ -946,6 +997,12 @@ class ConnectionHandler:
         self.client_is_speaking = False
         self.logger.bind(tag=TAG).debug(f"清除服务端讲话状态")
 
+    def release_shared_llms(self):
+        """释放持有的共享LLM实例，可重复调用"""
+        shared_llms, self.shared_llms = self.shared_llms, []
+        for provider in shared_llms:
+            llm_registry.release(provider)
+
     async def close(self, ws=None):
         """资源清理方法"""
         try:
@@ -1013,6 +1070,16 @@ class ConnectionHandler:
             if self.tts:
                 await self.tts.close()
 
+            # 释放共享的LLM实例
+            self.release_shared_llms()
+
+            # 记录本次连接的音频发送统计
+            self.logger.bind(tag=TAG).info(
+                f"连接发送统计: 播放{get_audio_pacer().stats(self).as_dict()}, "
+                f"写入{self.message_batcher.stats()}, "
+                f"背压{self.send_backpressure.stats()}"
+            )
+
             # 最后关闭线程池（避免阻塞）
             if self.executor:
                 try:
@@ -1,4 +1,4 @@
-import json
+from core.handle.sendAudioHandle import tts_message
 
 TAG = __name__
 
@@ -9,8 +9,6 @@ async def handleAbortMessage(conn):
     conn.client_abort = True
     conn.clear_queues()
     # 打断客户端说话状态
-    await conn.websocket.send(
-        json.dumps({"type": "tts", "state": "stop", "session_id": conn.session_id})
-    )
+    await conn.message_batcher.send_message(tts_message(conn, "stop"))
     conn.clearSpeakStatus()
     conn.logger.bind(tag=TAG).info("Abort message received-end")
@@ -3,7 +3,7 @@ import json
 import random
 import asyncio
 from core.utils.dialogue import Message
-from core.utils.util import audio_to_data
+from core.utils.audio_assets import audio_assets
 from core.handle.sendAudioHandle import sendAudioMessage, send_stt_message
 from core.utils.util import remove_punctuation_and_length, opus_datas_to_wav_bytes
 from core.providers.tts.dto.dto import ContentType, SentenceType
@@ -48,7 +48,7 @@ async def handleHelloMessage(conn, msg_json):
             # 发送mcp消息，获取tools列表
             asyncio.create_task(send_mcp_tools_list_request(conn))
 
-    await conn.websocket.send(json.dumps(conn.welcome_msg))
+    await conn.message_batcher.send_message(conn.welcome_msg)
 
 
 async def checkWakeupWords(conn, text):
@@ -83,7 +83,7 @@ async def checkWakeupWords(conn, text):
 
     # 播放唤醒词回复
     conn.client_abort = False
-    opus_packets, _ = audio_to_data(response.get("file_path"))
+    opus_packets = audio_assets.get(response.get("file_path"))
 
     conn.logger.bind(tag=TAG).info(f"播放唤醒词回复: {response.get('text')}")
     await sendAudioMessage(conn, SentenceType.FIRST, opus_packets, response.get("text"))
@@ -6,6 +6,7 @@ from core.handle.helloHandle import checkWakeupWords
 from core.utils.util import remove_punctuation_and_length
 from core.providers.tts.dto.dto import ContentType
 from core.utils.dialogue import Message
+from core.providers.asr.dto.dto import Utterance
 from plugins_func.register import Action, ActionResponse
 from core.providers.tts.dto.dto import TTSMessageDTO, SentenceType
 
@@ -13,15 +14,11 @@ TAG = __name__
 
 
 async def handle_user_intent(conn, text):
-    # 预处理输入文本，处理可能的JSON格式
-    try:
-        if text.strip().startswith('{') and text.strip().endswith('}'):
-            parsed_data = json.loads(text)
-            if isinstance(parsed_data, dict) and "content" in parsed_data:
-                text = parsed_data["content"]  # 提取content用于意图分析
-                conn.current_speaker = parsed_data.get("speaker")  # 保留说话人信息
-    except (json.JSONDecodeError, TypeError):
-        pass
+    # 意图分析只使用说话内容，说话人信息保留在连接对象上
+    utterance = Utterance.of(text)
+    text = utterance.text
+    if utterance.speaker:
+        conn.current_speaker = utterance.speaker
 
     # 检查是否有明确的退出命令
     filtered_text = remove_punctuation_and_length(text)[1]
@@ -4,9 +4,9 @@ from core.utils.output_counter import check_device_output_limit
 from core.handle.abortHandle import handleAbortMessage
 import time
 import asyncio
-import json
 from core.handle.sendAudioHandle import SentenceType
-from core.utils.util import audio_to_data
+from core.providers.asr.dto.dto import Utterance
+from core.utils.audio_assets import audio_assets
 
 TAG = __name__
 
@@ -26,6 +26,9 @@ async def handleAudioMessage(conn, audio):
     if have_voice:
         if conn.client_is_speaking:
             await handleAbortMessage(conn)
+        # 用户开始说话，提前建立流式TTS的上游连接
+        if conn.tts is not None:
+            conn.tts.prewarm()
     # 设备长时间空闲检测，用于say goodbye
     await no_voice_close_connect(conn, have_voice)
     # 接收音频
@@ -39,30 +42,13 @@ async def resume_vad_detection(conn):
 
 
 async def startToChat(conn, text):
-    # 检查输入是否是JSON格式（包含说话人信息）
-    speaker_name = None
-    actual_text = text
-    
-    try:
-        # 尝试解析JSON格式的输入
-        if text.strip().startswith('{') and text.strip().endswith('}'):
-            data = json.loads(text)
-            if 'speaker' in data and 'content' in data:
-                speaker_name = data['speaker']
-                actual_text = data['content']
-                conn.logger.bind(tag=TAG).info(f"解析到说话人信息: {speaker_name}")
-                
-                # 直接使用JSON格式的文本，不解析
-                actual_text = text
-    except (json.JSONDecodeError, KeyError):
-        # 如果解析失败，继续使用原始文本
-        pass
-    
+    # ASR传入识别结果对象，其他调用方传入字符串（可能是包含说话人信息的JSON）
+    utterance = Utterance.of(text)
+
     # 保存说话人信息到连接对象
-    if speaker_name:
-        conn.current_speaker = speaker_name
-    else:
-        conn.current_speaker = None
+    conn.current_speaker = utterance.speaker
+    if utterance.speaker:
+        conn.logger.bind(tag=TAG).info(f"解析到说话人信息: {utterance.speaker}")
 
     if conn.need_bind:
         await check_bind_device(conn)
@@ -78,16 +64,17 @@ async def startToChat(conn, text):
     if conn.client_is_speaking:
         await handleAbortMessage(conn)
 
-    # 首先进行意图分析，使用实际文本内容
-    intent_handled = await handle_user_intent(conn, actual_text)
+    # 首先进行意图分析
+    intent_handled = await handle_user_intent(conn, utterance)
+    utterance.mark("intent")
 
     if intent_handled:
         # 如果意图已被处理，不再进行聊天
         return
 
-    # 意图未被处理，继续常规聊天流程，使用实际文本内容
-    await send_stt_message(conn, actual_text)
-    conn.executor.submit(conn.chat, actual_text)
+    # 意图未被处理，继续常规聊天流程
+    await send_stt_message(conn, utterance)
+    conn.submit_chat(utterance)
 
 
 async def no_voice_close_connect(conn, have_voice):
@@ -121,7 +108,7 @@ async def max_out_size(conn):
     text = "不好意思，我现在有点事情要忙，明天这个时候我们再聊，约好了哦！明天不见不散，拜拜！"
     await send_stt_message(conn, text)
     file_path = "config/assets/max_output_size.wav"
-    opus_packets, _ = audio_to_data(file_path)
+    opus_packets = audio_assets.get(file_path)
     conn.tts.tts_audio_queue.put((SentenceType.LAST, opus_packets, text))
     conn.close_after_chat = True
 
@@ -140,7 +127,7 @@ async def check_bind_device(conn):
 
         # 播放提示音
         music_path = "config/assets/bind_code.wav"
-        opus_packets, _ = audio_to_data(music_path)
+        opus_packets = audio_assets.get(music_path)
         conn.tts.tts_audio_queue.put((SentenceType.FIRST, opus_packets, text))
 
         # 逐个播放数字
@@ -148,7 +135,7 @@ async def check_bind_device(conn):
             try:
                 digit = conn.bind_code[i]
                 num_path = f"config/assets/bind_code/{digit}.wav"
-                num_packets, _ = audio_to_data(num_path)
+                num_packets = audio_assets.get(num_path)
                 conn.tts.tts_audio_queue.put((SentenceType.MIDDLE, num_packets, None))
             except Exception as e:
                 conn.logger.bind(tag=TAG).error(f"播放数字音频失败: {e}")
@@ -167,5 +154,5 @@ async def check_bind_device(conn):
             music_path = "config/assets/bind_not_found.wav"
 
         await send_stt_message(conn, text)
-        opus_packets, _ = audio_to_data(music_path)
+        opus_packets = audio_assets.get(music_path)
         conn.tts.tts_audio_queue.put((SentenceType.LAST, opus_packets, text))
@@ -1,8 +1,11 @@
-import json
-import asyncio
-import time
+from itertools import accumulate
 from core.providers.tts.dto.dto import SentenceType
+from core.providers.asr.dto.dto import Utterance
 from core.utils import textUtils
+from core.utils.audio_assets import audio_assets
+from core.utils.audio_pacer import get_audio_pacer
+from core.utils.message_batcher import encode_message
+from core.utils.text_normalizer import NormalizedText
 from core.utils.util import get_string_no_punctuation_or_emoji, analyze_emotion
 from loguru import logger
 import re
@@ -35,21 +38,24 @@ emoji_map = {
 
 
 async def sendAudioMessage(conn, sentenceType, audios, text):
-    # 去除括号中的语气词
-    text = await handle_text(text)
-    # 发送句子开始消息
+    if isinstance(text, NormalizedText):
+        # 分句时已经得到显示文本
+        text = text.display
+    else:
+        # 去除括号中的语气词
+        text = await handle_text(text)
+    batcher = conn.message_batcher
+    # 句子的控制消息先排队，与第一批音频帧一起发送
     if text is not None:
         emotion = analyze_emotion(text)
         emoji = emoji_map.get(emotion, "happy")  # 默认使用笑脸
-        await conn.websocket.send(
-            json.dumps(
-                {
-                    "type": "llm",
-                    "text": emoji,
-                    "emotion": emotion,
-                    "session_id": conn.session_id,
-                }
-            )
+        batcher.queue(
+            {
+                "type": "llm",
+                "text": emoji,
+                "emotion": emotion,
+                "session_id": conn.session_id,
+            }
         )
     conn.logger.bind(tag=TAG).info(f"发送音频消息: {sentenceType}, {text}")
 
@@ -59,11 +65,11 @@ async def sendAudioMessage(conn, sentenceType, audios, text):
         conn.tts.tts_audio_first_sentence = False
         pre_buffer = True
 
-    await send_tts_message(conn, "sentence_start", text)
+    batcher.queue(tts_message(conn, "sentence_start", text))
 
     await sendAudio(conn, audios, pre_buffer)
 
-    await send_tts_message(conn, "sentence_end", text)
+    batcher.queue(tts_message(conn, "sentence_end", text))
 
     # 发送结束消息（如果是最后一个文本）
     if conn.llm_finish_task and sentenceType == SentenceType.LAST:
@@ -71,51 +77,34 @@ async def sendAudioMessage(conn, sentenceType, audios, text):
         conn.client_is_speaking = False
         if conn.close_after_chat:
             await conn.close()
+    else:
+        await batcher.flush()
 
 
 # 播放音频
 async def sendAudio(conn, audios, pre_buffer=True):
     if audios is None or len(audios) == 0:
         return
-    # 流控参数优化
-    frame_duration = 60  # 帧时长（毫秒），匹配 Opus 编码
-    start_time = time.perf_counter()
-    play_position = 0
-
-    # 仅当第一句话时执行预缓冲
-    if pre_buffer:
-        pre_buffer_frames = min(3, len(audios))
-        for i in range(pre_buffer_frames):
-            await conn.websocket.send(audios[i])
-        remaining_audios = audios[pre_buffer_frames:]
-    else:
-        remaining_audios = audios
-
-    # 播放剩余音频帧
-    for opus_packet in remaining_audios:
-        if conn.client_abort:
-            break
+    # 由全局节拍器按帧时长匀速发送，设备端缓冲按链路抖动自适应补足
+    # pre_buffer为True表示一轮回复的第一句话，不接续之前的缓冲
+    await get_audio_pacer().play(conn, audios, first=pre_buffer)
 
-        # 重置没有声音的状态
-        conn.last_activity_time = time.time() * 1000
 
-        # 计算预期发送时间
-        expected_time = start_time + (play_position / 1000)
-        current_time = time.perf_counter()
-        delay = expected_time - current_time
-        if delay > 0:
-            await asyncio.sleep(delay)
-
-        await conn.websocket.send(opus_packet)
-
-        play_position += frame_duration
+def tts_message(conn, state, text=None):
+    """序列化TTS状态消息，不带文本的消息每个会话只序列化一次"""
+    if text is None:
+        return conn.message_batcher.cached(
+            ("tts", state, conn.session_id),
+            lambda: {"type": "tts", "state": state, "session_id": conn.session_id},
+        )
+    return encode_message(
+        {"type": "tts", "state": state, "session_id": conn.session_id, "text": text}
+    )
 
 
 async def send_tts_message(conn, state, text=None):
     """发送 TTS 状态消息"""
-    message = {"type": "tts", "state": state, "session_id": conn.session_id}
-    if text is not None:
-        message["text"] = text
+    message = tts_message(conn, state, text)
 
     # TTS播放结束
     if state == "stop":
@@ -125,122 +114,115 @@ async def send_tts_message(conn, state, text=None):
             stop_tts_notify_voice = conn.config.get(
                 "stop_tts_notify_voice", "config/assets/tts_notify.mp3"
             )
-            audios, _ = conn.tts.audio_to_opus_data(stop_tts_notify_voice)
+            audios = audio_assets.get(stop_tts_notify_voice)
             await sendAudio(conn, audios)
         # 清除服务端讲话状态
         conn.clearSpeakStatus()
 
-    # 发送消息到客户端
-    await conn.websocket.send(json.dumps(message))
+    # 发送消息到客户端（连同排队中的消息）
+    await conn.message_batcher.send_message(message)
 
 
 async def send_stt_message(conn, text):
+    """发送 STT 状态消息，text是识别结果对象或字符串"""
+    utterance = Utterance.of(text)
     end_prompt_str = conn.config.get("end_prompt", {}).get("prompt")
-    if end_prompt_str and end_prompt_str == text:
+    if end_prompt_str and end_prompt_str == utterance.content:
         await send_tts_message(conn, "start")
         return
 
-    """发送 STT 状态消息"""
-
-    # 解析JSON格式，提取实际的用户说话内容
-    display_text = text
-    try:
-        # 尝试解析JSON格式
-        if text.strip().startswith('{') and text.strip().endswith('}'):
-            parsed_data = json.loads(text)
-            if isinstance(parsed_data, dict) and "content" in parsed_data:
-                # 如果是包含说话人信息的JSON格式，只显示content部分
-                display_text = parsed_data["content"]
-                # 保存说话人信息到conn对象
-                if "speaker" in parsed_data:
-                    conn.current_speaker = parsed_data["speaker"]
-    except (json.JSONDecodeError, TypeError):
-        # 如果不是JSON格式，直接使用原始文本
-        display_text = text
-    stt_text = textUtils.get_string_no_punctuation_or_emoji(display_text)
-    await conn.websocket.send(
-        json.dumps({"type": "stt", "text": stt_text, "session_id": conn.session_id})
+    # 有说话人信息时只显示说话内容
+    if utterance.speaker:
+        conn.current_speaker = utterance.speaker
+    stt_text = textUtils.get_string_no_punctuation_or_emoji(utterance.text)
+    # 与随后的tts start消息一起发送
+    conn.message_batcher.queue(
+        {"type": "stt", "text": stt_text, "session_id": conn.session_id}
     )
     conn.client_is_speaking = True
     await send_tts_message(conn, "start")
 
 
-"""
-移除括号中的语气词
-"""
-async def handle_text(text):
-    if not text or len(text) == 0:
+# 中文括号及其内容；第二个分支匹配文本末尾（包括末尾换行符）
+_PARENTHESES_PATTERN = re.compile(r"（[^）]*）|$[^)]*$")
+_QUOTE_PAIRS = {'"': '"', "“": "”", "‘": "’"}
+_QUOTE_PATTERN = re.compile(r"[\"“‘”’]")
+_SYMBOL_PATTERN = re.compile(r"[‘’\"()（）\u2026.]")
+
+
+def clean_sentence_text(text):
+    """
+    移除括号中的语气词，删除孤立的引号和残留符号，保留成对引号和句中的省略号
+    只扫描引号和符号所在的位置，耗时与句子长度成线性关系
+    """
+    if not text:
         return text
 
-    # 1. 删除括号及其内容：包括中文括号（）和英文括号()
-    text = re.sub(r'（[^）]*）|$[^)]*$', '', text)
+    # 1. 删除括号及其内容
+    text = _PARENTHESES_PATTERN.sub("", text)
 
-    # 2. 使用栈检测成对引号，标记孤立引号为待删除
+    # 2. 用栈配对引号，孤立的引号待删除；英文双引号只会入栈，因此总是被删除
     stack = []
-    chars = list(text)
-    quote_pairs = {'"': '"', '“': '”', '‘': '’'}
-    quote_positions = {}  # 记录每一对引号的位置
-
-    for i, ch in enumerate(chars):
-        if ch in quote_pairs:
-            stack.append((i, ch))  # 左引号入栈
-        elif ch in quote_pairs.values():
-            if stack and quote_pairs.get(stack[-1][1]) == ch:
-                left_idx, left_quote = stack.pop()
-                quote_positions[left_idx] = i  # 记录成对引号范围
-                quote_positions[i] = left_idx
-            else:
-                # 孤立右引号，标记删除
-                chars[i] = '\x00DELETE\x00'
-
-    # 标记未闭合的左引号为待删除
-    for pos, _ in stack:
-        chars[pos] = '\x00DELETE\x00'
-
-    # 构建新字符串，暂时不处理引号
-    temp_text = ''.join([c for c in chars if c != '\x00DELETE\x00'])
-
-    # 3. 清理残留符号，但保留成对引号和非首尾省略号
-    cleaned_parts = []
-    i = 0
-    while i < len(temp_text):
-        matched = False
-        # 检查是否在成对引号内
-        in_quotes = any(start <= i <= end for start, end in quote_positions.items())
-
-        # 如果当前位置是符号，并且不在引号中，则考虑删除
-        if not in_quotes:
-            # 匹配单独的标点符号（不包括成对引号中的）
-            symbol_match = re.match(r'[‘’"()（）\u2026.]', temp_text[i:])
-            if symbol_match:
-                char = symbol_match.group(0)
-                # 判断是否是省略号的一部分
-                ellipsis_match = re.match(r'(…|\.\.\.|\u2026)', temp_text[i:])
-                if ellipsis_match:
-                    ellipsis = ellipsis_match.group(0)
-                    # 判断是否处于文本中间（不是开头或结尾）
-                    start_pos = i
-                    end_pos = i + len(ellipsis)
-                    if 0 < start_pos or end_pos < len(temp_text):
-                        # 保留省略号
-                        cleaned_parts.append(ellipsis)
-                        i += len(ellipsis)
-                        matched = True
-                    else:
-                        # 首或尾的省略号，删除
-                        i += len(ellipsis)
-                        matched = True
-                else:
-                    # 其他符号，删除
-                    i += 1
-                    matched = True
-
-        if not matched:
-            cleaned_parts.append(temp_text[i])
-            i += 1
-
-    cleaned_text = ''.join(cleaned_parts)
+    deleted = []
+    # 成对引号覆盖的区间（按删除孤立引号之前的位置），用差分数组记录
+    coverage = None
+    for match in _QUOTE_PATTERN.finditer(text):
+        i = match.start()
+        ch = text[i]
+        if ch in _QUOTE_PAIRS:
+            stack.append((i, ch))
+        elif stack and _QUOTE_PAIRS[stack[-1][1]] == ch:
+            left_idx, _ = stack.pop()
+            if coverage is None:
+                coverage = [0] * (len(text) + 1)
+            coverage[left_idx] += 1
+            coverage[i + 1] -= 1
+        else:
+            deleted.append(i)
+    deleted.extend(pos for pos, _ in stack)
+
+    if deleted:
+        deleted.sort()
+        pieces = []
+        last = 0
+        for pos in deleted:
+            pieces.append(text[last:pos])
+            last = pos + 1
+        pieces.append(text[last:])
+        temp_text = "".join(pieces)
+    else:
+        temp_text = text
+    # 与原实现一致：用删除前的引号位置判断删除后的字符是否在引号内
+    in_quotes = list(accumulate(coverage)) if coverage is not None else None
+
+    # 3. 清理不在引号内的符号，省略号只有在占满整句时才删除
+    length = len(temp_text)
+    parts = []
+    last = 0
+    skip_until = 0
+    for match in _SYMBOL_PATTERN.finditer(temp_text):
+        i = match.start()
+        if i < skip_until or (in_quotes is not None and in_quotes[i] > 0):
+            continue
+        ch = temp_text[i]
+        if ch == "\u2026":
+            ellipsis_len = 1
+        elif ch == "." and temp_text.startswith("...", i):
+            ellipsis_len = 3
+        else:
+            parts.append(temp_text[last:i])
+            last = i + 1
+            continue
+        skip_until = i + ellipsis_len
+        if i == 0 and skip_until == length:
+            parts.append(temp_text[last:i])
+            last = skip_until
+    parts.append(temp_text[last:])
 
     # 4. 去除首尾空白字符
-    final_text = cleaned_text.strip()
-    return final_text
\ No newline at end of file
+    return "".join(parts).strip()
+
+
+async def handle_text(text):
+    """移除括号中的语气词"""
+    return clean_sentence_text(text)
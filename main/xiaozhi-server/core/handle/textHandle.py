@@ -18,7 +18,7 @@ async def handleTextMessage(conn, message):
         msg_json = json.loads(message)
         if isinstance(msg_json, int):
             conn.logger.bind(tag=TAG).info(f"收到文本消息：{message}")
-            await conn.websocket.send(message)
+            await conn.message_batcher.send_message(message)
             return
         if msg_json["type"] == "hello":
             conn.logger.bind(tag=TAG).info(f"收到hello消息：{message}")
@@ -95,14 +95,12 @@ async def handleTextMessage(conn, message):
             secret = conn.config["manager-api"].get("secret", "")
             # 如果secret不匹配，则返回
             if post_secret != secret:
-                await conn.websocket.send(
-                    json.dumps(
-                        {
-                            "type": "server",
-                            "status": "error",
-                            "message": "服务器密钥验证失败",
-                        }
-                    )
+                await conn.message_batcher.send_message(
+                    {
+                        "type": "server",
+                        "status": "error",
+                        "message": "服务器密钥验证失败",
+                    }
                 )
                 return
             # 动态更新配置
@@ -110,53 +108,45 @@ async def handleTextMessage(conn, message):
                 try:
                     # 更新WebSocketServer的配置
                     if not conn.server:
-                        await conn.websocket.send(
-                            json.dumps(
-                                {
-                                    "type": "server",
-                                    "status": "error",
-                                    "message": "无法获取服务器实例",
-                                    "content": {"action": "update_config"},
-                                }
-                            )
+                        await conn.message_batcher.send_message(
+                            {
+                                "type": "server",
+                                "status": "error",
+                                "message": "无法获取服务器实例",
+                                "content": {"action": "update_config"},
+                            }
                         )
                         return
 
                     if not await conn.server.update_config():
-                        await conn.websocket.send(
-                            json.dumps(
-                                {
-                                    "type": "server",
-                                    "status": "error",
-                                    "message": "更新服务器配置失败",
-                                    "content": {"action": "update_config"},
-                                }
-                            )
-                        )
-                        return
-
-                    # 发送成功响应
-                    await conn.websocket.send(
-                        json.dumps(
+                        await conn.message_batcher.send_message(
                             {
                                 "type": "server",
-                                "status": "success",
-                                "message": "配置更新成功",
+                                "status": "error",
+                                "message": "更新服务器配置失败",
                                 "content": {"action": "update_config"},
                             }
                         )
+                        return
+
+                    # 发送成功响应
+                    await conn.message_batcher.send_message(
+                        {
+                            "type": "server",
+                            "status": "success",
+                            "message": "配置更新成功",
+                            "content": {"action": "update_config"},
+                        }
                     )
                 except Exception as e:
                     conn.logger.bind(tag=TAG).error(f"更新配置失败: {str(e)}")
-                    await conn.websocket.send(
-                        json.dumps(
-                            {
-                                "type": "server",
-                                "status": "error",
-                                "message": f"更新配置失败: {str(e)}",
-                                "content": {"action": "update_config"},
-                            }
-                        )
+                    await conn.message_batcher.send_message(
+                        {
+                            "type": "server",
+                            "status": "error",
+                            "message": f"更新配置失败: {str(e)}",
+                            "content": {"action": "update_config"},
+                        }
                     )
             # 重启服务器
             elif msg_json["action"] == "restart":
@@ -164,4 +154,4 @@ async def handleTextMessage(conn, message):
         else:
             conn.logger.bind(tag=TAG).error(f"收到未知类型消息：{message}")
     except json.JSONDecodeError:
-        await conn.websocket.send(message)
+        await conn.message_batcher.send_message(message)
@@ -1,6 +1,4 @@
-import http.client
 import json
-import asyncio
 from typing import Optional, Tuple, List
 import os
 import uuid
@@ -14,6 +12,7 @@ from datetime import datetime
 from config.logger import setup_logging
 from core.providers.asr.base import ASRProviderBase
 from core.providers.asr.dto.dto import InterfaceType
+from core.utils import http_client
 
 TAG = __name__
 logger = setup_logging()
@@ -100,7 +99,8 @@ class ASRProvider(ASRProviderBase):
         self.host = "nls-gateway-cn-shanghai.aliyuncs.com"
         self.base_url = f"https://{self.host}/stream/v1/asr"
         self.sample_rate = 16000
-        self.format = "wav"
+        # 上传格式：opus（opus数据包直接封装为ogg，体积小）或pcm
+        self.format = str(config.get("upload_format", "opus")).lower()
         self.output_dir = config.get("output_dir", "./audio_output")
         self.delete_audio_file = delete_audio_file
 
@@ -164,32 +164,19 @@ class ASRProvider(ASRProviderBase):
         request += "&enable_voice_detection=false"
         return request
 
-    async def _send_request(self, pcm_data: bytes) -> Optional[str]:
+    async def _send_request(self, audio_data: bytes) -> Optional[str]:
         """发送请求到阿里云ASR服务"""
         try:
             # 设置HTTP头
             headers = {
                 "X-NLS-Token": self.token,
                 "Content-type": "application/octet-stream",
-                "Content-Length": str(len(pcm_data)),
             }
 
-            # 创建连接并发送请求
-            conn = http.client.HTTPSConnection(self.host)
-            request_url = self._construct_request_url()
-
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None,
-                lambda: conn.request(
-                    method="POST", url=request_url, body=pcm_data, headers=headers
-                ),
+            response = await http_client.request(
+                "POST", self._construct_request_url(), headers=headers, data=audio_data
             )
-
-            # 获取响应
-            response = await loop.run_in_executor(None, conn.getresponse)
-            body = await loop.run_in_executor(None, response.read)
-            conn.close()
+            body = response.content
 
             # 解析响应
             try:
@@ -222,12 +209,13 @@ class ASRProvider(ASRProviderBase):
 
         file_path = None
         try:
-            # 解码Opus为PCM
-            if audio_format == "pcm":
-                pcm_data = opus_data
-            else:
-                pcm_data = self.decode_opus(opus_data)
-            combined_pcm_data = b"".join(pcm_data)
+            pcm_data = None
+            if self.format == "pcm" or not self.delete_audio_file:
+                # 解码Opus为PCM
+                if audio_format == "pcm":
+                    pcm_data = opus_data
+                else:
+                    pcm_data = self.decode_opus(opus_data)
 
             # 判断是否保存为WAV文件
             if self.delete_audio_file:
@@ -235,8 +223,13 @@ class ASRProvider(ASRProviderBase):
             else:
                 file_path = self.save_audio_to_file(pcm_data, session_id)
 
+            if self.format == "pcm":
+                audio_bytes = b"".join(pcm_data)
+            else:
+                audio_bytes = self.encode_ogg_opus(opus_data, audio_format)
+
             # 发送请求并获取文本
-            text = await self._send_request(combined_pcm_data)
+            text = await self._send_request(audio_bytes)
 
             if text:
                 return text, file_path
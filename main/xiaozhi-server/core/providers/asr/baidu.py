@@ -1,8 +1,9 @@
 import time
 import os
+import uuid
 from typing import Optional, Tuple, List
-from aip import AipSpeech
 from core.providers.asr.base import ASRProviderBase
+from core.utils import http_client
 from config.logger import setup_logging
 from core.providers.asr.dto.dto import InterfaceType
 
@@ -11,6 +12,9 @@ logger = setup_logging()
 
 
 class ASRProvider(ASRProviderBase):
+    TOKEN_URL = "https://aip.baidubce.com/oauth/2.0/token"
+    API_URL = "https://vop.baidu.com/server_api"
+
     def __init__(self, config: dict, delete_audio_file: bool = True):
         super().__init__()
         self.interface_type = InterfaceType.NON_STREAM
@@ -24,11 +28,33 @@ class ASRProvider(ASRProviderBase):
         self.output_dir = config.get("output_dir")
         self.delete_audio_file = delete_audio_file
 
-        self.client = AipSpeech(str(self.app_id), self.api_key, self.secret_key)
+        self.cuid = f"xiaozhi_{uuid.uuid4().hex[:16]}"
+        self.token = None
+        self.expire_time = 0
 
         # 确保输出目录存在
         os.makedirs(self.output_dir, exist_ok=True)
 
+    async def _get_token(self) -> str:
+        """获取access_token，过期前一小时刷新"""
+        if self.token and time.time() < self.expire_time:
+            return self.token
+        response = await http_client.request(
+            "POST",
+            self.TOKEN_URL,
+            params={
+                "grant_type": "client_credentials",
+                "client_id": self.api_key,
+                "client_secret": self.secret_key,
+            },
+        )
+        result = response.json()
+        if "access_token" not in result:
+            raise Exception(f"获取百度access_token失败: {result}")
+        self.token = result["access_token"]
+        self.expire_time = time.time() + int(result.get("expires_in", 86400)) - 3600
+        return self.token
+
     async def speech_to_text(
         self, opus_data: List[bytes], session_id: str, audio_format="opus"
     ) -> Tuple[Optional[str], Optional[str]]:
@@ -58,15 +84,19 @@ class ASRProvider(ASRProviderBase):
                 self.save_audio_to_file(pcm_data, session_id)
 
             start_time = time.time()
-            # 识别本地文件
-            result = self.client.asr(
-                combined_pcm_data,
-                "pcm",
-                16000,
-                {
+            # 百度短语音识别不支持opus，采用raw方式直接上传PCM，免去base64编码
+            response = await http_client.request(
+                "POST",
+                self.API_URL,
+                params={
                     "dev_pid": str(self.dev_pid),
+                    "cuid": self.cuid,
+                    "token": await self._get_token(),
                 },
+                headers={"Content-Type": "audio/pcm;rate=16000"},
+                data=combined_pcm_data,
             )
+            result = response.json()
 
             if result and result["err_no"] == 0:
                 logger.bind(tag=TAG).debug(
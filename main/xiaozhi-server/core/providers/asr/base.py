@@ -6,7 +6,6 @@ import asyncio
 import traceback
 import threading
 import opuslib_next
-import json
 import io
 import time
 import concurrent.futures
@@ -15,7 +14,10 @@ from config.logger import setup_logging
 from typing import Optional, Tuple, List, Dict, Any
 from core.handle.receiveAudioHandle import startToChat
 from core.handle.reportHandle import enqueue_asr_report
+from core.providers.asr.dto.dto import Utterance
 from core.utils.util import remove_punctuation_and_length
+from core.utils.ogg_opus import opus_packets_to_ogg
+from core.utils.opus_encoder_utils import opus_encoder_pool, split_pcm_frames
 from core.handle.receiveAudioHandle import handleAudioMessage
 
 TAG = __name__
@@ -92,6 +94,9 @@ class ASRProviderBase(ABC):
                 wav_data = self._pcm_to_wav(combined_pcm_data)
             
             
+            # 各任务耗时，写入识别结果
+            timings = {}
+
             # 定义ASR任务
             def run_asr():
                 start_time = time.monotonic()
@@ -104,6 +109,7 @@ class ASRProviderBase(ABC):
                         )
                         end_time = time.monotonic()
                         logger.bind(tag=TAG).info(f"ASR耗时: {end_time - start_time:.3f}s")
+                        timings["asr"] = end_time - start_time
                         return result
                     finally:
                         loop.close()
@@ -116,6 +122,7 @@ class ASRProviderBase(ABC):
             def run_voiceprint():
                 if not wav_data:
                     return None
+                start_time = time.monotonic()
                 try:
                     loop = asyncio.new_event_loop()
                     asyncio.set_event_loop(loop)
@@ -124,6 +131,7 @@ class ASRProviderBase(ABC):
                         result = loop.run_until_complete(
                             conn.voiceprint_provider.identify_speaker(wav_data, conn.session_id)
                         )
+                        timings["voiceprint"] = time.monotonic() - start_time
                         return result
                     finally:
                         loop.close()
@@ -169,28 +177,27 @@ class ASRProviderBase(ABC):
             self.stop_ws_connection()
             
             if text_len > 0:
-                # 构建包含说话人信息的JSON字符串
-                enhanced_text = self._build_enhanced_text(raw_text, speaker_name)
-                
+                # 识别结果连同说话人、音频和耗时一起交给下游
+                utterance = Utterance(
+                    raw_text,
+                    speaker=speaker_name,
+                    audio=asr_audio_task,
+                    audio_file=file_path,
+                    started_at=total_start_time,
+                )
+                for stage, elapsed in timings.items():
+                    utterance.mark(stage, elapsed)
+                utterance.mark("recognize", total_time)
+
                 # 使用自定义模块进行上报
-                await startToChat(conn, enhanced_text)
-                enqueue_asr_report(conn, enhanced_text, asr_audio_task)
+                await startToChat(conn, utterance)
+                enqueue_asr_report(conn, utterance.content, asr_audio_task)
                 
         except Exception as e:
             logger.bind(tag=TAG).error(f"处理语音停止失败: {e}")
             import traceback
             logger.bind(tag=TAG).debug(f"异常详情: {traceback.format_exc()}")
 
-    def _build_enhanced_text(self, text: str, speaker_name: Optional[str]) -> str:
-        """构建包含说话人信息的文本"""
-        if speaker_name and speaker_name.strip():
-            return json.dumps({
-                "speaker": speaker_name,
-                "content": text
-            }, ensure_ascii=False)
-        else:
-            return text
-
     def _pcm_to_wav(self, pcm_data: bytes) -> bytes:
         """将PCM数据转换为WAV格式"""
         if len(pcm_data) == 0:
@@ -242,6 +249,18 @@ class ASRProviderBase(ABC):
         """将语音数据转换为文本"""
         pass
 
+    @staticmethod
+    def encode_ogg_opus(audio_data: List[bytes], audio_format="opus") -> bytes:
+        """将设备音频封装为Ogg/Opus，PCM输入先编码为opus"""
+        if audio_format == "pcm":
+            # 60ms at 16kHz，最后一帧补零
+            frames = split_pcm_frames(b"".join(audio_data), 960)
+            with opus_encoder_pool.encoder(
+                16000, 1, opuslib_next.APPLICATION_VOIP
+            ) as encoder:
+                audio_data = [encoder.encode(frame.tobytes(), 960) for frame in frames]
+        return opus_packets_to_ogg(audio_data)
+
     @staticmethod
     def decode_opus(opus_data: List[bytes]) -> List[bytes]:
         """将Opus音频数据解码为PCM数据"""
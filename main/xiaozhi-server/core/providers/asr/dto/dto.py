@@ -1,5 +1,7 @@
+import json
+import time
 from enum import Enum
-from typing import Union, Optional
+from typing import Dict, List, Union, Optional
 
 
 class InterfaceType(Enum):
@@ -7,3 +9,74 @@ class InterfaceType(Enum):
     STREAM = "STREAM"  # 流式接口
     NON_STREAM = "NON_STREAM"  # 非流式接口
     LOCAL = "LOCAL"  # 本地服务
+
+
+class Utterance:
+    """
+    一次用户说话的识别结果，从ASR依次传给意图识别、聊天、记忆和上报
+    开启声纹识别时带说话人，下游直接读取字段，不再反复解析JSON字符串
+    """
+
+    def __init__(
+        self,
+        # 识别出的文本
+        text: str,
+        # 声纹识别出的说话人
+        speaker: Optional[str] = None,
+        # 识别语种和置信度，ASR接口提供时填写
+        language: Optional[str] = None,
+        confidence: Optional[float] = None,
+        # 设备上传的音频帧和ASR保存的音频文件
+        audio: Optional[List[bytes]] = None,
+        audio_file: Optional[str] = None,
+        # 开始识别的时间（time.monotonic），各阶段耗时从这里算起
+        started_at: Optional[float] = None,
+    ):
+        self.text = text
+        self.speaker = speaker.strip() if speaker and speaker.strip() else None
+        self.language = language
+        self.confidence = confidence
+        self.audio = audio
+        self.audio_file = audio_file
+        # 各阶段的毫秒数，如asr、voiceprint、intent、memory
+        self.timings: Dict[str, float] = {}
+        self.started_at = time.monotonic() if started_at is None else started_at
+        self._content = None
+
+    @classmethod
+    def of(cls, value: Union["Utterance", str]) -> "Utterance":
+        """兼容传入字符串的调用方，带说话人信息的JSON字符串只在这里解析一次"""
+        if isinstance(value, Utterance):
+            return value
+        text = value.strip()
+        if text.startswith("{") and text.endswith("}"):
+            try:
+                data = json.loads(text)
+            except ValueError:
+                data = None
+            if isinstance(data, dict) and "content" in data:
+                utterance = cls(str(data["content"]), data.get("speaker"))
+                utterance._content = value
+                return utterance
+        return cls(value)
+
+    @property
+    def content(self) -> str:
+        """写入对话历史和上报的文本，有说话人时是包含speaker和content的JSON"""
+        if self._content is None:
+            if self.speaker:
+                self._content = json.dumps(
+                    {"speaker": self.speaker, "content": self.text}, ensure_ascii=False
+                )
+            else:
+                self._content = self.text
+        return self._content
+
+    def mark(self, stage: str, elapsed: Optional[float] = None) -> None:
+        """记录阶段耗时（秒），elapsed为空时记录从开始识别到现在的时间"""
+        if elapsed is None:
+            elapsed = time.monotonic() - self.started_at
+        self.timings[stage] = round(elapsed * 1000, 1)
+
+    def __str__(self) -> str:
+        return self.content
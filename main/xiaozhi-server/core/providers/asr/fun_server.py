@@ -1,9 +1,14 @@
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Dict
 from core.providers.asr.base import ASRProviderBase
 from core.providers.asr.dto.dto import InterfaceType
+from core.utils.event_loop import get_background_loop
 import ssl
 import json
+import time
+import itertools
 import websockets
+from websockets.protocol import State
+import opuslib_next
 from config.logger import setup_logging
 import asyncio
 import re
@@ -11,6 +16,229 @@ import re
 TAG = __name__
 logger = setup_logging()
 
+# 流式会话控制信号
+_STREAM_FINISH = object()
+_STREAM_ABORT = object()
+
+
+class FunASRSessionPool:
+    """
+    FunASR websocket连接池，进程内按服务地址共享。
+    FunASR服务端在收到is_speaking=False并返回结果后会重置会话状态，
+    同一条连接可以串行承载多次识别，因此识别结束后连接归还池中复用，
+    避免每句话都重新握手（TLS+websocket）。
+    连接池的所有操作都运行在后台事件循环中。
+    """
+
+    _pools: Dict[str, "FunASRSessionPool"] = {}
+
+    def __init__(self, uri, headers, ssl_context, max_size, idle_timeout):
+        self.uri = uri
+        self.headers = headers
+        self.ssl_context = ssl_context
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._idle = []  # [(ws, 归还时间)]，后进先出
+        self._size = 0
+        self._cond = None
+        self._keepalive_task = None
+
+    @classmethod
+    def get(cls, uri, headers, ssl_context, max_size, idle_timeout):
+        key = f"{uri}|{headers.get('Authorization')}"
+        pool = cls._pools.get(key)
+        if pool is None:
+            pool = cls(uri, headers, ssl_context, max_size, idle_timeout)
+            cls._pools[key] = pool
+        return pool
+
+    async def _connect(self):
+        return await websockets.connect(
+            self.uri,
+            additional_headers=self.headers,
+            subprotocols=["binary"],
+            ping_interval=None,
+            ssl=self.ssl_context,
+        )
+
+    async def acquire(self, timeout=10):
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        if self._keepalive_task is None or self._keepalive_task.done():
+            self._keepalive_task = asyncio.create_task(self._keepalive())
+
+        deadline = time.monotonic() + timeout
+        stale = []
+        try:
+            async with self._cond:
+                while True:
+                    while self._idle:
+                        ws, released_at = self._idle.pop()
+                        if (
+                            ws.state == State.OPEN
+                            and time.monotonic() - released_at < self.idle_timeout
+                        ):
+                            return ws
+                        self._size -= 1
+                        stale.append(ws)
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError("等待FunASR连接超时")
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        raise asyncio.TimeoutError("等待FunASR连接超时")
+        finally:
+            # 过期的连接在锁外关闭，不阻塞其他获取连接的请求
+            await self._close_all(stale)
+
+        try:
+            ws = await asyncio.wait_for(self._connect(), timeout)
+            logger.bind(tag=TAG).debug(f"新建FunASR连接，当前连接数: {self._size}")
+            return ws
+        except BaseException:
+            async with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    async def release(self, ws, reusable: bool):
+        """归还连接，会话状态不确定的连接直接关闭"""
+        reusable = reusable and ws.state == State.OPEN
+        async with self._cond:
+            if reusable:
+                self._idle.append((ws, time.monotonic()))
+            else:
+                self._size -= 1
+            self._cond.notify()
+        if not reusable:
+            await self._close_all([ws])
+
+    @staticmethod
+    async def _close_all(sockets):
+        """关闭已从连接数中扣除的连接，调用时不能持有锁"""
+        if not sockets:
+            return
+
+        async def close(ws):
+            try:
+                await asyncio.wait_for(ws.close(), 2)
+            except Exception:
+                pass
+
+        await asyncio.gather(*(close(ws) for ws in sockets))
+
+    @staticmethod
+    async def _ping(ws) -> bool:
+        try:
+            pong_waiter = await ws.ping()
+            await asyncio.wait_for(pong_waiter, 5)
+            return True
+        except Exception:
+            return False
+
+    async def _keepalive(self):
+        """定期检查空闲连接，关闭过期或不可用的连接"""
+        interval = max(5, min(30, self.idle_timeout / 2))
+        while True:
+            await asyncio.sleep(interval)
+            # 锁内只取出空闲连接，ping和关闭都在锁外进行
+            async with self._cond:
+                idle, self._idle = self._idle, []
+                now = time.monotonic()
+                checking, expired = [], []
+                for ws, released_at in idle:
+                    if ws.state == State.OPEN and now - released_at < self.idle_timeout:
+                        checking.append((ws, released_at))
+                    else:
+                        expired.append(ws)
+                self._size -= len(expired)
+                if expired:
+                    self._cond.notify_all()
+            results = await asyncio.gather(*(self._ping(ws) for ws, _ in checking))
+            healthy = [item for item, ok in zip(checking, results) if ok]
+            broken = [ws for (ws, _), ok in zip(checking, results) if not ok]
+            async with self._cond:
+                # 检查期间归还的连接更新，放在后面优先复用
+                self._idle[:0] = healthy
+                self._size -= len(broken)
+                self._cond.notify_all()
+            await self._close_all(expired + broken)
+
+
+class _FunASRStream:
+    """说话过程中边收音边上传的识别会话，运行在后台事件循环中"""
+
+    def __init__(self, provider, wav_name: str, audio_format: str):
+        self.provider = provider
+        self.wav_name = wav_name
+        self.audio_format = audio_format
+        self.frame_count = 0
+        self.closed = False
+        self._bg = provider.bg_loop
+        self._queue = asyncio.Queue()
+        self.future = self._bg.submit(self._run())
+
+    def feed(self, frame: bytes):
+        self.frame_count += 1
+        self._bg.call_soon(self._queue.put_nowait, frame)
+
+    def finish(self):
+        self.closed = True
+        self._bg.call_soon(self._queue.put_nowait, _STREAM_FINISH)
+        return self.future
+
+    def abort(self):
+        self.closed = True
+        self._bg.call_soon(self._queue.put_nowait, _STREAM_ABORT)
+
+    async def _run(self) -> Optional[str]:
+        try:
+            ws = await self.provider.pool.acquire()
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"获取FunASR连接失败: {e}")
+            return None
+
+        reusable = False
+        try:
+            await ws.send(self.provider._build_config_message(self.wav_name))
+            decoder = (
+                None if self.audio_format == "pcm" else opuslib_next.Decoder(16000, 1)
+            )
+            while True:
+                item = await asyncio.wait_for(
+                    self._queue.get(), timeout=self.provider.stream_timeout
+                )
+                if item is _STREAM_ABORT:
+                    return None
+                if item is _STREAM_FINISH:
+                    break
+                if decoder is not None:
+                    try:
+                        item = decoder.decode(item, 960)
+                    except opuslib_next.OpusError as e:
+                        logger.bind(tag=TAG).warning(f"Opus解码错误，跳过数据包: {e}")
+                        continue
+                if item:
+                    await ws.send(item)
+
+            await ws.send(json.dumps({"is_speaking": False}))
+            text, reusable = await self.provider._receive_responses(
+                ws, self.wav_name
+            )
+            return text if reusable else None
+        except asyncio.TimeoutError:
+            logger.bind(tag=TAG).warning("流式识别会话长时间无数据，已放弃")
+            return None
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"流式识别失败: {e}")
+            return None
+        finally:
+            await self.provider.pool.release(ws, reusable)
+
 
 class ASRProvider(ASRProviderBase):
     def __init__(self, config: dict, delete_audio_file: bool):
@@ -41,64 +269,139 @@ class ASRProvider(ASRProviderBase):
             self.ssl_context.check_hostname = False
             self.ssl_context.verify_mode = ssl.CERT_NONE
 
-    async def _receive_responses(self, ws) -> None:
+        self.stream_audio = str(config.get("stream_audio", True)).lower() in (
+            "true",
+            "1",
+            "yes",
+        )
+        self.stream_timeout = 30
+        self.bg_loop = get_background_loop()
+        self.pool = FunASRSessionPool.get(
+            self.uri,
+            {"Authorization": "Bearer; {}".format(self.api_key)},
+            self.ssl_context,
+            int(config.get("pool_size", 8)),
+            int(config.get("idle_timeout", 60)),
+        )
+        self._stream: Optional[_FunASRStream] = None
+        self._request_seq = itertools.count(1)
+
+    def _build_config_message(self, wav_name: str) -> str:
+        return json.dumps(
+            {
+                "mode": "offline",
+                "chunk_size": [5, 10, 5],
+                "chunk_interval": 10,
+                "wav_name": wav_name,
+                "is_speaking": True,
+                "itn": False,
+            }
+        )
+
+    def _next_wav_name(self, session_id: str) -> str:
+        # 连接会被多个会话复用，wav_name需要唯一以便识别过期响应
+        return f"{session_id}_{next(self._request_seq)}"
+
+    async def receive_audio(self, conn, audio, audio_have_voice):
+        if self.stream_audio:
+            if conn.client_listen_mode == "auto" or conn.client_listen_mode == "realtime":
+                have_voice = audio_have_voice
+            else:
+                have_voice = conn.client_have_voice
+
+            if have_voice or conn.client_have_voice:
+                if self._stream is None or self._stream.closed:
+                    # 检测到说话，先补发缓存的前置音频，再边说边传
+                    self._stream = _FunASRStream(
+                        self,
+                        self._next_wav_name(conn.session_id),
+                        conn.audio_format,
+                    )
+                    for frame in conn.asr_audio:
+                        self._stream.feed(frame)
+                self._stream.feed(audio)
+            elif self._stream is not None and not self._stream.closed:
+                self._stream.abort()
+                self._stream = None
+
+        await super().receive_audio(conn, audio, audio_have_voice)
+
+        # 语音过短被丢弃时，本轮流式识别作废
+        if (
+            self._stream is not None
+            and not self._stream.closed
+            and not conn.asr_audio
+        ):
+            self._stream.abort()
+            self._stream = None
+
+    async def _receive_responses(self, ws, wav_name: str) -> Tuple[str, bool]:
         """
-        Asynchronous generator to receive messages from the WebSocket.
-        Yields each message as it is received.
+        Receive messages from the WebSocket until the final result arrives.
+        :return: Tuple containing recognized text and whether the session ended cleanly.
         """
         text = ""
         while True:
             try:
                 response = await asyncio.wait_for(ws.recv(), timeout=5)
+                if isinstance(response, bytes):
+                    continue
                 response_data = json.loads(response)
                 logger.bind(tag=TAG).debug(f"Received response: {response_data}")
-                if response_data.get("is_final", True):
-                    text += response_data.get("text", "")
-                    break
-                else:
-                    text += response_data.get("text", "")
+                # 忽略复用连接上上一次会话遗留的响应
+                if response_data.get("wav_name", wav_name) != wav_name:
+                    continue
+                text += response_data.get("text", "")
+                if (
+                    response_data.get("is_final", True)
+                    or response_data.get("mode") == "offline"
+                ):
+                    return text, True
             except asyncio.TimeoutError:
                 logger.bind(tag=TAG).error(
                     "Timeout while waiting for response from WebSocket."
                 )
-                break
+                return text, False
             except websockets.exceptions.ConnectionClosed as e:
                 logger.bind(tag=TAG).error(f"WebSocket connection closed: {e}")
-                break
-        return text
+                return text, False
 
-    async def _send_data(self, ws, pcm_data: bytes, session_id: str) -> tuple:
+    async def _send_data(self, ws, pcm_data: bytes, wav_name: str):
         """
-        Internal method to handle WebSocket communication.
-        Reuses the persistent WebSocket connection if available.
+        Send configuration, PCM data and end-of-speech message.
         :param pcm_data: PCM audio data to send.
-        :param session_id: Unique session identifier.
-        :return: Tuple containing recognized text and optional timestamp.
+        :param wav_name: Unique request identifier.
         """
-
-        # Send initial configuration message
-        config_message = json.dumps(
-            {
-                "mode": "offline",
-                "chunk_size": [5, 10, 5],
-                "chunk_interval": 10,
-                "wav_name": session_id,
-                "is_speaking": True,
-                "itn": False,
-            }
-        )
+        config_message = self._build_config_message(wav_name)
         await ws.send(config_message)
         logger.bind(tag=TAG).debug(f"Sent configuration message: {config_message}")
 
-        # Send PCM data
         await ws.send(pcm_data)
         logger.bind(tag=TAG).debug(f"Sent PCM data of length: {len(pcm_data)} bytes")
 
-        # Indicate end of speech
         end_message = json.dumps({"is_speaking": False})
         await ws.send(end_message)
         logger.bind(tag=TAG).debug(f"Sent end message: {end_message}")
 
+    async def _recognize_once(self, pcm_data: bytes, wav_name: str) -> str:
+        """使用连接池中的连接一次性识别整段音频，运行在后台事件循环中"""
+        for attempt in range(2):
+            ws = await self.pool.acquire()
+            reusable = False
+            try:
+                await self._send_data(ws, pcm_data, wav_name)
+                text, reusable = await self._receive_responses(ws, wav_name)
+                return text
+            except websockets.exceptions.ConnectionClosed as e:
+                # 池中连接可能已被服务端关闭，换一条新连接重试
+                if attempt == 0:
+                    logger.bind(tag=TAG).warning(f"FunASR连接已断开，重试: {e}")
+                    continue
+                raise
+            finally:
+                await self.pool.release(ws, reusable)
+        return ""
+
     async def speech_to_text(
         self, opus_data: List[bytes], session_id: str, audio_format="opus"
     ) -> Tuple[Optional[str], Optional[str]]:
@@ -109,61 +412,48 @@ class ASRProvider(ASRProviderBase):
         :return: Tuple containing recognized text and optional timestamp.
         """
         file_path = None
-        if audio_format == "pcm":
-            pcm_data = opus_data
-        else:
-            pcm_data = self.decode_opus(opus_data)
-        combined_pcm_data = b"".join(pcm_data)
-
-        # 判断是否保存为WAV文件
-        if self.delete_audio_file:
-            pass
-        else:
-            file_path = self.save_audio_to_file(pcm_data, session_id)
-        auth_header = {"Authorization": "Bearer; {}".format(self.api_key)}
-        async with websockets.connect(
-            self.uri,
-            additional_headers=auth_header,
-            subprotocols=["binary"],
-            ping_interval=None,
-            ssl=self.ssl_context,
-        ) as ws:
-            try:
-                # Use asyncio to handle WebSocket communication
-                send_task = asyncio.create_task(
-                    self._send_data(ws, combined_pcm_data, session_id)
-                )
-                receive_task = asyncio.create_task(self._receive_responses(ws))
+        stream, self._stream = self._stream, None
 
-                # Gather tasks with error handling
-                done, pending = await asyncio.wait(
-                    [send_task, receive_task], return_when=asyncio.FIRST_EXCEPTION
-                )
+        try:
+            result = None
+            if stream is not None and not stream.closed:
+                if stream.frame_count == len(opus_data):
+                    result = await asyncio.wrap_future(stream.finish())
+                else:
+                    stream.abort()
 
-                # Cancel any pending tasks
-                for task in pending:
-                    task.cancel()
-
-                # Check for exceptions in completed tasks
-                for task in done:
-                    if task.exception():
-                        raise task.exception()
-
-                # Get the result from the receive task
-                result = receive_task.result()
-                match = re.match(r"<\|(.*?)\|><\|(.*?)\|><\|(.*?)\|>(.*)", result)
-                if match:
-                    result = match.group(4).strip()
-                return (
-                    result,
-                    file_path,
-                )  # Return the recognized text and timestamp (if any)
+            pcm_data = None
+            if result is None or not self.delete_audio_file:
+                if audio_format == "pcm":
+                    pcm_data = opus_data
+                else:
+                    pcm_data = self.decode_opus(opus_data)
 
-            except websockets.exceptions.ConnectionClosed as e:
-                logger.bind(tag=TAG).error(f"WebSocket connection closed: {e}")
-                return "", file_path
-            except Exception as e:
-                logger.bind(tag=TAG).error(
-                    f"Error during speech-to-text conversion: {e}", exc_info=True
+            # 判断是否保存为WAV文件
+            if not self.delete_audio_file:
+                file_path = self.save_audio_to_file(pcm_data, session_id)
+
+            if result is None:
+                # 未走流式识别或流式识别失败，整段上传
+                result = await self.bg_loop.run(
+                    self._recognize_once(
+                        b"".join(pcm_data), self._next_wav_name(session_id)
+                    )
                 )
-                return "", file_path
+
+            match = re.match(r"<\|(.*?)\|><\|(.*?)\|><\|(.*?)\|>(.*)", result)
+            if match:
+                result = match.group(4).strip()
+            return (
+                result,
+                file_path,
+            )  # Return the recognized text and timestamp (if any)
+
+        except websockets.exceptions.ConnectionClosed as e:
+            logger.bind(tag=TAG).error(f"WebSocket connection closed: {e}")
+            return "", file_path
+        except Exception as e:
+            logger.bind(tag=TAG).error(
+                f"Error during speech-to-text conversion: {e}", exc_info=True
+            )
+            return "", file_path
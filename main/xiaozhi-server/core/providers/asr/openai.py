@@ -1,11 +1,11 @@
 import time
 import os
+import aiohttp
 from config.logger import setup_logging
 from typing import Optional, Tuple, List
 from core.providers.asr.dto.dto import InterfaceType
 from core.providers.asr.base import ASRProviderBase
-
-import requests
+from core.utils import http_client
 
 TAG = __name__
 logger = setup_logging()
@@ -15,59 +15,65 @@ class ASRProvider(ASRProviderBase):
         self.interface_type = InterfaceType.NON_STREAM
         self.api_key = config.get("api_key")
         self.api_url = config.get("base_url")
-        self.model = config.get("model_name")        
+        self.model = config.get("model_name")
         self.output_dir = config.get("output_dir")
         self.delete_audio_file = delete_audio_file
+        # 上传格式：ogg（opus直接封装，体积小）或wav（兼容不支持ogg的接口）
+        self.upload_format = str(config.get("upload_format", "ogg")).lower()
 
         os.makedirs(self.output_dir, exist_ok=True)
 
+    def _build_upload_file(self, opus_data: List[bytes], pcm_data, audio_format):
+        """构建上传的音频文件，返回(文件名, 内容, content_type)"""
+        if self.upload_format == "wav":
+            return "audio.wav", self._pcm_to_wav(b"".join(pcm_data)), "audio/wav"
+        return "audio.ogg", self.encode_ogg_opus(opus_data, audio_format), "audio/ogg"
+
     async def speech_to_text(self, opus_data: List[bytes], session_id: str, audio_format="opus") -> Tuple[Optional[str], Optional[str]]:
         file_path = None
         try:
             start_time = time.time()
-            if audio_format == "pcm":
-                pcm_data = opus_data
-            else:
-                pcm_data = self.decode_opus(opus_data)
-            file_path = self.save_audio_to_file(pcm_data, session_id)
+            pcm_data = None
+            if not self.delete_audio_file or self.upload_format == "wav":
+                if audio_format == "pcm":
+                    pcm_data = opus_data
+                else:
+                    pcm_data = self.decode_opus(opus_data)
+            if not self.delete_audio_file:
+                file_path = self.save_audio_to_file(pcm_data, session_id)
 
+            file_name, audio_bytes, content_type = self._build_upload_file(
+                opus_data, pcm_data, audio_format
+            )
             logger.bind(tag=TAG).debug(
-                f"音频文件保存耗时: {time.time() - start_time:.3f}s | 路径: {file_path}"
+                f"音频编码耗时: {time.time() - start_time:.3f}s | 格式: {file_name} | 大小: {len(audio_bytes)}字节"
             )
 
-            logger.bind(tag=TAG).info(f"file path: {file_path}")
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
             }
-            
-            # 使用data参数传递模型名称
-            data = {
-                "model": self.model
-            }
-
 
-            with open(file_path, "rb") as audio_file:  # 使用with语句确保文件关闭
-                files = {
-                    "file": audio_file
-                }
+            # 使用表单字段传递模型名称
+            data = aiohttp.FormData()
+            data.add_field("model", self.model)
+            data.add_field(
+                "file", audio_bytes, filename=file_name, content_type=content_type
+            )
 
-                start_time = time.time()
-                response = requests.post(
-                    self.api_url,
-                    files=files,
-                    data=data,
-                    headers=headers
-                )
-                logger.bind(tag=TAG).debug(
-                    f"语音识别耗时: {time.time() - start_time:.3f}s | 结果: {response.text}"
-                )
+            start_time = time.time()
+            response = await http_client.request(
+                "POST", self.api_url, headers=headers, data=data
+            )
+            logger.bind(tag=TAG).debug(
+                f"语音识别耗时: {time.time() - start_time:.3f}s | 结果: {response.text}"
+            )
 
-            if response.status_code == 200:
+            if response.status == 200:
                 text = response.json().get("text", "")
                 return text, file_path
             else:
-                raise Exception(f"API请求失败: {response.status_code} - {response.text}")
-                
+                raise Exception(f"API请求失败: {response.status} - {response.text}")
+
         except Exception as e:
             logger.bind(tag=TAG).error(f"语音识别失败: {e}")
             return "", None
@@ -79,4 +85,4 @@ class ASRProvider(ASRProviderBase):
                     logger.bind(tag=TAG).debug(f"已删除临时音频文件: {file_path}")
                 except Exception as e:
                     logger.bind(tag=TAG).error(f"文件删除失败: {file_path} | 错误: {e}")
-        
+
@@ -7,8 +7,8 @@ from datetime import datetime, timezone
 import os
 from typing import Optional, Tuple, List
 from core.providers.asr.dto.dto import InterfaceType
-import requests
 from core.providers.asr.base import ASRProviderBase
+from core.utils import http_client
 from config.logger import setup_logging
 
 TAG = __name__
@@ -18,7 +18,7 @@ logger = setup_logging()
 class ASRProvider(ASRProviderBase):
     API_URL = "https://asr.tencentcloudapi.com"
     API_VERSION = "2019-06-14"
-    FORMAT = "pcm"  # 支持的音频格式：pcm, wav, mp3
+    FORMAT = "ogg-opus"  # 支持的音频格式：pcm, wav, ogg-opus, mp3
 
     def __init__(self, config: dict, delete_audio_file: bool = True):
         super().__init__()
@@ -46,31 +46,31 @@ class ASRProvider(ASRProviderBase):
                 logger.bind(tag=TAG).error("腾讯云语音识别配置未设置，无法进行识别")
                 return None, file_path
 
-            # 将Opus音频数据解码为PCM
-            if audio_format == "pcm":
-                pcm_data = opus_data
-            else:
-                pcm_data = self.decode_opus(opus_data)
-            combined_pcm_data = b"".join(pcm_data)
-
             # 判断是否保存为WAV文件
             if self.delete_audio_file:
                 pass
             else:
+                if audio_format == "pcm":
+                    pcm_data = opus_data
+                else:
+                    pcm_data = self.decode_opus(opus_data)
                 self.save_audio_to_file(pcm_data, session_id)
 
+            # 设备上传的opus数据直接封装为ogg-opus，无需解码
+            ogg_data = self.encode_ogg_opus(opus_data, audio_format)
+
             # 将音频数据转换为Base64编码
-            base64_audio = base64.b64encode(combined_pcm_data).decode("utf-8")
+            base64_audio = base64.b64encode(ogg_data).decode("utf-8")
 
             # 构建请求体
-            request_body = self._build_request_body(base64_audio)
+            request_body = self._build_request_body(base64_audio, len(ogg_data))
 
             # 获取认证头
             timestamp, authorization = self._get_auth_headers(request_body)
 
             # 发送请求
             start_time = time.time()
-            result = self._send_request(request_body, timestamp, authorization)
+            result = await self._send_request(request_body, timestamp, authorization)
 
             if result:
                 logger.bind(tag=TAG).debug(
@@ -83,7 +83,7 @@ class ASRProvider(ASRProviderBase):
             logger.bind(tag=TAG).error(f"处理音频时发生错误！{e}", exc_info=True)
             return None, file_path
 
-    def _build_request_body(self, base64_audio: str) -> str:
+    def _build_request_body(self, base64_audio: str, data_len: int) -> str:
         """构建请求体"""
         request_map = {
             "ProjectId": 0,
@@ -92,7 +92,7 @@ class ASRProvider(ASRProviderBase):
             "SourceType": 1,  # 音频数据来源为语音文件
             "VoiceFormat": self.FORMAT,  # 音频格式
             "Data": base64_audio,  # Base64编码的音频数据
-            "DataLen": len(base64_audio),  # 数据长度
+            "DataLen": data_len,  # 数据长度（base64编码前）
         }
         return json.dumps(request_map)
 
@@ -181,7 +181,7 @@ class ASRProvider(ASRProviderBase):
             logger.bind(tag=TAG).error(f"生成认证头失败: {e}", exc_info=True)
             raise RuntimeError(f"生成认证头失败: {e}")
 
-    def _send_request(
+    async def _send_request(
         self, request_body: str, timestamp: str, authorization: str
     ) -> Optional[str]:
         """发送请求到腾讯云API"""
@@ -196,10 +196,12 @@ class ASRProvider(ASRProviderBase):
         }
 
         try:
-            response = requests.post(self.API_URL, headers=headers, data=request_body)
+            response = await http_client.request(
+                "POST", self.API_URL, headers=headers, data=request_body
+            )
 
             if not response.ok:
-                raise IOError(f"请求失败: {response.status_code} {response.reason}")
+                raise IOError(f"请求失败: {response.status} {response.reason}")
 
             response_json = response.json()
 
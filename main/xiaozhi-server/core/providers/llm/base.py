@@ -5,6 +5,10 @@ TAG = __name__
 logger = setup_logging()
 
 class LLMProviderBase(ABC):
+    # 为True时提供response_async和response_with_functions_async异步生成器，
+    # 聊天在事件循环中直接消费流式回复，不占用线程池
+    async_mode = False
+
     @abstractmethod
     def response(self, session_id, dialogue):
         """LLM response generator"""
@@ -0,0 +1,82 @@
+"""
+LLM接口的HTTP连接池
+- 同步客户端的连接池属于LLM实例，实例通过llm_registry按配置共享，连接池随之共享
+- 异步模式的OpenAI兼容接口共用httpx.AsyncClient，keep-alive连接在所有设备的回复之间复用，
+  每个流式回复只占用一个协程，不再占用一个线程。
+  httpx的异步连接池绑定创建它的事件循环，所以按事件循环和连接池大小各建一个。
+"""
+
+import asyncio
+from typing import Dict, Tuple
+
+import httpx
+import openai
+
+# 默认连接池大小
+MAX_CONNECTIONS = 500
+MAX_KEEPALIVE_CONNECTIONS = 100
+# 空闲的keep-alive连接保留时间（秒）
+KEEPALIVE_EXPIRY = 30
+
+_async_clients: Dict[Tuple[asyncio.AbstractEventLoop, int, int], httpx.AsyncClient] = {}
+
+
+def pool_limits(config: dict) -> httpx.Limits:
+    """从LLM配置中读取连接池大小"""
+
+    def read(key, default):
+        try:
+            value = int(config.get(key) or default)
+        except (ValueError, TypeError):
+            value = default
+        return max(value, 1)
+
+    max_connections = read("max_connections", MAX_CONNECTIONS)
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=min(
+            read("max_keepalive_connections", MAX_KEEPALIVE_CONNECTIONS),
+            max_connections,
+        ),
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def create_http_client(limits: httpx.Limits) -> httpx.Client:
+    """创建限制连接数的同步HTTP客户端"""
+    return httpx.Client(limits=limits, follow_redirects=True)
+
+
+def get_async_http_client(limits: httpx.Limits) -> httpx.AsyncClient:
+    """获取当前事件循环共享的异步HTTP客户端"""
+    loop = asyncio.get_running_loop()
+    key = (loop, limits.max_connections, limits.max_keepalive_connections)
+    client = _async_clients.get(key)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(limits=limits, follow_redirects=True)
+        _async_clients[key] = client
+    return client
+
+
+class AsyncOpenAIClient:
+    """按事件循环缓存AsyncOpenAI客户端，底层使用共享的连接池"""
+
+    def __init__(self, api_key, base_url, timeout: int, limits: httpx.Limits):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.limits = limits
+        self._loop = None
+        self._client = None
+
+    def get(self) -> openai.AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = openai.AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout),
+                http_client=get_async_http_client(self.limits),
+            )
+            self._loop = loop
+        return self._client
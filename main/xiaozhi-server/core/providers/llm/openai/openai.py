@@ -4,6 +4,11 @@ from openai.types import CompletionUsage
 from config.logger import setup_logging
 from core.utils.util import check_model_key
 from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.http_pool import (
+    AsyncOpenAIClient,
+    create_http_client,
+    pool_limits,
+)
 
 TAG = __name__
 logger = setup_logging()
@@ -46,45 +51,93 @@ class LLMProvider(LLMProviderBase):
         model_key_msg = check_model_key("LLM", self.api_key)
         if model_key_msg:
             logger.bind(tag=TAG).error(model_key_msg)
-        self.client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url, timeout=httpx.Timeout(self.timeout))
+        # 实例通过llm_registry在连接之间共享，连接池大小可配置
+        limits = pool_limits(config)
+        self.client = openai.OpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            timeout=httpx.Timeout(self.timeout),
+            http_client=create_http_client(limits),
+        )
+        # 异步模式：聊天的流式回复在事件循环中消费，所有连接共用异步连接池
+        self.async_mode = str(config.get("async_mode", False)).lower() in ("true", "1", "yes")
+        self.async_client = AsyncOpenAIClient(
+            self.api_key, self.base_url, self.timeout, limits
+        )
+
+    def _response_params(self, dialogue, device_id, kwargs):
+        return dict(
+            model=self.model_name,
+            messages=dialogue,
+            stream=True,
+            max_tokens=kwargs.get("max_tokens", self.max_tokens),
+            temperature=kwargs.get("temperature", self.temperature),
+            top_p=kwargs.get("top_p", self.top_p),
+            frequency_penalty=kwargs.get(
+                "frequency_penalty", self.frequency_penalty,
+            ),
+            extra_body={
+                "prompt": "web_" + self.api_key + device_id
+            },
+        )
+
+    def _function_params(self, dialogue, device_id, functions):
+        return dict(
+            model=self.model_name,
+            messages=dialogue,
+            stream=True,
+            tools=functions,
+            extra_body={
+                "prompt": "web_" + self.api_key + device_id
+            },
+        )
+
+    @staticmethod
+    def _chunk_content(chunk):
+        try:
+            # 检查是否存在有效的choice且content不为空
+            delta = (
+                chunk.choices[0].delta
+                if getattr(chunk, "choices", None)
+                else None
+            )
+            return delta.content if hasattr(delta, "content") else ""
+        except IndexError:
+            return ""
+
+    @staticmethod
+    def _filter_think(content, is_active):
+        # 处理标签跨多个chunk的情况
+        if "<think>" in content:
+            is_active = False
+            content = content.split("<think>")[0]
+        if "</think>" in content:
+            is_active = True
+            content = content.split("</think>")[-1]
+        return content, is_active
+
+    @staticmethod
+    def _log_usage(chunk):
+        # 存在 CompletionUsage 消息时，生成 Token 消耗 log
+        usage_info = getattr(chunk, "usage", None)
+        if isinstance(usage_info, CompletionUsage):
+            logger.bind(tag=TAG).info(
+                f"Token 消耗：输入 {getattr(usage_info, 'prompt_tokens', '未知')}，"
+                f"输出 {getattr(usage_info, 'completion_tokens', '未知')}，"
+                f"共计 {getattr(usage_info, 'total_tokens', '未知')}"
+            )
 
     def response(self, session_id, dialogue, device_id, **kwargs):
         try:
             responses = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=dialogue,
-                stream=True,
-                max_tokens=kwargs.get("max_tokens", self.max_tokens),
-                temperature=kwargs.get("temperature", self.temperature),
-                top_p=kwargs.get("top_p", self.top_p),
-                frequency_penalty=kwargs.get(
-                    "frequency_penalty", self.frequency_penalty,
-                ),
-                extra_body={
-                    "prompt": "web_" + self.api_key + device_id
-                },
+                **self._response_params(dialogue, device_id, kwargs)
             )
 
             is_active = True
             for chunk in responses:
-                try:
-                    # 检查是否存在有效的choice且content不为空
-                    delta = (
-                        chunk.choices[0].delta
-                        if getattr(chunk, "choices", None)
-                        else None
-                    )
-                    content = delta.content if hasattr(delta, "content") else ""
-                except IndexError:
-                    content = ""
+                content = self._chunk_content(chunk)
                 if content:
-                    # 处理标签跨多个chunk的情况
-                    if "<think>" in content:
-                        is_active = False
-                        content = content.split("<think>")[0]
-                    if "</think>" in content:
-                        is_active = True
-                        content = content.split("</think>")[-1]
+                    content, is_active = self._filter_think(content, is_active)
                     if is_active:
                         yield content
 
@@ -94,13 +147,7 @@ class LLMProvider(LLMProviderBase):
     def response_with_functions(self, session_id, dialogue, device_id, functions=None):
         try:
             stream = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=dialogue,
-                stream=True,
-                tools=functions,
-                extra_body={
-                    "prompt": "web_" + self.api_key + device_id
-                },
+                **self._function_params(dialogue, device_id, functions)
             )
 
             for chunk in stream:
@@ -109,14 +156,48 @@ class LLMProvider(LLMProviderBase):
                     yield chunk.choices[0].delta.content, chunk.choices[
                         0
                     ].delta.tool_calls
-                # 存在 CompletionUsage 消息时，生成 Token 消耗 log
-                elif isinstance(getattr(chunk, "usage", None), CompletionUsage):
-                    usage_info = getattr(chunk, "usage", None)
-                    logger.bind(tag=TAG).info(
-                        f"Token 消耗：输入 {getattr(usage_info, 'prompt_tokens', '未知')}，"
-                        f"输出 {getattr(usage_info, 'completion_tokens', '未知')}，"
-                        f"共计 {getattr(usage_info, 'total_tokens', '未知')}"
-                    )
+                else:
+                    self._log_usage(chunk)
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in function call streaming: {e}")
+            yield f"【OpenAI服务响应异常: {e}】", None
+
+    async def response_async(self, session_id, dialogue, device_id, **kwargs):
+        """异步模式的流式回复，在事件循环中直接消费"""
+        try:
+            responses = await self.async_client.get().chat.completions.create(
+                **self._response_params(dialogue, device_id, kwargs)
+            )
+            # 提前结束（如被打断）时关闭响应，连接归还连接池
+            async with responses:
+                is_active = True
+                async for chunk in responses:
+                    content = self._chunk_content(chunk)
+                    if content:
+                        content, is_active = self._filter_think(content, is_active)
+                        if is_active:
+                            yield content
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in response generation: {e}")
+
+    async def response_with_functions_async(
+        self, session_id, dialogue, device_id, functions=None
+    ):
+        """异步模式的function call流式回复"""
+        try:
+            stream = await self.async_client.get().chat.completions.create(
+                **self._function_params(dialogue, device_id, functions)
+            )
+            async with stream:
+                async for chunk in stream:
+                    if getattr(chunk, "choices", None):
+                        yield chunk.choices[0].delta.content, chunk.choices[
+                            0
+                        ].delta.tool_calls
+                    else:
+                        self._log_usage(chunk)
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in function call streaming: {e}")
@@ -127,7 +127,7 @@ class DeviceIoTExecutor(ToolExecutor):
                         send_message = json.dumps(
                             {"type": "iot", "commands": [command]}
                         )
-                        await self.conn.websocket.send(send_message)
+                        await self.conn.message_batcher.send_message(send_message)
                         return
 
         raise Exception(f"未找到设备{device_name}的方法{method_name}")
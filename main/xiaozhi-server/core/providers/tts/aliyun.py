@@ -3,8 +3,8 @@ import json
 import hmac
 import hashlib
 import base64
-import requests
 from datetime import datetime
+from core.utils import http_client
 from core.providers.tts.base import TTSProviderBase
 from config.logger import setup_logging
 import time
@@ -29,7 +29,7 @@ class AccessToken:
         return encoded_text.replace("+", "%20").replace("*", "%2A").replace("%7E", "~")
 
     @staticmethod
-    def create_token(access_key_id, access_key_secret):
+    async def create_token(access_key_id, access_key_secret):
         parameters = {
             "AccessKeyId": access_key_id,
             "Action": "CreateToken",
@@ -71,7 +71,7 @@ class AccessToken:
         )
         # print('url: %s' % full_url)
         # 提交HTTP GET请求
-        response = requests.get(full_url)
+        response = await http_client.request("GET", full_url, timeout=10)
         if response.ok:
             root_obj = response.json()
             key = "Token"
@@ -117,17 +117,18 @@ class TTSProvider(TTSProviderBase):
         self.header = {"Content-Type": "application/json"}
 
         if self.access_key_id and self.access_key_secret:
-            # 使用密钥对生成临时token
-            self._refresh_token()
+            # 使用密钥对生成临时token，首次合成时异步获取，避免在事件循环中阻塞请求
+            self.token = None
+            self.expire_time = 0
         else:
             # 直接使用预生成的长期token
             self.token = config.get("token")
             self.expire_time = None
 
-    def _refresh_token(self):
+    async def _refresh_token(self):
         """刷新Token并记录过期时间"""
         if self.access_key_id and self.access_key_secret:
-            self.token, expire_time_str = AccessToken.create_token(
+            self.token, expire_time_str = await AccessToken.create_token(
                 self.access_key_id, self.access_key_secret
             )
             if not expire_time_str:
@@ -153,7 +154,7 @@ class TTSProvider(TTSProviderBase):
 
     def _is_token_expired(self):
         """检查Token是否过期"""
-        if not self.expire_time:
+        if self.expire_time is None:
             return False  # 长期Token不过期
         # 新增调试日志
         # current_time = time.time()
@@ -165,8 +166,9 @@ class TTSProvider(TTSProviderBase):
 
     async def text_to_speak(self, text, output_file):
         if self._is_token_expired():
-            logger.warning("Token已过期，正在自动刷新...")
-            self._refresh_token()
+            if self.token:
+                logger.warning("Token已过期，正在自动刷新...")
+            await self._refresh_token()
         request_json = {
             "appkey": self.appkey,
             "token": self.token,
@@ -181,16 +183,25 @@ class TTSProvider(TTSProviderBase):
 
         # print(self.api_url, json.dumps(request_json, ensure_ascii=False))
         try:
-            resp = requests.post(
-                self.api_url, json.dumps(request_json), headers=self.header
+            resp = await http_client.request(
+                "POST",
+                self.api_url,
+                timeout=self.tts_timeout,
+                data=json.dumps(request_json),
+                headers=self.header,
             )
-            if resp.status_code == 401:  # Token过期特殊处理
-                self._refresh_token()
-                resp = requests.post(
-                    self.api_url, json.dumps(request_json), headers=self.header
+            if resp.status == 401:  # Token过期特殊处理
+                await self._refresh_token()
+                request_json["token"] = self.token
+                resp = await http_client.request(
+                    "POST",
+                    self.api_url,
+                    timeout=self.tts_timeout,
+                    data=json.dumps(request_json),
+                    headers=self.header,
                 )
             # 检查返回请求数据的mime类型是否是audio/***，是则保存到指定路径下；返回的是binary格式的
-            if resp.headers["Content-Type"].startswith("audio/"):
+            if resp.headers.get("Content-Type", "").startswith("audio/"):
                 if output_file:
                     with open(output_file, "wb") as f:
                         f.write(resp.content)
@@ -199,7 +210,7 @@ class TTSProvider(TTSProviderBase):
                     return resp.content
             else:
                 raise Exception(
-                    f"{__name__} status_code: {resp.status_code} response: {resp.content}"
+                    f"{__name__} status_code: {resp.status} response: {resp.content}"
                 )
         except Exception as e:
             raise Exception(f"{__name__} error: {e}")
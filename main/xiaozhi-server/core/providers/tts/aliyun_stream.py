@@ -13,9 +13,10 @@ import os
 from datetime import datetime
 from urllib import parse
 from core.providers.tts.base import TTSProviderBase
+from core.providers.tts.warm_connection import WarmConnection
 from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
 from core.utils.tts import MarkdownCleaner
-from core.utils import opus_encoder_utils, textUtils
+from core.utils import opus_encoder_utils, textUtils, http_client
 from config.logger import setup_logging
 
 TAG = __name__
@@ -36,7 +37,7 @@ class AccessToken:
         return encoded_text.replace("+", "%20").replace("*", "%2A").replace("%7E", "~")
 
     @staticmethod
-    def create_token(access_key_id, access_key_secret):
+    async def create_token(access_key_id, access_key_secret):
         parameters = {
             "AccessKeyId": access_key_id,
             "Action": "CreateToken",
@@ -71,9 +72,7 @@ class AccessToken:
             query_string,
         )
 
-        import requests
-
-        response = requests.get(full_url)
+        response = await http_client.request("GET", full_url, timeout=10)
         if response.ok:
             root_obj = response.json()
             key = "Token"
@@ -85,6 +84,9 @@ class AccessToken:
 
 
 class TTSProvider(TTSProviderBase):
+    # 服务端关闭空闲连接的时间（秒），超过后不能再复用连接
+    WARM_IDLE_TIMEOUT = 10
+
     def __init__(self, config, delete_audio_file):
         super().__init__(config, delete_audio_file)
 
@@ -124,6 +126,7 @@ class TTSProvider(TTSProviderBase):
         self.ws = None
         self._monitor_task = None
         self.last_active_time = None
+        self.warm_connection = WarmConnection(self._connect, self.WARM_IDLE_TIMEOUT)
 
         # 专属tts设置
         self.message_id = ""
@@ -137,15 +140,17 @@ class TTSProvider(TTSProviderBase):
 
         # Token管理
         if self.access_key_id and self.access_key_secret:
-            self._refresh_token()
+            # 临时token在首次建立连接时异步获取，避免在事件循环中阻塞请求
+            self.token = None
+            self.expire_time = 0
         else:
             self.token = config.get("token")
             self.expire_time = None
 
-    def _refresh_token(self):
+    async def _refresh_token(self):
         """刷新Token并记录过期时间"""
         if self.access_key_id and self.access_key_secret:
-            self.token, expire_time_str = AccessToken.create_token(
+            self.token, expire_time_str = await AccessToken.create_token(
                 self.access_key_id, self.access_key_secret
             )
             if not expire_time_str:
@@ -169,30 +174,57 @@ class TTSProvider(TTSProviderBase):
 
     def _is_token_expired(self):
         """检查Token是否过期"""
-        if not self.expire_time:
+        if self.expire_time is None:
             return False
         return time.time() > self.expire_time
 
+    async def _connect(self):
+        if self._is_token_expired():
+            if self.token:
+                logger.bind(tag=TAG).warning("Token已过期，正在自动刷新...")
+            await self._refresh_token()
+        return await websockets.connect(
+            self.ws_url,
+            additional_headers={"X-NLS-Token": self.token},
+            ping_interval=30,
+            ping_timeout=10,
+            close_timeout=10,
+        )
+
+    def _ws_reusable(self):
+        # 10秒内才可以复用链接进行连续对话
+        return (
+            self.ws is not None
+            and self.last_active_time is not None
+            and time.time() - self.last_active_time < self.WARM_IDLE_TIMEOUT
+        )
+
+    def prewarm(self):
+        """用户开始说话时提前建立连接，已有连接也会在说话期间过期，因此总是预热"""
+        self.warm_connection.prewarm(self.tts_prewarm_ttl)
+
     async def _ensure_connection(self):
         """确保WebSocket连接可用"""
         try:
-            if self._is_token_expired():
-                logger.bind(tag=TAG).warning("Token已过期，正在自动刷新...")
-                self._refresh_token()
-            current_time = time.time()
-            if self.ws and current_time - self.last_active_time < 10:
-                # 10秒内才可以复用链接进行连续对话
+            if self._ws_reusable():
                 logger.bind(tag=TAG).info(f"使用已有链接...")
                 return self.ws
+            if self.ws is not None:
+                # 空闲超时的旧连接已不能复用，先关闭
+                try:
+                    await self.ws.close()
+                except Exception:
+                    pass
+                self.ws = None
+            ws = self.warm_connection.take()
+            if ws:
+                logger.bind(tag=TAG).info("使用预热的连接...")
+                self.ws = ws
+                self.last_active_time = time.time()
+                return self.ws
             logger.bind(tag=TAG).info("开始建立新连接...")
 
-            self.ws = await websockets.connect(
-                self.ws_url,
-                additional_headers={"X-NLS-Token": self.token},
-                ping_interval=30,
-                ping_timeout=10,
-                close_timeout=10,
-            )
+            self.ws = await self._connect()
             logger.bind(tag=TAG).info("WebSocket连接建立成功")
             self.last_active_time = time.time()
             return self.ws
@@ -422,6 +454,10 @@ class TTSProvider(TTSProviderBase):
             self.ws = None
             self.last_active_time = None
 
+        if self.conn is not None and self.conn.stop_event.is_set():
+            # 设备断开时释放停放的预热连接
+            await self.warm_connection.close()
+
     async def _start_monitor_tts_response(self):
         """监听TTS响应"""
         opus_datas_cache = []
@@ -528,7 +564,7 @@ class TTSProvider(TTSProviderBase):
             async def _generate_audio():
                 # 刷新Token（如果需要）
                 if self._is_token_expired():
-                    self._refresh_token()
+                    await self._refresh_token()
 
                 # 建立WebSocket连接
                 ws = await websockets.connect(
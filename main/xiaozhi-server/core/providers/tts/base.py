@@ -4,13 +4,19 @@ import queue
 import uuid
 import asyncio
 import threading
-from core.utils import p3
+import concurrent.futures
+from core.utils import p3, http_client
 from datetime import datetime
-from core.utils import textUtils
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
 from core.utils.util import audio_to_data, audio_bytes_to_data
+from core.utils.event_loop import run_in_thread_loop
 from core.utils.tts import MarkdownCleaner
+from core.utils.sentence_segmenter import SentenceSegmenter
+from core.utils.audio_stream import StreamingAudioEncoder
+from core.utils.cache.tts_cache import tts_audio_cache
+from core.utils.audio_postprocess import audio_postprocessor
+from core.providers.tts.failover import build_tts_router
 from core.utils.output_counter import add_device_output
 from core.handle.reportHandle import enqueue_tts_report
 from core.handle.sendAudioHandle import sendAudioMessage
@@ -27,12 +33,73 @@ import traceback
 TAG = __name__
 logger = setup_logging()
 
+# 不参与缓存键的配置项（不区分大小写）：密钥类和输出目录，不影响合成出的音频
+_CACHE_IGNORED_CONFIG = frozenset(
+    (
+        "access_token",
+        "api_key",
+        "apikey",
+        "token",
+        "authorization",
+        "secret_id",
+        "secret_key",
+        "access_key_id",
+        "access_key_secret",
+        "password",
+        "output_dir",
+    )
+)
+
+
+def cache_key_params(config):
+    """复制TTS配置用于计算缓存键，递归去掉密钥类的配置项"""
+    if isinstance(config, dict):
+        return {
+            key: cache_key_params(value)
+            for key, value in config.items()
+            if str(key).lower() not in _CACHE_IGNORED_CONFIG
+        }
+    if isinstance(config, (list, tuple)):
+        return [cache_key_params(value) for value in config]
+    return config
+
+
+# 全服务共享的TTS合成线程池，线程数即同时进行中的TTS请求上限
+_synthesis_executor = None
+_synthesis_executor_lock = threading.Lock()
+
+
+def get_synthesis_executor(max_workers=32):
+    global _synthesis_executor
+    with _synthesis_executor_lock:
+        if _synthesis_executor is None:
+            _synthesis_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="tts-synthesis"
+            )
+        return _synthesis_executor
+
+
+class _StreamingSegment:
+    """边合成边交付的一句话，合成线程按顺序放入帧批次，None表示结束"""
+
+    def __init__(self):
+        self.batches = queue.Queue()
+        self.future = None
+
 
 class TTSProviderBase(ABC):
     def __init__(self, config, delete_audio_file):
         self.interface_type = InterfaceType.NON_STREAM
+        # 去掉密钥后的完整配置，参与TTS音频缓存键的计算
+        self.audio_cache_params = cache_key_params(config)
         self.conn = None
         self.tts_timeout = 10
+        # 单句合成的最大尝试次数，每次尝试受tts_timeout限制
+        self.tts_max_attempts = 2
+        # 用户开始说话后保持预热连接的时间（秒），0表示不预热
+        self.tts_prewarm_ttl = 30
+        # 配置了备用TTS时负责故障转移和对冲请求
+        self.tts_router = None
         self.delete_audio_file = delete_audio_file
         self.audio_file_type = "wav"
         self.output_file = config.get("output_dir", "tmp/")
@@ -40,8 +107,12 @@ class TTSProviderBase(ABC):
         self.tts_audio_queue = queue.Queue()
         self.tts_audio_first_sentence = True
         self.before_stop_play_files = []
+        # 提前合成的句子数，合成结果按句子顺序排队后再送入tts_audio_queue
+        self.tts_look_ahead = 3
+        self.tts_pending_queue = queue.Queue()
+        self._pending_generation = 0
+        self._look_ahead_slots = None
 
-        self.tts_text_buff = []
         self.punctuations = (
             "。",
             "？",
@@ -69,12 +140,10 @@ class TTSProviderBase(ABC):
             "：",
         )
         self.tts_stop_request = False
-        self.processed_chars = 0
-        self.is_first_sentence = True
-        self.brackets_arr = []  # 存放找到的括号及内容
-        self.text_before_brackets = ""  # 括号前被忽略的文本
-        self.before_text_arr = []   # 括号前被忽略的文本数组
-        self.number_of_symbols = 0  # "*" 的数量
+        # 流式分句，每个字符只处理一次
+        self.segmenter = SentenceSegmenter(
+            self.first_sentence_punctuations, self.punctuations
+        )
 
     def generate_filename(self, extension=".wav"):
         return os.path.join(
@@ -84,58 +153,64 @@ class TTSProviderBase(ABC):
 
     def to_tts(self, text):
         text = MarkdownCleaner.clean_markdown(text)
-        max_repeat_time = 5
+        max_attempts = self.tts_max_attempts
         if self.delete_audio_file:
             # 需要删除文件的直接转为音频数据
-            while max_repeat_time > 0:
+            for attempt in range(1, max_attempts + 1):
                 try:
-                    audio_bytes = asyncio.run(self.text_to_speak(text, None))
+                    audio_bytes = run_in_thread_loop(
+                        self.text_to_speak(text, None), self.tts_timeout
+                    )
                     if audio_bytes:
                         audio_datas, _ = audio_bytes_to_data(
-                            audio_bytes, file_type=self.audio_file_type, is_opus=True
+                            audio_bytes,
+                            file_type=self.audio_file_type,
+                            is_opus=True,
+                            postprocess=True,
+                            **self.device_opus_params(),
                         )
+                        if attempt > 1:
+                            logger.bind(tag=TAG).info(
+                                f"语音生成成功: {text}，重试{attempt - 1}次"
+                            )
                         return audio_datas
-                    else:
-                        max_repeat_time -= 1
+                except asyncio.TimeoutError:
+                    logger.bind(tag=TAG).warning(
+                        f"语音生成超时{attempt}次({self.tts_timeout}s): {text}"
+                    )
                 except Exception as e:
                     logger.bind(tag=TAG).warning(
-                        f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
+                        f"语音生成失败{attempt}次: {text}，错误: {e}"
                     )
-                    max_repeat_time -= 1
-            if max_repeat_time > 0:
-                logger.bind(tag=TAG).info(
-                    f"语音生成成功: {text}，重试{5 - max_repeat_time}次"
-                )
-            else:
-                logger.bind(tag=TAG).error(
-                    f"语音生成失败: {text}，请检查网络或服务是否正常"
-                )
+            logger.bind(tag=TAG).error(
+                f"语音生成失败: {text}，请检查网络或服务是否正常"
+            )
             return None
         else:
             tmp_file = self.generate_filename()
             try:
-                while not os.path.exists(tmp_file) and max_repeat_time > 0:
+                for attempt in range(1, max_attempts + 1):
                     try:
-                        asyncio.run(self.text_to_speak(text, tmp_file))
+                        run_in_thread_loop(
+                            self.text_to_speak(text, tmp_file), self.tts_timeout
+                        )
+                        if os.path.exists(tmp_file):
+                            logger.bind(tag=TAG).info(
+                                f"语音生成成功: {text}:{tmp_file}，重试{attempt - 1}次"
+                            )
+                            return tmp_file
                     except Exception as e:
                         logger.bind(tag=TAG).warning(
-                            f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
+                            f"语音生成失败{attempt}次: {text}，错误: {e}"
                         )
                         # 未执行成功，删除文件
                         if os.path.exists(tmp_file):
                             os.remove(tmp_file)
-                        max_repeat_time -= 1
 
-                if max_repeat_time > 0:
-                    logger.bind(tag=TAG).info(
-                        f"语音生成成功: {text}:{tmp_file}，重试{5 - max_repeat_time}次"
-                    )
-                else:
-                    logger.bind(tag=TAG).error(
-                        f"语音生成失败: {text}，请检查网络或服务是否正常"
-                    )
-
-                return tmp_file
+                logger.bind(tag=TAG).error(
+                    f"语音生成失败: {text}，请检查网络或服务是否正常"
+                )
+                return None
             except Exception as e:
                 logger.bind(tag=TAG).error(f"Failed to generate TTS file: {e}")
                 return None
@@ -144,13 +219,170 @@ class TTSProviderBase(ABC):
     async def text_to_speak(self, text, output_file):
         pass
 
-    def audio_to_pcm_data(self, audio_file_path):
+    def stream_audio(self, text):
+        """
+        返回按到达顺序产出音频数据块（格式为audio_file_type）的异步迭代器
+        接口支持流式返回音频的子类重写此方法后，音频边接收边编码播放
+        """
+        return None
+
+    def _supports_audio_stream(self):
+        # 保留音频文件时仍走整句合成并写文件的流程
+        return (
+            self.delete_audio_file
+            and type(self).stream_audio is not TTSProviderBase.stream_audio
+        )
+
+    async def fetch_audio(self, method, url, output_file=None, **kwargs):
+        """
+        通过共享的keep-alive会话请求音频接口
+        指定output_file时边接收边写入文件，否则返回完整音频数据
+        响应状态码不是2xx时抛出http_client.HttpStatusError
+        """
+        chunks = http_client.stream(method, url, timeout=self.tts_timeout, **kwargs)
+        if output_file:
+            with open(output_file, "wb") as file:
+                async for chunk in chunks:
+                    file.write(chunk)
+            return None
+        return b"".join([chunk async for chunk in chunks])
+
+    def audio_cache_key(self, text):
+        """计算一句话的TTS缓存键：TTS配置中任何一项不同都不会共用缓存"""
+        params = {"config": self.audio_cache_params}
+        # 删除文件模式下to_tts固定输出opus，否则按设备音频格式输出
+        params["output"] = (
+            "opus" if self.delete_audio_file else self.conn.audio_format
+        )
+        # opus音频与设备协商参数一致时原样下发，帧时长和采样率不同的设备不能共用
+        params["opus"] = self.device_opus_params()
+        return tts_audio_cache.make_key(type(self).__module__, params, text)
+
+    def _synthesize_audio(self, text):
+        """合成一句话，返回(音频帧, 是否可以写入缓存)"""
+        if self.tts_router is not None:
+            return self.tts_router.synthesize(text)
+        if self.delete_audio_file:
+            return self.to_tts(text), True
+        tts_file = self.to_tts(text)
+        if not tts_file:
+            return None, True
+        return self._process_audio_file(tts_file, postprocess=True), True
+
+    def _synthesize_segment(self, text):
+        """合成一句话的音频帧，相同参数和文本直接复用缓存"""
+        cache_key = self.audio_cache_key(text)
+        audio_datas = tts_audio_cache.get(cache_key)
+        if audio_datas is not None:
+            logger.bind(tag=TAG).debug(f"TTS缓存命中: {text}")
+            return audio_datas
+
+        audio_datas, cacheable = self._synthesize_audio(text)
+        if audio_datas and cacheable:
+            tts_audio_cache.put(
+                cache_key,
+                audio_datas,
+                is_opus=self.delete_audio_file or self.conn.audio_format != "pcm",
+            )
+        return audio_datas
+
+    def _stream_segment(self, text, segment, generation):
+        """流式合成一句话，编码出的帧分批放入segment；尚未产出音频就失败时回退到整句合成"""
+        cache_key = self.audio_cache_key(text)
+        audio_datas = tts_audio_cache.get(cache_key)
+        if audio_datas is not None:
+            logger.bind(tag=TAG).debug(f"TTS缓存命中: {text}")
+            segment.batches.put(audio_datas)
+            return
+
+        frames = []
+        clean_text = MarkdownCleaner.clean_markdown(text)
+        if self.tts_router is not None:
+            # 与整句合成一样按本轮的路由选择TTS，流式合成按首包耗时对冲
+            audio_datas, completed = self.tts_router.stream(
+                text,
+                lambda claim: self._stream_audio_frames(
+                    clean_text, segment, frames, generation, claim
+                ),
+            )
+            if audio_datas:
+                # 备用TTS整句合成的结果，音色不同不写入缓存
+                segment.batches.put(audio_datas)
+            elif completed and frames:
+                tts_audio_cache.put(cache_key, frames, is_opus=True)
+            return
+
+        try:
+            completed = run_in_thread_loop(
+                self._stream_audio_frames(clean_text, segment, frames, generation),
+                self.tts_timeout,
+            )
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"流式语音生成失败: {text}，错误: {e}")
+            if not frames:
+                audio_datas, cacheable = self._synthesize_audio(text)
+                if audio_datas:
+                    if cacheable:
+                        tts_audio_cache.put(cache_key, audio_datas, is_opus=True)
+                    segment.batches.put(audio_datas)
+            return
+        if completed and frames:
+            tts_audio_cache.put(cache_key, frames, is_opus=True)
+
+    async def _stream_audio_frames(self, text, segment, frames, generation, claim=None):
+        """
+        接收接口返回的音频块并编码，被打断时返回False
+        :param claim: 交付第一批帧之前调用，返回False时放弃（故障转移中其他TTS已经胜出）
+        """
+        encoder = StreamingAudioEncoder(
+            self.audio_file_type, opus_params=self.device_opus_params()
+        )
+        chunks = self.stream_audio(text)
+        try:
+            async for chunk in chunks:
+                if generation != self._pending_generation or self.conn.client_abort:
+                    return False
+                batch = encoder.feed(chunk)
+                if batch and not self._deliver_frames(segment, frames, batch, claim):
+                    return False
+            batch = encoder.finish()
+            if batch and not self._deliver_frames(segment, frames, batch, claim):
+                return False
+            return True
+        finally:
+            encoder.close()
+            if hasattr(chunks, "aclose"):
+                await chunks.aclose()
+
+    @staticmethod
+    def _deliver_frames(segment, frames, batch, claim) -> bool:
+        if not frames and claim is not None and not claim():
+            return False
+        frames.extend(batch)
+        segment.batches.put(batch)
+        return True
+
+    def audio_to_pcm_data(self, audio_file_path, postprocess=False):
         """音频文件转换为PCM编码"""
-        return audio_to_data(audio_file_path, is_opus=False)
+        return audio_to_data(audio_file_path, is_opus=False, postprocess=postprocess)
 
-    def audio_to_opus_data(self, audio_file_path):
+    def audio_to_opus_data(self, audio_file_path, postprocess=False):
         """音频文件转换为Opus编码"""
-        return audio_to_data(audio_file_path, is_opus=True)
+        return audio_to_data(
+            audio_file_path,
+            is_opus=True,
+            postprocess=postprocess,
+            **self.device_opus_params(),
+        )
+
+    def device_opus_params(self):
+        """设备在hello中协商的下行音频参数，opus音频与之一致时原样下发"""
+        welcome_msg = getattr(self.conn, "welcome_msg", None) or {}
+        audio_params = welcome_msg.get("audio_params") or {}
+        return {
+            "frame_duration": int(audio_params.get("frame_duration", 60)),
+            "sample_rate": int(audio_params.get("sample_rate", 16000)),
+        }
 
     def tts_one_sentence(
         self,
@@ -180,9 +412,23 @@ class TTSProviderBase(ABC):
                 )
             )
 
-    async def open_audio_channels(self, conn):
+    def bind_connection(self, conn):
+        """绑定连接并读取连接级的TTS配置，不启动消化线程；备用TTS只需要这一步"""
         self.conn = conn
         self.tts_timeout = conn.config.get("tts_timeout", 10)
+        self.tts_max_attempts = max(1, int(conn.config.get("tts_max_attempts", 2)))
+        self.tts_prewarm_ttl = float(conn.config.get("tts_prewarm_ttl", 30))
+
+    async def open_audio_channels(self, conn):
+        self.bind_connection(conn)
+        tts_audio_cache.configure(conn.config.get("tts_cache"))
+        audio_postprocessor.configure(conn.config.get("tts_postprocess"))
+        self.tts_router = build_tts_router(self, conn.config)
+        self.tts_look_ahead = max(1, int(conn.config.get("tts_look_ahead", 3)))
+        self._look_ahead_slots = threading.Semaphore(self.tts_look_ahead)
+        self._synthesis_executor = get_synthesis_executor(
+            int(conn.config.get("tts_max_concurrency", 32))
+        )
         # tts 消化线程
         self.tts_priority_thread = threading.Thread(
             target=self.tts_text_priority_thread, daemon=True
@@ -195,12 +441,22 @@ class TTSProviderBase(ABC):
         )
         self.audio_play_priority_thread.start()
 
+        if self.interface_type == InterfaceType.NON_STREAM:
+            # 合成结果按顺序交付 消化线程
+            self.tts_delivery_thread = threading.Thread(
+                target=self._tts_ordered_delivery_thread, daemon=True
+            )
+            self.tts_delivery_thread.start()
+
     # 这里默认是非流式的处理方式
     # 流式处理方式请在子类中重写
     def tts_text_priority_thread(self):
         while not self.conn.stop_event.is_set():
             try:
                 message = self.tts_text_queue.get(timeout=1)
+                if self.conn.client_abort:
+                    # 丢弃被打断的回复中尚未播放的句子
+                    self._cancel_pending_segments()
                 if message.sentence_type == SentenceType.FIRST:
                     self.conn.client_abort = False
                 if self.conn.client_abort:
@@ -209,45 +465,26 @@ class TTSProviderBase(ABC):
                 if message.sentence_type == SentenceType.FIRST:
                     # 初始化参数
                     self.tts_stop_request = False
-                    self.processed_chars = 0
-                    self.tts_text_buff = []
-                    self.is_first_sentence = True
                     self.tts_audio_first_sentence = True
-                    self.brackets_arr = []  # 重置
-                    self.text_before_brackets = ""  # 重置
-                    self.before_text_arr = []  # 重置
-                    self.number_of_symbols = 0  # 重置
+                    self.segmenter.reset()
+                    if self.tts_router is not None:
+                        self.tts_router.new_turn()
                 elif ContentType.TEXT == message.content_type:
-                    self.tts_text_buff.append(message.content_detail)
-                    segment_text = self._get_segment_text()
-
-                    if segment_text:
-                        if self.delete_audio_file:
-                            audio_datas = self.to_tts(segment_text)
-                            if audio_datas:
-                                self.tts_audio_queue.put(
-                                    (message.sentence_type, audio_datas, segment_text)
-                                )
-                        else:
-                            tts_file = self.to_tts(segment_text)
-                            if tts_file:
-                                audio_datas = self._process_audio_file(tts_file)
-                                self.tts_audio_queue.put(
-                                    (message.sentence_type, audio_datas, segment_text)
-                                )
+                    for segment_text in self._get_segments(message.content_detail):
+                        self._submit_segment(message.sentence_type, segment_text)
                 elif ContentType.FILE == message.content_type:
                     self._process_remaining_text()
                     tts_file = message.content_file
                     if tts_file and os.path.exists(tts_file):
                         audio_datas = self._process_audio_file(tts_file)
-                        self.tts_audio_queue.put(
-                            (message.sentence_type, audio_datas, message.content_detail)
+                        self._put_pending_audio(
+                            message.sentence_type, audio_datas, message.content_detail
                         )
 
                 if message.sentence_type == SentenceType.LAST:
                     self._process_remaining_text()
-                    self.tts_audio_queue.put(
-                        (message.sentence_type, [], message.content_detail)
+                    self._put_pending_audio(
+                        message.sentence_type, [], message.content_detail
                     )
 
             except queue.Empty:
@@ -258,6 +495,135 @@ class TTSProviderBase(ABC):
                 )
                 continue
 
+    def _submit_segment(self, sentence_type, text):
+        """提交一句话到合成线程池，最多同时提前合成tts_look_ahead句"""
+        # 客户端接收过慢时暂停合成，直到发送积压消化
+        if not self._wait_writable():
+            return
+        while not self._look_ahead_slots.acquire(timeout=0.5):
+            if self.conn.stop_event.is_set() or self.conn.client_abort:
+                return
+        generation = self._pending_generation
+
+        if self._supports_audio_stream():
+            segment = _StreamingSegment()
+
+            def synthesize_stream():
+                try:
+                    if generation == self._pending_generation and not self.conn.client_abort:
+                        self._stream_segment(text, segment, generation)
+                finally:
+                    segment.batches.put(None)
+
+            segment.future = self._synthesis_executor.submit(synthesize_stream)
+            segment.future.add_done_callback(lambda _: self._look_ahead_slots.release())
+            self.tts_pending_queue.put((generation, sentence_type, segment, text))
+            return
+
+        def synthesize():
+            if generation != self._pending_generation or self.conn.client_abort:
+                return None
+            return self._synthesize_segment(text)
+
+        future = self._synthesis_executor.submit(synthesize)
+        # 取消或完成时都要归还名额
+        future.add_done_callback(lambda _: self._look_ahead_slots.release())
+        self.tts_pending_queue.put((generation, sentence_type, future, text))
+
+    def _wait_writable(self):
+        """发送积压超过高水位时阻塞，连接关闭或被打断时返回False"""
+        backpressure = getattr(self.conn, "send_backpressure", None)
+        return backpressure is None or backpressure.wait_writable()
+
+    def _put_pending_audio(self, sentence_type, audio_datas, text):
+        """已就绪的音频也经过顺序队列，保证排在之前提交的句子之后"""
+        self.tts_pending_queue.put(
+            (self._pending_generation, sentence_type, audio_datas, text)
+        )
+
+    def _cancel_pending_segments(self):
+        """打断时丢弃所有排队中的句子，取消尚未开始的合成"""
+        self._pending_generation += 1
+        while True:
+            try:
+                _, _, audio_datas, _ = self.tts_pending_queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(audio_datas, concurrent.futures.Future):
+                audio_datas.cancel()
+            elif isinstance(audio_datas, _StreamingSegment):
+                audio_datas.future.cancel()
+
+    def _tts_ordered_delivery_thread(self):
+        """按提交顺序等待合成结果，依次送入播放队列"""
+        while not self.conn.stop_event.is_set():
+            try:
+                generation, sentence_type, audio_datas, text = (
+                    self.tts_pending_queue.get(timeout=1)
+                )
+            except queue.Empty:
+                continue
+            try:
+                if isinstance(audio_datas, _StreamingSegment):
+                    self._deliver_streaming_segment(
+                        generation, sentence_type, audio_datas, text
+                    )
+                    continue
+                if isinstance(audio_datas, concurrent.futures.Future):
+                    audio_datas = audio_datas.result()
+                    if not audio_datas:
+                        continue
+                if self.conn.client_abort:
+                    self._cancel_pending_segments()
+                    continue
+                if generation != self._pending_generation:
+                    continue
+                if not self._wait_writable():
+                    continue
+                self.tts_audio_queue.put((sentence_type, audio_datas, text))
+            except concurrent.futures.CancelledError:
+                continue
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"TTS合成失败: {text} {e}")
+
+    def _deliver_streaming_segment(self, generation, sentence_type, segment, text):
+        """合成中的句子边到达边送入播放队列，第一批帧带句子文本"""
+        first = True
+        finished = False
+        while not finished and not self.conn.stop_event.is_set():
+            try:
+                batch = segment.batches.get(timeout=1)
+            except queue.Empty:
+                if segment.future.cancelled() or generation != self._pending_generation:
+                    return
+                continue
+            if batch is None:
+                break
+            # 合并已经到达的批次，减少句子消息数量
+            batch = list(batch)
+            while True:
+                try:
+                    more = segment.batches.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    finished = True
+                    break
+                batch.extend(more)
+            if self.conn.client_abort:
+                self._cancel_pending_segments()
+                return
+            if generation != self._pending_generation:
+                return
+            if not self._wait_writable():
+                return
+            self.tts_audio_queue.put(
+                (SentenceType.MIDDLE, batch, text if first else None)
+            )
+            first = False
+        if not first and sentence_type == SentenceType.LAST:
+            self.tts_audio_queue.put((SentenceType.LAST, [], None))
+
     def _audio_play_priority_thread(self):
         while not self.conn.stop_event.is_set():
             text = None
@@ -283,6 +649,10 @@ class TTSProviderBase(ABC):
                     f"audio_play_priority priority_thread: {text} {e}"
                 )
 
+    def prewarm(self):
+        """用户开始说话时调用，流式TTS可重写以提前建立上游连接"""
+        pass
+
     async def start_session(self, session_id):
         pass
 
@@ -294,145 +664,18 @@ class TTSProviderBase(ABC):
         if hasattr(self, "ws") and self.ws:
             await self.ws.close()
 
-    # def _get_segment_text(self):
-    #     # 合并当前全部文本并处理未分割部分
-    #     full_text = "".join(self.tts_text_buff)
-    #     current_text = full_text[self.processed_chars :]  # 从未处理的位置开始
-    #     last_punct_pos = -1
-    #
-    #     # 根据是否是第一句话选择不同的标点符号集合
-    #     punctuations_to_use = (
-    #         self.first_sentence_punctuations
-    #         if self.is_first_sentence
-    #         else self.punctuations
-    #     )
-    #
-    #     for punct in punctuations_to_use:
-    #         pos = current_text.rfind(punct)
-    #         if (pos != -1 and last_punct_pos == -1) or (
-    #             pos != -1 and pos < last_punct_pos
-    #         ):
-    #             last_punct_pos = pos
-    #
-    #     if last_punct_pos != -1:
-    #         segment_text_raw = current_text[: last_punct_pos + 1]
-    #         segment_text = textUtils.get_string_no_punctuation_or_emoji(
-    #             segment_text_raw
-    #         )
-    #         self.processed_chars += len(segment_text_raw)  # 更新已处理字符位置
-    #
-    #         # 如果是第一句话，在找到第一个逗号后，将标志设置为False
-    #         if self.is_first_sentence:
-    #             self.is_first_sentence = False
-    #
-    #         return segment_text
-    #     elif self.tts_stop_request and current_text:
-    #         segment_text = current_text
-    #         self.is_first_sentence = True  # 重置标志
-    #         return segment_text
-    #     else:
-    #         return None
-
-    def _get_segment_text(self):
-        # 合并当前全部文本并处理未分割部分
-        full_text = "".join(self.tts_text_buff).strip()
-
-        # 处理回复中的被"*"包括的语气、动作、环境描述
-        if "*" in full_text:
-            if full_text.count("*") % 2 == 1:
-                return None
-            else:
-                # 新的成对的 "*"
-                if self.number_of_symbols != full_text.count("*"):
-                    # 找出所有 *...* 格式的字符串
-                    matches = re.findall(r'\*[^*]*\*', full_text)
-                    if matches:
-                        last_match = matches[-1]  # 取最后一个匹配项
-                        length = len(last_match)  # 获取其长度
-                        # 更改索引的位置
-                        self.processed_chars = self.processed_chars + length
-                        self.number_of_symbols = full_text.count("*")
-                    # 清除所有 *...* 包含的内容
-                    full_text = re.sub(r'\*[^*]*\*', '', full_text)
-
-        # 判断是否有不成对的括号
-        single_bracket = self.has_unpaired_brackets(full_text)
-        if single_bracket:
-            return None
-
-        skip_text_len = 0
-
-        # 判断是否有双括号
-        found, brackets = self.has_paired_brackets(full_text)
-        if found and len(self.brackets_arr) < len(brackets) and len(brackets) > 0:
-            # 有括号, 且是新的括号
-            self.brackets_arr = brackets
-
-            skip_text_len = len(full_text) - self.processed_chars - len(brackets[-1])
-            skip_text = full_text[self.processed_chars : (self.processed_chars+skip_text_len)]
-            self.before_text_arr.append(skip_text)
-
-            # 将新的括号及内容所占字符的个数加到开始索引上
-            self.processed_chars = self.processed_chars + len(brackets[-1]) + skip_text_len
-
-
-        current_text = "".join(self.before_text_arr) + full_text[self.processed_chars:]
-
-
-
-        # 去除'”'后,如果为空字符串返回None
-        if self.is_text_empty_after_removing_quotes(current_text):
-            return None
-
-        last_punct_pos = -1
-
-
-        # 根据是否是第一句话选择不同的标点符号集合
-        punctuations_to_use = (
-            self.first_sentence_punctuations
-            if self.is_first_sentence
-            else self.punctuations
-        )
+    def _get_segments(self, text):
+        """送入LLM新输出的文本，返回已经完整、可以合成的句子"""
+        if not text:
+            return []
+        return self.segmenter.feed(text)
 
-        for punct in punctuations_to_use:
-            pos = current_text.rfind(punct)
-            if (pos != -1 and last_punct_pos == -1) or (
-                pos != -1 and pos < last_punct_pos
-            ):
-                last_punct_pos = pos
-
-        if last_punct_pos != -1:
-            segment_text_raw = current_text[: last_punct_pos + 1]
-            segment_text = textUtils.get_string_no_punctuation_or_emoji(
-                segment_text_raw
-            )
-            # processed_chars的长度中已经包含了text_before_brackets的长度
-            self.processed_chars = self.processed_chars + len(segment_text_raw) - sum(len(item) for item in self.before_text_arr)  # 更新已处理字符位置
-
-            # 如果是第一句话，在找到第一个逗号后，将标志设置为False
-            if self.is_first_sentence:
-                self.is_first_sentence = False
-
-            self.text_before_brackets = ""  # 重置
-            self.before_text_arr = []  # 重置
-            return segment_text
-        elif self.tts_stop_request and current_text:
-            segment_text = self.remove_parentheses(current_text)
-            self.is_first_sentence = True  # 重置标志
-            self.brackets_arr = []  # 重置
-            self.text_before_brackets = ""  # 重置
-            self.before_text_arr = []  # 重置
-            self.number_of_symbols = 0  # 重置
-            return segment_text
-        else:
-            return None
-
-    def _process_audio_file(self, tts_file):
+    def _process_audio_file(self, tts_file, postprocess=False):
         """处理音频文件并转换为指定格式
 
         Args:
             tts_file: 音频文件路径
-            content_detail: 内容详情
+            postprocess: 是否对合成的语音做去静音和响度归一化
 
         Returns:
             tuple: (sentence_type, audio_datas, content_detail)
@@ -440,9 +683,9 @@ class TTSProviderBase(ABC):
         if tts_file.endswith(".p3"):
             audio_datas, _ = p3.decode_opus_from_file(tts_file)
         elif self.conn.audio_format == "pcm":
-            audio_datas, _ = self.audio_to_pcm_data(tts_file)
+            audio_datas, _ = self.audio_to_pcm_data(tts_file, postprocess)
         else:
-            audio_datas, _ = self.audio_to_opus_data(tts_file)
+            audio_datas, _ = self.audio_to_opus_data(tts_file, postprocess)
 
         if (
             self.delete_audio_file
@@ -465,110 +708,9 @@ class TTSProviderBase(ABC):
         Returns:
             bool: 是否成功处理了文本
         """
-        full_text = "".join(self.tts_text_buff).strip()
-        remaining_text = "".join(self.before_text_arr) + full_text[self.processed_chars :]
-        # 去除单个单引号,若去除单引号后长度为0,返回false,否则将单引号传递给TTS合成会报错
-        if self.is_text_empty_after_removing_quotes(remaining_text):
-            return False
-        if remaining_text:
-            segment_text = textUtils.get_string_no_punctuation_or_emoji(remaining_text)
-            if segment_text:
-                if self.delete_audio_file:
-                    audio_datas = self.to_tts(segment_text)
-                    if audio_datas:
-                        self.tts_audio_queue.put(
-                            (SentenceType.MIDDLE, audio_datas, segment_text)
-                        )
-                else:
-                    tts_file = self.to_tts(segment_text)
-                    audio_datas = self._process_audio_file(tts_file)
-                    self.tts_audio_queue.put(
-                        (SentenceType.MIDDLE, audio_datas, segment_text)
-                    )
-                self.processed_chars += len(full_text)
-                return True
-        return False
-
-
-    """
-    判断文本中是否有单括号(中文括号、英文括号)
-    """
-    def has_unpaired_brackets(self, text):
-        stack = []
-
-        for char in text:
-            if char == '(' or char == '（':
-                stack.append(char)
-            elif char == ')' or char == '）':
-                if not stack:
-                    # 没有对应的左括号
-                    return True
-                left = stack.pop()
-                # 判断是否匹配（严格匹配中英文）
-                if (char == ')' and left != '(') or (char == '）' and left != '（'):
-                    return True
-
-        # 最后栈里还有未匹配的左括号
-        return len(stack) > 0
-
-    """
-    判断文本中是否有成对的括号(中文括号、英文括号)
-    """
-
-    def has_paired_brackets(self, text):
-        matched_brackets = []  # 存储所有找到的完整括号内容
-
-        # 记录每个左括号的位置和类型
-        bracket_positions = []
-
-        for i, char in enumerate(text):
-            if char == '(' or char == '（':
-                bracket_positions.append((i, char))  # 保存位置和类型
-            elif char == ')' and bracket_positions:
-                start_idx, open_char = bracket_positions.pop()
-                if open_char == '(':
-                    end_idx = i + 1
-                    matched_brackets.append(text[start_idx:end_idx])
-            elif char == '）' and bracket_positions:
-                start_idx, open_char = bracket_positions.pop()
-                if open_char == '（':
-                    end_idx = i + 1
-                    matched_brackets.append(text[start_idx:end_idx])
-
-        found = len(matched_brackets) > 0
-        return found, matched_brackets
-
-    def remove_parentheses(self, text):
-        if text is None or len(text) == 0:
-            return None  # 输入为空或 None 时直接返回 None
-
-        # 步骤 1: 删除括号及括号中的内容（支持中英文）
-        pattern_parentheses = r'（[^）]*）|$[^)]*$'
-        text = re.sub(pattern_parentheses, '', text)
-
-        # 步骤 2: 删除所有单引号 “ 和 ”
-        text = text.replace('“', '').replace('”', '')
-
-        # 步骤 3: 去除首尾空白字符
-        cleaned_text = text.strip()
-
-        # 步骤 4: 如果最终文本为空，返回 None
-        if not cleaned_text:
-            return None
-
-        return cleaned_text
-
-    def is_text_empty_after_removing_quotes(self, text):
-        if not text:  # 如果是 None 或空字符串
+        segment_text = self.segmenter.flush()
+        if segment_text:
+            self._submit_segment(SentenceType.MIDDLE, segment_text)
             return True
+        return False
 
-        # 删除所有类型的单引号（中文、英文、左右引号）
-        text_cleaned = text.replace('“', '') \
-            .replace('”', '') \
-            .replace("'", '') \
-            .replace('‘', '') \
-            .replace('’', '') \
-            .strip()
-
-        # 判断清理后是否为空
-        return len(text_cleaned) == 0
\ No newline at end of file
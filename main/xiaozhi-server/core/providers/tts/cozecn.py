@@ -1,4 +1,3 @@
-import requests
 from core.providers.tts.base import TTSProviderBase
 
 
@@ -29,14 +28,8 @@ class TTSProvider(TTSProviderBase):
         }
 
         try:
-            response = requests.request(
-                "POST", self.api_url, json=request_json, headers=headers
+            return await self.fetch_audio(
+                "POST", self.api_url, output_file, json=request_json, headers=headers
             )
-            data = response.content
-            if output_file:
-                with open(output_file, "wb") as file_to_save:
-                    file_to_save.write(data)
-            else:
-                return data
         except Exception as e:
             raise Exception(f"{__name__} error: {e}")
@@ -1,9 +1,9 @@
 import os
 import json
 import uuid
-import requests
 from config.logger import setup_logging
 from datetime import datetime
+from core.utils import http_client
 from core.providers.tts.base import TTSProviderBase
 from config.config_loader import read_config, get_project_dir, load_config
 
@@ -65,19 +65,14 @@ class TTSProvider(TTSProviderBase):
         voice_type = request_body.get("voiceType", "fixed")
 
         if voice_type  == "fixed":
-            resp = requests.post(self.url, headers=self.headers, data=json.dumps(request_body, ensure_ascii=False).encode('utf-8'))
+            request_kwargs = {"headers": self.headers, "data": json.dumps(request_body, ensure_ascii=False).encode('utf-8')}
         elif voice_type  == "clone":
-            resp = requests.post(self.url, json=request_body)
+            request_kwargs = {"json": request_body}
 
-        if resp.status_code == 200:
-            if output_file:
-                with open(output_file, "wb") as file:
-                    file.write(resp.content)
-            else:
-                return resp.content
-
-        else:
-            error_msg = f"Custom TTS请求失败: {resp.status_code} - {resp.text}"
+        try:
+            return await self.fetch_audio("POST", self.url, output_file, **request_kwargs)
+        except http_client.HttpStatusError as e:
+            error_msg = f"Custom TTS请求失败: {e.status} - {e.content.decode('utf-8', errors='replace')}"
             logger.bind(tag=TAG).error(error_msg)
             raise Exception(error_msg)  # 抛出异常，让调用方捕获
 
@@ -1,7 +1,7 @@
 import uuid
 import json
 import base64
-import requests
+from core.utils import http_client
 from core.utils.util import check_model_key
 from core.providers.tts.base import TTSProviderBase
 from config.logger import setup_logging
@@ -67,11 +67,16 @@ class TTSProvider(TTSProviderBase):
         }
 
         try:
-            resp = requests.post(
-                self.api_url, json.dumps(request_json), headers=self.header
+            resp = await http_client.request(
+                "POST",
+                self.api_url,
+                timeout=self.tts_timeout,
+                data=json.dumps(request_json),
+                headers=self.header,
             )
-            if "data" in resp.json():
-                data = resp.json()["data"]
+            resp_json = resp.json()
+            if "data" in resp_json:
+                data = resp_json["data"]
                 audio_bytes = base64.b64decode(data)
                 if output_file:
                     with open(output_file, "wb") as file_to_save:
@@ -80,7 +85,7 @@ class TTSProvider(TTSProviderBase):
                     return audio_bytes
             else:
                 raise Exception(
-                    f"{__name__} status_code: {resp.status_code} response: {resp.content}"
+                    f"{__name__} status_code: {resp.status} response: {resp.content}"
                 )
         except Exception as e:
             raise Exception(f"{__name__} error: {e}")
@@ -20,9 +20,15 @@ class TTSProvider(TTSProviderBase):
             f"tts-{datetime.now().date()}@{uuid.uuid4().hex}{extension}",
         )
 
+    async def stream_audio(self, text):
+        """边合成边返回mp3音频块"""
+        communicate = edge_tts.Communicate(text, voice=self.voice)
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":  # 只处理音频数据块
+                yield chunk["data"]
+
     async def text_to_speak(self, text, output_file):
         try:
-            communicate = edge_tts.Communicate(text, voice=self.voice)
             if output_file:
                 # 确保目录存在并创建空文件
                 os.makedirs(os.path.dirname(output_file), exist_ok=True)
@@ -31,16 +37,11 @@ class TTSProvider(TTSProviderBase):
 
                 # 流式写入音频数据
                 with open(output_file, "ab") as f:  # 改为追加模式避免覆盖
-                    async for chunk in communicate.stream():
-                        if chunk["type"] == "audio":  # 只处理音频数据块
-                            f.write(chunk["data"])
+                    async for data in self.stream_audio(text):
+                        f.write(data)
             else:
                 # 返回音频二进制数据
-                audio_bytes = b""
-                async for chunk in communicate.stream():
-                    if chunk["type"] == "audio":
-                        audio_bytes += chunk["data"]
-                return audio_bytes
+                return b"".join([data async for data in self.stream_audio(text)])
         except Exception as e:
             error_msg = f"Edge TTS请求失败: {e}"
             raise Exception(error_msg)  # 抛出异常，让调用方捕获
\ No newline at end of file
@@ -0,0 +1,455 @@
+"""
+TTS故障转移与对冲请求
+按TTS配置名称统计每个服务的整句合成耗时p95和错误率（全服务共享），连续失败或错误率过高时熔断，
+熔断期间直接使用备用TTS，冷却后放行一个探测请求，成功即恢复。
+一轮回复的第一句话如果在对冲时限内还没有返回音频，同时向下一个TTS发起请求，取先返回的结果；
+第一句话确定本轮使用的TTS之前，提前合成的后续句子等待它的结果，不各自对冲；
+确定了本轮使用的TTS后，后续句子只在出错时才切换，保证同一轮回复的音色一致。
+主TTS支持流式合成时同样经过路由：按首包耗时p95对冲，流式产出第一批帧即视为返回。
+"""
+
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from config.logger import setup_logging
+from core.utils.util import audio_bytes_to_data
+from core.utils.event_loop import run_in_thread_loop
+from core.utils.tts import MarkdownCleaner, create_instance
+from core.providers.tts.dto.dto import InterfaceType
+
+TAG = __name__
+logger = setup_logging()
+
+# 对冲时限的下限（秒），避免p95很小时几乎每句都发出两个请求
+MIN_HEDGE_DELAY = 0.3
+
+DEFAULT_SETTINGS = {
+    "hedge_delay": 1.5,
+    "window": 50,
+    "consecutive_failures": 3,
+    "error_rate_threshold": 0.5,
+    "open_seconds": 30,
+}
+
+
+class ProviderHealth:
+    """单个TTS服务的健康统计与熔断状态，多个连接、多个线程共享"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, settings: dict):
+        self.name = name
+        self.settings = settings
+        self._lock = threading.Lock()
+        # 整句合成耗时，对冲时限按它计算
+        self._latencies = deque(maxlen=int(settings["window"]))
+        # 流式合成的首包耗时，只用于观测
+        self._stream_latencies = deque(maxlen=int(settings["window"]))
+        self._outcomes = deque(maxlen=int(settings["window"]))
+        self._consecutive_failures = 0
+        self.state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_at = None
+
+    def allow_request(self) -> bool:
+        """熔断器是否放行请求，冷却结束后只放行一个探测请求"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.settings["open_seconds"]:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probe_at = None
+            # 探测请求迟迟没有结果（例如被对冲取消）时允许再次探测
+            now = time.monotonic()
+            if (
+                self._probe_at is not None
+                and now - self._probe_at < self.settings["open_seconds"]
+            ):
+                return False
+            self._probe_at = now
+            return True
+
+    def record_success(self, latency: float, streaming: bool = False) -> None:
+        """
+        :param latency: 整句合成耗时，流式合成时为首包耗时
+        :param streaming: 流式合成，首包耗时与整句耗时不可比，单独统计
+        """
+        with self._lock:
+            if streaming:
+                self._stream_latencies.append(latency)
+            else:
+                self._latencies.append(latency)
+            self._outcomes.append(True)
+            self._consecutive_failures = 0
+            if self.state != self.CLOSED:
+                logger.bind(tag=TAG).info(f"TTS服务已恢复，关闭熔断: {self.name}")
+            self.state = self.CLOSED
+            self._probe_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._outcomes.append(False)
+            self._consecutive_failures += 1
+            if self.state == self.OPEN:
+                return
+            if (
+                self.state == self.HALF_OPEN
+                or self._consecutive_failures >= self.settings["consecutive_failures"]
+                or self._error_rate_exceeded()
+            ):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_at = None
+                logger.bind(tag=TAG).warning(
+                    f"TTS服务熔断{self.settings['open_seconds']}秒: {self.name}，"
+                    f"连续失败{self._consecutive_failures}次，错误率{self._error_rate():.0%}"
+                )
+
+    def _error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def _error_rate_exceeded(self) -> bool:
+        # 样本太少时错误率没有参考意义
+        return (
+            len(self._outcomes) >= self._outcomes.maxlen // 2
+            and self._error_rate() >= self.settings["error_rate_threshold"]
+        )
+
+    def p95(self, streaming: bool = False) -> Optional[float]:
+        """最近成功请求整句合成（streaming为True时为流式首包）耗时的p95（秒），没有样本时返回None"""
+        with self._lock:
+            samples = self._stream_latencies if streaming else self._latencies
+            if not samples:
+                return None
+            latencies = sorted(samples)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    def snapshot(self) -> dict:
+        p95 = self.p95()
+        stream_p95 = self.p95(streaming=True)
+        with self._lock:
+            return {
+                "state": self.state,
+                "p95": p95,
+                "stream_p95": stream_p95,
+                "error_rate": self._error_rate(),
+                "samples": len(self._outcomes),
+            }
+
+
+_health: Dict[str, ProviderHealth] = {}
+_health_lock = threading.Lock()
+
+
+def get_provider_health(name: str, settings: dict = None) -> ProviderHealth:
+    """获取TTS服务的健康统计，同名TTS在所有连接间共享"""
+    with _health_lock:
+        health = _health.get(name)
+        if health is None:
+            health = ProviderHealth(name, settings or DEFAULT_SETTINGS)
+            _health[name] = health
+        return health
+
+
+class TTSRouter:
+    """每个连接一个，在主TTS和备用TTS之间选择、对冲、故障转移"""
+
+    def __init__(self, primary, routes: List[Tuple[str, object]], settings: dict):
+        """
+        :param primary: 连接的主TTS实例
+        :param routes: [(TTS配置名称, TTS实例)]，第一个是主TTS
+        """
+        self.primary = primary
+        self.routes = routes
+        self.hedge_delay = float(settings["hedge_delay"])
+        self.health = {name: get_provider_health(name, settings) for name, _ in routes}
+        self._lock = threading.Lock()
+        self._turn_route = None
+        # 本轮第一句话正在选择TTS时不为None，其他句子等待它完成
+        self._routing: Optional[threading.Event] = None
+        self._turn = 0
+
+    def new_turn(self) -> None:
+        """新一轮回复开始，重新选择TTS"""
+        with self._lock:
+            self._turn_route = None
+            self._turn += 1
+            if self._routing is not None:
+                # 上一轮还在等待选择结果的句子不再等待
+                self._routing.set()
+                self._routing = None
+
+    def _acquire_route(self):
+        """
+        取本轮使用的TTS，返回(路由, 本轮序号, 选路事件)
+        尚未确定时第一个调用者得到选路事件，负责对冲选路，其他调用者等待它的结果
+        """
+        waited = False
+        while True:
+            with self._lock:
+                pinned, turn, routing = self._turn_route, self._turn, self._routing
+                if pinned is None and routing is None and not waited:
+                    self._routing = threading.Event()
+                    return None, turn, self._routing
+            if pinned is not None or routing is None or waited:
+                return pinned, turn, None
+            # 第一句话失败时没有确定路由，等待方不再对冲，按健康状态依次尝试
+            waited = not routing.wait(self.primary.tts_timeout * len(self.routes))
+            waited = waited or self._turn_route is None
+
+    def _release_route(self, routing) -> None:
+        with self._lock:
+            if self._routing is routing:
+                self._routing = None
+        routing.set()
+
+    def _candidates(self, pinned) -> List[Tuple[str, object]]:
+        ordered = [pinned] if pinned else []
+        ordered.extend(route for route in self.routes if route is not pinned)
+        available = [route for route in ordered if self.health[route[0]].allow_request()]
+        # 全部熔断时仍然尝试，总比不出声好
+        return available or ordered[:1]
+
+    def _hedge_after(self, route, streaming: bool = False) -> float:
+        p95 = self.health[route[0]].p95(streaming)
+        if p95 is None:
+            return self.hedge_delay
+        return max(MIN_HEDGE_DELAY, min(self.hedge_delay, p95))
+
+    async def _attempt(self, route, text, timeout):
+        name, provider = route
+        output_file = None if self.primary.delete_audio_file else provider.generate_filename()
+        start = time.monotonic()
+        try:
+            result = await asyncio.wait_for(provider.text_to_speak(text, output_file), timeout)
+            if output_file:
+                result = output_file if os.path.exists(output_file) else None
+            if not result:
+                raise ValueError("未返回音频")
+        except asyncio.CancelledError:
+            # 对冲中落后的请求被取消，不计入失败
+            self._remove(output_file)
+            raise
+        except Exception as e:
+            self.health[name].record_failure()
+            self._remove(output_file)
+            logger.bind(tag=TAG).warning(f"语音生成失败[{name}]: {text}，错误: {e}")
+            return None
+        self.health[name].record_success(time.monotonic() - start)
+        return route, result
+
+    @staticmethod
+    def _remove(output_file):
+        if output_file and os.path.exists(output_file):
+            os.remove(output_file)
+
+    def _launch(self, route, text, timeout, open_stream):
+        """发起一个候选的请求，返回(首个音频的Future, 请求任务)"""
+        if open_stream is not None and route[1] is self.primary:
+            return self._launch_stream(route, timeout, open_stream)
+        task = asyncio.ensure_future(self._attempt(route, text, timeout))
+        return task, task
+
+    def _launch_stream(self, route, timeout, open_stream):
+        """
+        主TTS流式合成，产出第一批帧时first完成，之后任务继续推送直到结束
+        任务结果为流式合成是否完整结束
+        """
+        name = route[0]
+        first = asyncio.get_running_loop().create_future()
+        start = time.monotonic()
+
+        def claim() -> bool:
+            # 第一批帧交付之前调用，其他候选已经胜出时返回False
+            if first.cancelled():
+                return False
+            if not first.done():
+                self.health[name].record_success(time.monotonic() - start, streaming=True)
+                first.set_result((route, None))
+            return True
+
+        async def run():
+            try:
+                completed = await asyncio.wait_for(open_stream(claim), timeout)
+                if not first.done():
+                    raise ValueError("未返回音频")
+                return completed
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not first.done():
+                    self.health[name].record_failure()
+                    first.set_result(None)
+                logger.bind(tag=TAG).warning(f"流式语音生成失败[{name}]，错误: {e}")
+                return False
+
+        return first, asyncio.ensure_future(run())
+
+    async def _race(self, text, candidates, hedge, timeout, open_stream=None):
+        """
+        依次尝试候选TTS：出错立即换下一个，开启对冲时超过时限也发起下一个
+        :return: (路由, 整句音频, 流式合成是否完整结束)，流式胜出时音频已经交付，整句音频为None
+        """
+        remaining = list(candidates)
+        # 首个音频的Future -> 请求任务
+        pending = {}
+        hedged = False
+
+        def launch_next():
+            first, task = self._launch(remaining.pop(0), text, timeout, open_stream)
+            pending[first] = task
+
+        launch_next()
+        winner = None
+        try:
+            while pending and winner is None:
+                wait_for = None
+                if hedge and not hedged and remaining:
+                    streaming = open_stream is not None and candidates[0][1] is self.primary
+                    wait_for = self._hedge_after(candidates[0], streaming)
+                done, _ = await asyncio.wait(
+                    pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedged = True
+                    logger.bind(tag=TAG).info(
+                        f"TTS[{candidates[0][0]}]超过{wait_for:.2f}s未返回，"
+                        f"对冲请求[{remaining[0][0]}]: {text}"
+                    )
+                    launch_next()
+                    continue
+                # 等待返回之后其他请求可能也已完成，已经交付了帧的流式合成优先
+                done = sorted(
+                    (first for first in pending if first.done()),
+                    key=lambda first: first is pending[first],
+                )
+                for first in done:
+                    task = pending.pop(first)
+                    if first.result():
+                        winner = first.result(), task
+                        break
+                if winner is None and not pending and remaining:
+                    launch_next()
+            if winner is None:
+                return None
+            (route, result), task = winner
+        finally:
+            for first, other in pending.items():
+                first.cancel()
+                other.cancel()
+            if pending:
+                await asyncio.gather(*pending.values(), return_exceptions=True)
+        if result is None:
+            # 流式合成胜出，继续推送到结束
+            return route, None, await task
+        return route, result, True
+
+    def _route(self, text, open_stream=None):
+        """按本轮的路由合成一句话，第一句话负责对冲选路并确定本轮使用的TTS"""
+        pinned, turn, routing = self._acquire_route()
+        try:
+            candidates = self._candidates(pinned)
+            # 只有负责选路的第一句话对冲
+            hedge = routing is not None and self.hedge_delay > 0
+            winner = run_in_thread_loop(
+                self._race(text, candidates, hedge, self.primary.tts_timeout, open_stream)
+            )
+            if winner is not None:
+                route = winner[0]
+                with self._lock:
+                    if self._turn == turn and self._turn_route in (None, pinned):
+                        if pinned is not None and route is not pinned:
+                            logger.bind(tag=TAG).warning(
+                                f"TTS[{pinned[0]}]不可用，本轮回复改用[{route[0]}]"
+                            )
+                        self._turn_route = route
+        finally:
+            if routing is not None:
+                self._release_route(routing)
+        if winner is None:
+            logger.bind(tag=TAG).error(f"语音生成失败: {text}，请检查网络或服务是否正常")
+        return winner
+
+    def _to_audio_datas(self, route, result):
+        provider = route[1]
+        if self.primary.delete_audio_file:
+            audio_datas, _ = audio_bytes_to_data(
+                result,
+                file_type=provider.audio_file_type,
+                is_opus=True,
+                postprocess=True,
+                **self.primary.device_opus_params(),
+            )
+            return audio_datas
+        return self.primary._process_audio_file(result, postprocess=True)
+
+    def synthesize(self, text):
+        """
+        合成一句话
+        :return: (音频帧, 是否由主TTS合成)，备用TTS的音色不同，结果不能写入主TTS的缓存
+        """
+        winner = self._route(MarkdownCleaner.clean_markdown(text))
+        if winner is None:
+            return None, False
+        route, result, _ = winner
+        return self._to_audio_datas(route, result), route[1] is self.primary
+
+    def stream(self, text, open_stream):
+        """
+        主TTS流式合成一句话，备用TTS整句合成
+        :param open_stream: open_stream(claim)返回流式合成的协程，交付第一批帧之前调用claim()，
+                            返回False时说明备用TTS已经胜出，应放弃这句话
+        :return: (备用TTS合成的音频帧, 流式合成是否完整结束)；流式胜出时音频帧为None，
+                 帧已经由流式合成交付
+        """
+        winner = self._route(MarkdownCleaner.clean_markdown(text), open_stream)
+        if winner is None:
+            return None, False
+        route, result, completed = winner
+        if result is None:
+            return None, completed
+        return self._to_audio_datas(route, result), False
+
+def build_tts_router(primary, config: dict) -> Optional[TTSRouter]:
+    """根据tts_failover配置为连接的主TTS创建路由，未配置备用TTS或主TTS为流式接口时返回None"""
+    failover_config = config.get("tts_failover") or {}
+    fallbacks = failover_config.get("fallbacks") or []
+    if not fallbacks or primary.interface_type != InterfaceType.NON_STREAM:
+        return None
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update({k: v for k, v in failover_config.items() if k in DEFAULT_SETTINGS})
+
+    primary_name = config["selected_module"]["TTS"]
+    routes = [(primary_name, primary)]
+    for name in fallbacks:
+        if name == primary_name:
+            continue
+        tts_config = config.get("TTS", {}).get(name)
+        if not tts_config:
+            logger.bind(tag=TAG).warning(f"备用TTS未配置，已忽略: {name}")
+            continue
+        try:
+            provider = create_instance(
+                tts_config.get("type", name), tts_config, primary.delete_audio_file
+            )
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"备用TTS初始化失败: {name}，错误: {e}")
+            continue
+        if provider.interface_type != InterfaceType.NON_STREAM:
+            logger.bind(tag=TAG).warning(f"备用TTS只支持非流式接口，已忽略: {name}")
+            continue
+        # 备用TTS由路由直接调用合成接口，只绑定连接，不启动自己的消化线程
+        provider.bind_connection(primary.conn)
+        routes.append((name, provider))
+    if len(routes) == 1:
+        return None
+    return TTSRouter(primary, routes, settings)
@@ -1,11 +1,11 @@
 import base64
-import requests
 import ormsgpack
 from pathlib import Path
 from pydantic import BaseModel, Field, conint, model_validator
 from typing_extensions import Annotated
 from typing import Literal
 from core.utils.util import check_model_key, parse_string_to_list
+from core.utils import http_client
 from core.providers.tts.base import TTSProviderBase
 from config.logger import setup_logging
 
@@ -161,28 +161,21 @@ class TTSProvider(TTSProviderBase):
 
         pydantic_data = ServeTTSRequest(**data)
 
-        response = requests.post(
-            self.api_url,
-            data=ormsgpack.packb(
-                pydantic_data, option=ormsgpack.OPT_SERIALIZE_PYDANTIC
-            ),
-            headers={
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/msgpack",
-            },
-        )
-
-        if response.status_code == 200:
-            audio_content = response.content
-
-            if output_file:
-                with open(output_file, "wb") as audio_file:
-                    audio_file.write(audio_content)
-            else:
-                return audio_content
-
-        else:
-            error_msg = f"Request failed with status code {response.status_code}"
+        try:
+            return await self.fetch_audio(
+                "POST",
+                self.api_url,
+                output_file,
+                data=ormsgpack.packb(
+                    pydantic_data, option=ormsgpack.OPT_SERIALIZE_PYDANTIC
+                ),
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/msgpack",
+                },
+            )
+        except http_client.HttpStatusError as e:
+            error_msg = f"Request failed with status code {e.status}"
             print(error_msg)
-            print(response.json())
+            print(e.content.decode("utf-8", errors="replace"))
             raise Exception(error_msg)
@@ -1,4 +1,4 @@
-import requests
+from core.utils import http_client
 from config.logger import setup_logging
 from core.providers.tts.base import TTSProviderBase
 from core.utils.util import parse_string_to_list
@@ -90,14 +90,11 @@ class TTSProvider(TTSProviderBase):
             "repetition_penalty": self.repetition_penalty,
         }
 
-        resp = requests.post(self.url, json=request_json)
-        if resp.status_code == 200:
-            if output_file:
-                with open(output_file, "wb") as file:
-                    file.write(resp.content)
-            else:
-                return resp.content
-        else:
-            error_msg = f"GPT_SoVITS_V2 TTS请求失败: {resp.status_code} - {resp.text}"
+        try:
+            return await self.fetch_audio(
+                "POST", self.url, output_file, json=request_json
+            )
+        except http_client.HttpStatusError as e:
+            error_msg = f"GPT_SoVITS_V2 TTS请求失败: {e.status} - {e.content.decode('utf-8', errors='replace')}"
             logger.bind(tag=TAG).error(error_msg)
             raise Exception(error_msg)
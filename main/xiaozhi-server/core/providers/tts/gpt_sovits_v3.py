@@ -1,4 +1,4 @@
-import requests
+from core.utils import http_client
 from config.logger import setup_logging
 from core.providers.tts.base import TTSProviderBase
 from core.utils.util import parse_string_to_list
@@ -51,14 +51,16 @@ class TTSProvider(TTSProviderBase):
             "if_sr": self.if_sr,
         }
 
-        resp = requests.get(self.url, params=request_params)
-        if resp.status_code == 200:
-            if output_file:
-                with open(output_file, "wb") as file:
-                    file.write(resp.content)
-            else:
-                return resp.content
-        else:
-            error_msg = f"GPT_SoVITS_V3 TTS请求失败: {resp.status_code} - {resp.text}"
+        # 与requests的编码方式保持一致：列表展开为重复参数，None不传
+        query = []
+        for key, value in request_params.items():
+            for item in value if isinstance(value, list) else [value]:
+                if item is not None:
+                    query.append((key, str(item)))
+
+        try:
+            return await self.fetch_audio("GET", self.url, output_file, params=query)
+        except http_client.HttpStatusError as e:
+            error_msg = f"GPT_SoVITS_V3 TTS请求失败: {e.status} - {e.content.decode('utf-8', errors='replace')}"
             logger.bind(tag=TAG).error(error_msg)
             raise Exception(error_msg)
@@ -5,11 +5,13 @@ import queue
 import asyncio
 import traceback
 import websockets
+from websockets.protocol import State
 from core.utils.tts import MarkdownCleaner
 from config.logger import setup_logging
 from core.utils import opus_encoder_utils
 from core.utils.util import check_model_key
 from core.providers.tts.base import TTSProviderBase
+from core.providers.tts.warm_connection import WarmConnection
 from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
 from asyncio import Task
 
@@ -139,6 +141,9 @@ class Response:
 
 
 class TTSProvider(TTSProviderBase):
+    # 服务端关闭空闲连接的时间（秒）
+    WARM_IDLE_TIMEOUT = 60
+
     def __init__(self, config, delete_audio_file):
         super().__init__(config, delete_audio_file)
         self.ws = None
@@ -160,6 +165,7 @@ class TTSProvider(TTSProviderBase):
         self.opus_encoder = opus_encoder_utils.OpusEncoderUtils(
             sample_rate=16000, channels=1, frame_size_ms=60
         )
+        self.warm_connection = WarmConnection(self._connect, self.WARM_IDLE_TIMEOUT)
         model_key_msg = check_model_key("TTS", self.access_token)
         if model_key_msg:
             logger.bind(tag=TAG).error(model_key_msg)
@@ -172,22 +178,35 @@ class TTSProvider(TTSProviderBase):
             self.ws = None
             raise
 
+    async def _connect(self):
+        ws_header = {
+            "X-Api-App-Key": self.appId,
+            "X-Api-Access-Key": self.access_token,
+            "X-Api-Resource-Id": self.resource_id,
+            "X-Api-Connect-Id": uuid.uuid4(),
+        }
+        return await websockets.connect(
+            self.ws_url, additional_headers=ws_header, max_size=1000000000
+        )
+
+    def prewarm(self):
+        """用户开始说话时，没有可用连接就提前建立"""
+        if self.ws is not None and self.ws.state is State.OPEN:
+            return
+        self.warm_connection.prewarm(self.tts_prewarm_ttl)
+
     async def _ensure_connection(self):
         """建立新的WebSocket连接"""
         try:
-            if self.ws:
+            if self.ws and self.ws.state is State.OPEN:
                 logger.bind(tag=TAG).info(f"使用已有链接...")
                 return self.ws
+            self.ws = self.warm_connection.take()
+            if self.ws:
+                logger.bind(tag=TAG).info("使用预热的连接...")
+                return self.ws
             logger.bind(tag=TAG).info("开始建立新连接...")
-            ws_header = {
-                "X-Api-App-Key": self.appId,
-                "X-Api-Access-Key": self.access_token,
-                "X-Api-Resource-Id": self.resource_id,
-                "X-Api-Connect-Id": uuid.uuid4(),
-            }
-            self.ws = await websockets.connect(
-                self.ws_url, additional_headers=ws_header, max_size=1000000000
-            )
+            self.ws = await self._connect()
             logger.bind(tag=TAG).info("WebSocket连接建立成功")
             return self.ws
         except Exception as e:
@@ -421,6 +440,10 @@ class TTSProvider(TTSProviderBase):
                 pass
             self.ws = None
 
+        if self.conn is not None and self.conn.stop_event.is_set():
+            # 设备断开时释放停放的预热连接
+            await self.warm_connection.close()
+
     async def _start_monitor_tts_response(self):
         """监听TTS响应"""
         opus_datas_cache = []
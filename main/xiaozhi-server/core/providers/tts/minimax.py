@@ -1,8 +1,8 @@
 import os
 import uuid
 import json
-import requests
 from datetime import datetime
+from core.utils import http_client
 from core.providers.tts.base import TTSProviderBase
 from core.utils.util import parse_string_to_list
 
@@ -75,12 +75,17 @@ class TTSProvider(TTSProviderBase):
             request_json["voice_setting"]["voice_id"] = ""
 
         try:
-            resp = requests.post(
-                self.api_url, json.dumps(request_json), headers=self.header
+            resp = await http_client.request(
+                "POST",
+                self.api_url,
+                timeout=self.tts_timeout,
+                data=json.dumps(request_json),
+                headers=self.header,
             )
+            resp_json = resp.json()
             # 检查返回请求数据的status_code是否为0
-            if resp.json()["base_resp"]["status_code"] == 0:
-                data = resp.json()["data"]["audio"]
+            if resp_json["base_resp"]["status_code"] == 0:
+                data = resp_json["data"]["audio"]
                 audio_bytes = bytes.fromhex(data)
                 if output_file:
                     with open(output_file, "wb") as file_to_save:
@@ -89,7 +94,7 @@ class TTSProvider(TTSProviderBase):
                     return audio_bytes
             else:
                 raise Exception(
-                    f"{__name__} status_code: {resp.status_code} response: {resp.content}"
+                    f"{__name__} status_code: {resp.status} response: {resp.content}"
                 )
         except Exception as e:
             raise Exception(f"{__name__} error: {e}")
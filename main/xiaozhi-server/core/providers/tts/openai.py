@@ -1,4 +1,4 @@
-import requests
+from core.utils import http_client
 from core.utils.util import check_model_key
 from core.providers.tts.base import TTSProviderBase
 from config.logger import setup_logging
@@ -29,7 +29,7 @@ class TTSProvider(TTSProviderBase):
         if model_key_msg:
             logger.bind(tag=TAG).error(model_key_msg)
 
-    async def text_to_speak(self, text, output_file):
+    def _request_kwargs(self, text):
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
@@ -41,14 +41,20 @@ class TTSProvider(TTSProviderBase):
             "response_format": "wav",
             "speed": self.speed,
         }
-        response = requests.post(self.api_url, json=data, headers=headers)
-        if response.status_code == 200:
-            if output_file:
-                with open(output_file, "wb") as audio_file:
-                    audio_file.write(response.content)
-            else:
-                return response.content
-        else:
+        return {"json": data, "headers": headers}
+
+    def stream_audio(self, text):
+        """接口按块返回wav音频，边接收边编码"""
+        return http_client.stream(
+            "POST", self.api_url, timeout=self.tts_timeout, **self._request_kwargs(text)
+        )
+
+    async def text_to_speak(self, text, output_file):
+        try:
+            return await self.fetch_audio(
+                "POST", self.api_url, output_file, **self._request_kwargs(text)
+            )
+        except http_client.HttpStatusError as e:
             raise Exception(
-                f"OpenAI TTS请求失败: {response.status_code} - {response.text}"
+                f"OpenAI TTS请求失败: {e.status} - {e.content.decode('utf-8', errors='replace')}"
             )
@@ -4,8 +4,8 @@ import time
 import uuid
 import json
 import base64
-import requests
 from datetime import datetime, timezone
+from core.utils import http_client
 from core.providers.tts.base import TTSProviderBase
 
 
@@ -134,12 +134,16 @@ class TTSProvider(TTSProviderBase):
             headers = self._get_auth_headers(request_json)
 
             # 发送请求
-            resp = requests.post(
-                self.api_url, json.dumps(request_json), headers=headers
+            resp = await http_client.request(
+                "POST",
+                self.api_url,
+                timeout=self.tts_timeout,
+                data=json.dumps(request_json),
+                headers=headers,
             )
 
             # 检查响应
-            if resp.status_code == 200:
+            if resp.status == 200:
                 response_data = resp.json()
 
                 # 检查是否成功
@@ -161,7 +165,7 @@ class TTSProvider(TTSProviderBase):
                     raise Exception(f"{__name__}: 没有返回音频数据: {response_data}")
             else:
                 raise Exception(
-                    f"{__name__} status_code: {resp.status_code} response: {resp.content}"
+                    f"{__name__} status_code: {resp.status} response: {resp.content}"
                 )
         except Exception as e:
             raise Exception(f"{__name__} error: {e}")
@@ -1,9 +1,9 @@
 import os
 import uuid
 import json
-import requests
 import shutil
 from datetime import datetime
+from core.utils import http_client
 from core.providers.tts.base import TTSProviderBase
 from config.logger import setup_logging
 
@@ -57,8 +57,10 @@ class TTSProvider(TTSProviderBase):
             }
         )
 
-        resp = requests.request("POST", url, data=payload)
-        if resp.status_code != 200:
+        resp = await http_client.request(
+            "POST", url, timeout=self.tts_timeout, data=payload
+        )
+        if resp.status != 200:
             logger.bind(tag=TAG).error(f"TTSON 请求失败: {resp.text}")
             raise Exception(f"{__name__}: TTS请求失败")
         resp_json = resp.json()
@@ -73,12 +75,9 @@ class TTSProvider(TTSProviderBase):
                 + resp_json["voice_path"]
             )
 
-            audio_content = requests.get(result)
-            if output_file:
-                with open(output_file, "wb") as f:
-                    f.write(audio_content.content)
-            else:
-                return audio_content.content
+            audio_content = await self.fetch_audio("GET", result, output_file)
+            if not output_file:
+                return audio_content
             voice_path = resp_json.get("voice_path")
             des_path = output_file
             shutil.move(voice_path, des_path)
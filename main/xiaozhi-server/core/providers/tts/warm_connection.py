@@ -0,0 +1,99 @@
+"""
+流式TTS上游连接预热
+用户开始说话时提前建立到TTS服务的websocket连接并停放，服务端空闲超时之前自动重建，
+LLM开始输出时双流式TTS直接取用，省去每轮回复首句前的握手耗时。
+"""
+
+import time
+import asyncio
+from websockets.protocol import State
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 停放的连接达到空闲超时的这个比例时重建，避免取用时恰好被服务端断开
+REFRESH_RATIO = 0.8
+
+
+class WarmConnection:
+    def __init__(self, connect, idle_timeout: float):
+        """
+        :param connect: 建立新连接的协程函数
+        :param idle_timeout: 服务端关闭空闲连接的时间（秒）
+        """
+        self._connect = connect
+        self.idle_timeout = idle_timeout
+        self._ws = None
+        self._opened_at = 0.0
+        self._warm_until = 0.0
+        self._task = None
+
+    def _fresh(self) -> bool:
+        return (
+            self._ws is not None
+            and self._ws.state is State.OPEN
+            and time.monotonic() - self._opened_at < self.idle_timeout * REFRESH_RATIO
+        )
+
+    def prewarm(self, ttl: float) -> None:
+        """在ttl秒内保持一条可用的连接，只能在连接所属的事件循环中调用"""
+        if ttl <= 0:
+            return
+        self._warm_until = time.monotonic() + ttl
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._maintain())
+
+    async def _maintain(self):
+        try:
+            while time.monotonic() < self._warm_until:
+                if not self._fresh():
+                    await self._discard()
+                    try:
+                        self._ws = await self._connect()
+                        self._opened_at = time.monotonic()
+                        logger.bind(tag=TAG).debug("TTS预热连接已建立")
+                    except Exception as e:
+                        logger.bind(tag=TAG).warning(f"TTS预热连接失败: {e}")
+                        return
+                refresh_in = (
+                    self._opened_at
+                    + self.idle_timeout * REFRESH_RATIO
+                    - time.monotonic()
+                )
+                await asyncio.sleep(
+                    max(0.5, min(refresh_in, self._warm_until - time.monotonic()))
+                )
+            # 预热窗口内没有被取用，释放连接
+            await self._discard()
+        except asyncio.CancelledError:
+            pass
+
+    async def _discard(self):
+        ws, self._ws = self._ws, None
+        if ws is not None:
+            try:
+                await ws.close()
+            except Exception:
+                pass
+
+    def take(self):
+        """取走停放的连接并停止预热，没有可用连接时返回None"""
+        ws = self._ws if self._fresh() else None
+        if ws is None and self._ws is not None:
+            asyncio.get_running_loop().create_task(self._discard())
+        else:
+            self._ws = None
+        self._warm_until = 0.0
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+        return ws
+
+    async def close(self):
+        """连接关闭时释放停放的连接"""
+        self._warm_until = 0.0
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+        await self._discard()
@@ -0,0 +1,111 @@
+"""
+静态音频资源注册表
+config/assets 下的提示音（绑定码、唤醒词回复、超出限额、结束提示音等）内容固定，
+启动时统一解码并编码为opus帧，之后直接返回不可变的帧元组，不再每次都解码编码。
+后台线程定期检查文件修改时间，资源被替换后自动重新编码。
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Tuple
+from config.logger import setup_logging
+from core.utils import p3
+from core.utils.util import audio_to_data
+
+TAG = __name__
+logger = setup_logging()
+
+ASSETS_DIR = "config/assets"
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".p3", ".ogg", ".flac")
+
+
+class AudioAssetRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (绝对路径, 是否opus) -> (文件签名, 帧元组)
+        self._assets: Dict[Tuple[str, bool], Tuple[Tuple[float, int], Tuple[bytes, ...]]] = {}
+        self._watch_thread = None
+
+    @staticmethod
+    def _signature(path: str) -> Tuple[float, int]:
+        stat = os.stat(path)
+        return stat.st_mtime, stat.st_size
+
+    @staticmethod
+    def _encode(path: str, is_opus: bool) -> Tuple[bytes, ...]:
+        if path.endswith(".p3"):
+            frames, _ = p3.decode_opus_from_file(path)
+        else:
+            frames, _ = audio_to_data(path, is_opus=is_opus)
+        return tuple(frames)
+
+    def get(self, path: str, is_opus: bool = True) -> Tuple[bytes, ...]:
+        """获取音频文件的帧，文件未变化时直接返回已编码的结果"""
+        key = (os.path.abspath(path), is_opus)
+        signature = self._signature(key[0])
+        with self._lock:
+            cached = self._assets.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        frames = self._encode(key[0], is_opus)
+        with self._lock:
+            self._assets[key] = (signature, frames)
+        return frames
+
+    def preload(self, directory: str = ASSETS_DIR) -> int:
+        """预先编码目录下的全部音频文件"""
+        count = 0
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if not name.lower().endswith(AUDIO_EXTENSIONS):
+                    continue
+                try:
+                    self.get(os.path.join(root, name))
+                    count += 1
+                except Exception as e:
+                    logger.bind(tag=TAG).warning(f"预加载音频资源失败 {name}: {e}")
+        return count
+
+    def refresh(self) -> None:
+        """检查已加载的资源，重新编码被修改的文件，移除已删除的文件"""
+        with self._lock:
+            items = list(self._assets.items())
+        for key, (signature, _) in items:
+            path, is_opus = key
+            try:
+                current = self._signature(path)
+            except OSError:
+                with self._lock:
+                    self._assets.pop(key, None)
+                continue
+            if current != signature:
+                try:
+                    self.get(path, is_opus)
+                    logger.bind(tag=TAG).info(f"音频资源已更新: {path}")
+                except Exception as e:
+                    logger.bind(tag=TAG).warning(f"重新编码音频资源失败 {path}: {e}")
+
+    def start(self, directory: str = ASSETS_DIR, interval: float = 10) -> None:
+        """后台预加载资源目录，并定期检查文件变化"""
+        if self._watch_thread is not None:
+            return
+
+        def _run():
+            count = self.preload(directory)
+            logger.bind(tag=TAG).info(f"音频资源预加载完成，共{count}个")
+            while True:
+                time.sleep(interval)
+                self.refresh()
+                # 新增的资源文件也提前编码
+                self.preload(directory)
+
+        self._watch_thread = threading.Thread(
+            target=_run, name="audio-assets", daemon=True
+        )
+        self._watch_thread.start()
+
+
+# 全局音频资源注册表
+audio_assets = AudioAssetRegistry()
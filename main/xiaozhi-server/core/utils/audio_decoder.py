@@ -0,0 +1,450 @@
+"""
+进程内音频解码与重采样
+TTS返回的wav/mp3/flac/ogg音频直接在进程内解码，并用numpy多相滤波重采样为16kHz单声道，
+不再为每句话启动一次ffmpeg进程。解码顺序：
+wav -> 标准库wave；其他格式 -> soundfile(libsndfile>=1.1，内置mpg123支持mp3)；
+以上都失败时才回退到pydub(ffmpeg)。
+流式接口返回的pcm/wav/mp3音频使用StreamingPCMDecoder边接收边解码，
+其他压缩格式收齐一句话后同样在进程内整句解码。
+"""
+
+import io
+import os
+import wave
+import struct
+from functools import lru_cache
+from math import gcd
+from typing import Tuple, Union
+
+import numpy as np
+from config.logger import setup_logging
+
+try:
+    import soundfile
+except (ImportError, OSError):
+    # 未安装soundfile或系统缺少libsndfile时只能使用ffmpeg
+    soundfile = None
+
+TAG = __name__
+logger = setup_logging()
+
+TARGET_SAMPLE_RATE = 16000
+
+# 每个相位的滤波器半长度（按输入采样点计），越大阻带衰减越好
+_HALF_TAPS = 10
+_KAISER_BETA = 5.0
+# 分块计算输出，限制中间矩阵的内存占用
+_RESAMPLE_BLOCK = 16384
+# mp3流式解码：新收到的音频达到已解码时长的一半（限制在这个范围内，秒）时解码一次
+_MP3_MIN_STEP = 0.3
+_MP3_MAX_STEP = 2.0
+
+
+@lru_cache(maxsize=16)
+def _polyphase_filter(up: int, down: int) -> Tuple[np.ndarray, int]:
+    """设计低通滤波器并拆分为多相形式，返回形状为(up, taps)的矩阵及滤波器半长度"""
+    max_rate = max(up, down)
+    half_len = _HALF_TAPS * max_rate
+    n = np.arange(-half_len, half_len + 1, dtype=np.float64)
+    h = np.sinc(n / max_rate) / max_rate
+    h *= np.kaiser(len(n), _KAISER_BETA) * up
+    taps = -(-len(h) // up)
+    h = np.concatenate([h, np.zeros(taps * up - len(h))])
+    # phases[p, k] = h[p + k * up]
+    return h.reshape(taps, up).T.astype(np.float32), half_len
+
+
+def resample(samples: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    """多相滤波重采样，输入输出均为float32单声道"""
+    if src_rate == dst_rate or len(samples) == 0:
+        return samples
+    divisor = gcd(src_rate, dst_rate)
+    up, down = dst_rate // divisor, src_rate // divisor
+    phases, half_len = _polyphase_filter(up, down)
+    taps = phases.shape[1]
+
+    out_len = -(-len(samples) * up // down)
+    # 左侧补taps个零，保证索引不越界
+    padded = np.concatenate(
+        [np.zeros(taps, np.float32), samples, np.zeros(taps + 1, np.float32)]
+    )
+    offsets = np.arange(taps)
+    output = np.empty(out_len, dtype=np.float32)
+    for start in range(0, out_len, _RESAMPLE_BLOCK):
+        t = np.arange(start, min(start + _RESAMPLE_BLOCK, out_len)) * down + half_len
+        phase = t % up
+        base = t // up
+        index = np.clip(base[:, None] - offsets[None, :] + taps, 0, len(padded) - 1)
+        output[start : start + len(t)] = np.einsum(
+            "ij,ij->i", padded[index], phases[phase]
+        )
+    return output
+
+
+class StreamResampler:
+    """
+    有状态的多相滤波重采样，输入可以分块到达，输出与一次性调用resample完全一致
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int):
+        divisor = gcd(src_rate, dst_rate)
+        self.up, self.down = dst_rate // divisor, src_rate // divisor
+        self.passthrough = src_rate == dst_rate
+        if not self.passthrough:
+            self.phases, self.half_len = _polyphase_filter(self.up, self.down)
+            self.taps = self.phases.shape[1]
+            # 缓冲区前补taps个零，对应输入开始之前的静音
+            self._buffer = np.zeros(self.taps, dtype=np.float32)
+            self._buffer_start = -self.taps
+        self._received = 0
+        self._next_output = 0
+
+    def process(self, samples: np.ndarray, final: bool = False) -> np.ndarray:
+        """送入一块float32单声道样本，返回已能确定的输出样本"""
+        if self.passthrough:
+            return samples
+        self._received += len(samples)
+        self._buffer = np.concatenate([self._buffer, samples.astype(np.float32)])
+        if final:
+            self._buffer = np.concatenate(
+                [self._buffer, np.zeros(self.taps + 1, np.float32)]
+            )
+            end = -(-self._received * self.up // self.down)
+        else:
+            # 只输出滤波窗口内的输入已全部到达的点
+            end = max(
+                self._next_output,
+                -(-(self._received * self.up - self.half_len) // self.down),
+            )
+        if end <= self._next_output:
+            return np.empty(0, dtype=np.float32)
+
+        output = np.empty(end - self._next_output, dtype=np.float32)
+        offsets = np.arange(self.taps)
+        for start in range(self._next_output, end, _RESAMPLE_BLOCK):
+            t = np.arange(start, min(start + _RESAMPLE_BLOCK, end)) * self.down
+            t += self.half_len
+            base = t // self.up - self._buffer_start
+            index = base[:, None] - offsets[None, :]
+            pos = start - self._next_output
+            output[pos : pos + len(t)] = np.einsum(
+                "ij,ij->i", self._buffer[index], self.phases[t % self.up]
+            )
+        self._next_output = end
+
+        # 丢弃之后的输出不再需要的历史样本
+        keep_from = (
+            self._next_output * self.down + self.half_len
+        ) // self.up - self.taps + 1
+        drop = keep_from - self._buffer_start
+        if drop > 0:
+            self._buffer = self._buffer[drop:]
+            self._buffer_start = keep_from
+        return output
+
+
+def _read_wav(data: Union[bytes, str]) -> Tuple[np.ndarray, int]:
+    source = io.BytesIO(data) if isinstance(data, bytes) else data
+    with wave.open(source, "rb") as wf:
+        channels = wf.getnchannels()
+        sample_width = wf.getsampwidth()
+        sample_rate = wf.getframerate()
+        frames = wf.readframes(wf.getnframes())
+    if sample_width == 2:
+        samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    elif sample_width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128.0
+    elif sample_width == 4:
+        samples = np.frombuffer(frames, dtype="<i4").astype(np.float32) / 2147483648.0
+    elif sample_width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        ints = (
+            raw[:, 0].astype(np.int32)
+            | (raw[:, 1].astype(np.int32) << 8)
+            | (raw[:, 2].astype(np.int8).astype(np.int32) << 16)
+        )
+        samples = ints.astype(np.float32) / 8388608.0
+    else:
+        raise ValueError(f"不支持的wav位深: {sample_width}")
+    return samples.reshape(-1, channels), sample_rate
+
+
+def _read_soundfile(data: Union[bytes, str]) -> Tuple[np.ndarray, int]:
+    source = io.BytesIO(data) if isinstance(data, bytes) else data
+    samples, sample_rate = soundfile.read(source, dtype="float32", always_2d=True)
+    return samples, sample_rate
+
+
+def _read_ffmpeg(data: Union[bytes, str], file_type: str) -> bytes:
+    from pydub import AudioSegment
+
+    source = io.BytesIO(data) if isinstance(data, bytes) else data
+    # -nostdin 参数：不要从标准输入读取数据，否则FFmpeg会阻塞
+    audio = AudioSegment.from_file(
+        source, format=file_type or None, parameters=["-nostdin"]
+    )
+    # 转换为单声道/16kHz采样率/16位小端编码（确保与编码器匹配）
+    audio = (
+        audio.set_channels(1)
+        .set_frame_rate(TARGET_SAMPLE_RATE)
+        .set_sample_width(2)
+    )
+    return audio.raw_data
+
+
+def _to_pcm16k(samples: np.ndarray, sample_rate: int) -> bytes:
+    if samples.ndim == 2:
+        samples = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    samples = resample(samples.astype(np.float32, copy=False), sample_rate, TARGET_SAMPLE_RATE)
+    return (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
+
+
+def decode_to_pcm(data: Union[bytes, str], file_type: str = None) -> Tuple[bytes, float]:
+    """
+    将音频文件路径或音频二进制数据解码为16kHz/单声道/16位小端PCM
+    :return: (PCM数据, 音频时长秒)
+    """
+    if file_type is None and isinstance(data, str):
+        file_type = os.path.splitext(data)[1].lstrip(".")
+    file_type = (file_type or "").lower()
+
+    readers = []
+    if file_type == "wav":
+        readers.append(_read_wav)
+    if soundfile is not None:
+        readers.append(_read_soundfile)
+
+    for reader in readers:
+        try:
+            samples, sample_rate = reader(data)
+            pcm = _to_pcm16k(samples, sample_rate)
+            return pcm, len(pcm) / 2 / TARGET_SAMPLE_RATE
+        except Exception as e:
+            logger.bind(tag=TAG).debug(
+                f"{reader.__name__}解码{file_type}失败，尝试下一种方式: {e}"
+            )
+
+    pcm = _read_ffmpeg(data, file_type)
+    return pcm, len(pcm) / 2 / TARGET_SAMPLE_RATE
+
+
+# MPEG版本 -> 各采样率编号对应的采样率
+_MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+# Layer III的码率表（kbps），MPEG1与MPEG2/2.5不同
+_MP3_BITRATES_V1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+_MP3_BITRATES_V2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+
+
+class Mp3FrameScanner:
+    """按帧头统计已完整收到的mp3帧，得到可以解码的数据长度和对应的采样点数"""
+
+    def __init__(self):
+        self.data = bytearray()
+        # 最后一个完整帧结束的位置，及到此为止的采样点数
+        self.end = 0
+        self.samples = 0
+        self.sample_rate = 0
+        self._offset = None
+
+    def _skip_id3(self) -> bool:
+        if len(self.data) < 10:
+            return False
+        self._offset = 0
+        if self.data[:3] == b"ID3":
+            size = 0
+            for byte in self.data[6:10]:
+                size = (size << 7) | (byte & 0x7F)
+            self._offset = 10 + size
+        return True
+
+    def _frame(self, offset: int):
+        """解析offset处的Layer III帧头，返回(帧长度, 采样点数, 采样率)，不是帧头时返回None"""
+        header = self.data[offset : offset + 4]
+        if header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+            return None
+        version = (header[1] >> 3) & 3
+        layer = (header[1] >> 1) & 3
+        bitrate_index = header[2] >> 4
+        rate_index = (header[2] >> 2) & 3
+        if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+            return None
+        sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+        padding = (header[2] >> 1) & 1
+        if version == 3:
+            bitrate = _MP3_BITRATES_V1[bitrate_index] * 1000
+            return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+        bitrate = _MP3_BITRATES_V2[bitrate_index] * 1000
+        return 72 * bitrate // sample_rate + padding, 576, sample_rate
+
+    def feed(self, data: bytes) -> None:
+        self.data.extend(data)
+        if self._offset is None and not self._skip_id3():
+            return
+        while self._offset + 4 <= len(self.data):
+            frame = self._frame(self._offset)
+            if frame is None:
+                # 帧之间有其他数据，逐字节查找下一个帧头
+                self._offset += 1
+                continue
+            length, samples, sample_rate = frame
+            if self._offset + length > len(self.data):
+                break
+            self._offset += length
+            self.end = self._offset
+            self.samples += samples
+            self.sample_rate = sample_rate
+
+
+class StreamingPCMDecoder:
+    """
+    流式音频解码器，音频数据分块送入，随时取出已解码的16kHz/单声道/16位PCM
+    pcm、wav在进程内边收边解析；mp3每收到一批完整的帧就用soundfile重新解码已收到的全部帧，
+    只输出新增的部分（mp3帧依赖前面帧的数据，单独解码其中一段会错位），
+    解码间隔随已解码时长增长，总解码量约为整句解码的几倍；
+    其他压缩格式先缓存，finish时用decode_to_pcm在进程内整句解码，都不启动ffmpeg进程
+    声明的格式与实际不符时，以RIFF开头的数据仍按wav处理
+    """
+
+    def __init__(self, file_type: str, sample_rate: int = TARGET_SAMPLE_RATE):
+        self.file_type = (file_type or "").lower()
+        self._header = b""
+        self._pending = b""
+        self._resampler = None
+        self._channels = 1
+        self._sample_width = 2
+        self._is_wav = False
+        # 压缩格式的原始数据，None表示尚未确定解码方式或不是压缩格式
+        self._compressed = None
+        # mp3边收边解码的状态，已输出的原始采样点数
+        self._mp3 = None
+        self._mp3_emitted = 0
+        if self.file_type == "pcm":
+            self._resampler = StreamResampler(sample_rate, TARGET_SAMPLE_RATE)
+
+    def _parse_wav_header(self) -> bool:
+        """在已收到的数据中查找fmt和data块，找到data块后返回True"""
+        data = self._header
+        if len(data) < 12:
+            return False
+        if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+            raise ValueError("不是有效的wav数据")
+        offset = 12
+        sample_rate = TARGET_SAMPLE_RATE
+        while offset + 8 <= len(data):
+            chunk_id, chunk_size = struct.unpack("<4sI", data[offset : offset + 8])
+            if chunk_id == b"data":
+                if self._sample_width != 2:
+                    raise ValueError(f"流式解码只支持16位wav: {self._sample_width * 8}")
+                self._resampler = StreamResampler(sample_rate, TARGET_SAMPLE_RATE)
+                self._pending = data[offset + 8 :]
+                self._header = b""
+                return True
+            if offset + 8 + chunk_size > len(data):
+                return False
+            if chunk_id == b"fmt ":
+                _, self._channels, sample_rate, _, _, bits = struct.unpack(
+                    "<HHIIHH", data[offset + 8 : offset + 24]
+                )
+                self._sample_width = bits // 8
+            offset += 8 + chunk_size + (chunk_size & 1)
+        return False
+
+    def _decode_pcm(self, final: bool) -> bytes:
+        frame_bytes = self._sample_width * self._channels
+        usable = len(self._pending) - len(self._pending) % frame_bytes
+        data, self._pending = self._pending[:usable], self._pending[usable:]
+        samples = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+        if self._channels > 1:
+            samples = samples.reshape(-1, self._channels).mean(axis=1)
+        return self._resample(samples, final)
+
+    def _resample(self, samples: np.ndarray, final: bool) -> bytes:
+        samples = self._resampler.process(samples, final)
+        return (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
+
+    def _decode_mp3(self, scanner: Mp3FrameScanner, final: bool) -> bytes:
+        """重新解码已收到的完整mp3帧，返回新增部分的PCM"""
+        data = bytes(scanner.data if final else scanner.data[: scanner.end])
+        samples, sample_rate = _read_soundfile(data)
+        samples = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+        if self._resampler is None:
+            self._resampler = StreamResampler(sample_rate, TARGET_SAMPLE_RATE)
+        new = samples[self._mp3_emitted :]
+        self._mp3_emitted = max(self._mp3_emitted, len(samples))
+        return self._resample(new, final)
+
+    def _feed_mp3(self, data: bytes) -> bytes:
+        scanner = self._mp3
+        scanner.feed(data)
+        if not scanner.sample_rate:
+            return b""
+        decoded = self._mp3_emitted / scanner.sample_rate
+        step = min(max(decoded / 2, _MP3_MIN_STEP), _MP3_MAX_STEP)
+        if (scanner.samples - self._mp3_emitted) / scanner.sample_rate < step:
+            return b""
+        try:
+            return self._decode_mp3(scanner, final=False)
+        except Exception as e:
+            # 解不出来时改为收齐后整句解码
+            logger.bind(tag=TAG).debug(f"mp3流式解码失败，改为整句解码: {e}")
+            self._compressed, self._mp3 = scanner.data, None
+            return b""
+
+    def feed(self, data: bytes) -> bytes:
+        """送入一块音频数据，返回目前已能解码出的PCM"""
+        if (
+            self._resampler is None
+            and not self._is_wav
+            and self._compressed is None
+            and self._mp3 is None
+        ):
+            # 第一块数据到达时确定解码方式
+            if self.file_type == "wav" or data[:4] == b"RIFF":
+                self._is_wav = True
+            elif self.file_type == "mp3" and soundfile is not None:
+                self._mp3 = Mp3FrameScanner()
+            else:
+                self._compressed = bytearray()
+        if self._mp3 is not None:
+            return self._feed_mp3(data)
+        if self._compressed is not None:
+            self._compressed.extend(data)
+            return b""
+        if self._resampler is None:
+            self._header += data
+            if not self._parse_wav_header():
+                return b""
+        else:
+            self._pending += data
+        return self._decode_pcm(final=False)
+
+    def finish(self) -> bytes:
+        """输入结束，返回剩余的PCM"""
+        if self._mp3 is not None:
+            scanner, self._mp3 = self._mp3, None
+            try:
+                return self._decode_mp3(scanner, final=True) if scanner.data else b""
+            except Exception:
+                if self._mp3_emitted:
+                    raise
+                # 一帧都没有解出来，交给decode_to_pcm按其他方式解码
+                self._compressed = scanner.data
+        if self._compressed is not None:
+            data, self._compressed = bytes(self._compressed), None
+            if not data:
+                return b""
+            if self._mp3_emitted:
+                # mp3流式解码中途失败，已输出的部分不再重复
+                logger.bind(tag=TAG).warning("mp3流式解码失败，丢弃这句话剩余的音频")
+                return b""
+            pcm, _ = decode_to_pcm(data, self.file_type)
+            return pcm
+        if self._resampler is None:
+            return b""
+        return self._decode_pcm(final=True)
+
+    def close(self) -> None:
+        """中途放弃时丢弃缓存的数据"""
+        self._compressed = None
+        self._mp3 = None
+        self._pending = b""
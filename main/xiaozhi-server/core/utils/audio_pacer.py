@@ -0,0 +1,373 @@
+"""
+音频发送节拍器
+所有连接的音频帧由同一个节拍器统一节拍发送，取代每个连接每帧一次asyncio.sleep：
+- 整个事件循环只有一个定时器，每个节拍从时间轮中取出到期的音频流，批量发送到期的帧
+- 每路音频按实际的帧时长计时：重新编码的opus和pcm为60ms，原样下发的opus按数据包TOC计算
+  （设备协商的帧时长，如20ms）
+- 每帧按 开始时间 + 序号 * 帧时长 计算应发送时间，取最近的节拍发送，误差不超过半个节拍
+- 某个连接上一批帧还没发完（网络拥塞）时本节拍跳过它，不阻塞其他连接，下个节拍补发
+- 统计每路音频的迟到帧数、最大迟到时间，以及句子之间设备缓冲播完的欠载次数
+- 按每个连接实测的发送耗时抖动和TCP发送缓冲积压自适应调整设备端的缓冲量：
+  链路抖动大时提前多发几帧，链路干净时少发，每句话开始时都会补足缓冲
+"""
+
+import math
+
+import time
+import asyncio
+import weakref
+from typing import Dict, List, Optional
+from config.logger import setup_logging
+from core.utils.ogg_opus import opus_packet_samples
+
+TAG = __name__
+logger = setup_logging()
+
+# 默认帧时长（秒），匹配服务端重新编码的 Opus 帧和 pcm 帧
+FRAME_PERIOD = 0.06
+# 节拍间隔（秒），取设备可能协商的最短帧时长
+TICK_PERIOD = 0.02
+# 时间轮槽数，覆盖约3.8秒，更晚到期的音频流在槽中轮转等待
+WHEEL_SLOTS = 192
+# 设备端缓冲帧数（按60ms一帧计）的默认范围，尚无测量数据时使用DEFAULT_PREBUFFER_FRAMES
+DEFAULT_MIN_PREBUFFER_FRAMES = 2
+DEFAULT_MAX_PREBUFFER_FRAMES = 12
+DEFAULT_PREBUFFER_FRAMES = 3
+
+
+class LinkEstimator:
+    """按RFC 6298的方法平滑websocket发送耗时及其抖动，并记录TCP发送缓冲积压"""
+
+    def __init__(self):
+        self.latency = None
+        self.jitter = 0.0
+        self.backlog_bytes = 0
+        self.frame_bytes = 0.0
+
+    def on_send(self, latency: float, frame_size: int, backlog_bytes: int) -> None:
+        if self.latency is None:
+            self.latency = latency
+            self.jitter = latency / 2
+        else:
+            self.jitter = 0.75 * self.jitter + 0.25 * abs(latency - self.latency)
+            self.latency = 0.875 * self.latency + 0.125 * latency
+        if self.frame_bytes:
+            self.frame_bytes = 0.9 * self.frame_bytes + 0.1 * frame_size
+        else:
+            self.frame_bytes = frame_size
+        self.backlog_bytes = backlog_bytes
+
+    def target_frames(
+        self, min_frames: int, max_frames: int, frame_period: float = FRAME_PERIOD
+    ) -> int:
+        """
+        设备端应该保持的缓冲帧数
+        min_frames/max_frames按60ms一帧配置，换算为frame_period时长的帧数
+        """
+        scale = FRAME_PERIOD / frame_period
+        min_frames = math.ceil(min_frames * scale)
+        max_frames = math.ceil(max_frames * scale)
+        if self.latency is None:
+            default = math.ceil(DEFAULT_PREBUFFER_FRAMES * scale)
+            return min(max(default, min_frames), max_frames)
+        delay = self.latency + 4 * self.jitter
+        # 积压按字节统计，frame_bytes随帧时长变化，换算出的帧数已是当前帧时长
+        backlog_frames = self.backlog_bytes / self.frame_bytes if self.frame_bytes else 0
+        frames = min_frames + math.ceil(delay / frame_period + backlog_frames)
+        return min(max(frames, min_frames), max_frames)
+
+
+class PlaybackStats:
+    """一个连接的音频发送统计"""
+
+    def __init__(self):
+        self.frames = 0
+        self.late_frames = 0
+        self.max_lateness_ms = 0.0
+        self.total_lateness_ms = 0.0
+        self.underruns = 0
+        self.underrun_ms = 0.0
+        # 已发送的音频在设备上预计播完的时间（事件循环时间）
+        self.playback_end = None
+        self.link = LinkEstimator()
+
+    def as_dict(self) -> dict:
+        return {
+            "frames": self.frames,
+            "late_frames": self.late_frames,
+            "max_lateness_ms": round(self.max_lateness_ms, 1),
+            "avg_lateness_ms": round(
+                self.total_lateness_ms / self.late_frames if self.late_frames else 0, 1
+            ),
+            "underruns": self.underruns,
+            "underrun_ms": round(self.underrun_ms, 1),
+            "send_latency_ms": round((self.link.latency or 0) * 1000, 1),
+            "send_jitter_ms": round(self.link.jitter * 1000, 1),
+            "backlog_bytes": self.link.backlog_bytes,
+        }
+
+
+class _AudioStream:
+    """一次sendAudio调用对应的一路音频"""
+
+    __slots__ = (
+        "conn",
+        "frames",
+        "frame_period",
+        "index",
+        "start",
+        "pre_buffer",
+        "play_start",
+        "done",
+        "sending",
+        "finished",
+        "due_tick",
+        "late_frames",
+        "max_lateness",
+    )
+
+    def __init__(self, conn, frames, frame_period, start, pre_buffer, play_start, done):
+        self.conn = conn
+        self.frames = frames
+        self.frame_period = frame_period
+        self.index = 0
+        self.start = start
+        self.pre_buffer = pre_buffer
+        self.play_start = play_start
+        self.done = done
+        self.sending = False
+        self.finished = False
+        self.due_tick = 0
+        self.late_frames = 0
+        self.max_lateness = 0.0
+
+    def due_time(self, index: int) -> float:
+        return self.start + index * self.frame_period
+
+    def playback_end(self, index: int) -> float:
+        """前index帧在设备上播完的时间"""
+        return self.play_start + index * self.frame_period
+
+
+def frame_period(conn, frames) -> float:
+    """一路音频的帧时长（秒），opus按第一个数据包的TOC计算"""
+    if getattr(conn, "audio_format", "opus") == "pcm" or not frames:
+        return FRAME_PERIOD
+    samples = opus_packet_samples(frames[0])
+    return samples / 48000 if samples else FRAME_PERIOD
+
+
+class AudioPacer:
+    """运行在连接所在事件循环中的节拍器"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self._wheel: List[List[_AudioStream]] = [[] for _ in range(WHEEL_SLOTS)]
+        self._active = 0
+        self._epoch = 0.0
+        self._tick = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._stats: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    def stats(self, conn) -> PlaybackStats:
+        stats = self._stats.get(conn)
+        if stats is None:
+            stats = PlaybackStats()
+            self._stats[conn] = stats
+        return stats
+
+    def _tick_time(self, tick: int) -> float:
+        return self._epoch + tick * TICK_PERIOD
+
+    def _tick_for(self, due: float) -> int:
+        # 取离应发送时间最近的节拍，且不早于下一个节拍
+        nearest = int((due - self._epoch) / TICK_PERIOD + 0.5)
+        return max(self._tick + 1, nearest)
+
+    @staticmethod
+    def _prebuffer_range(conn):
+        config = (getattr(conn, "config", None) or {}).get("audio_prebuffer") or {}
+        min_frames = int(config.get("min_frames", DEFAULT_MIN_PREBUFFER_FRAMES))
+        max_frames = int(config.get("max_frames", DEFAULT_MAX_PREBUFFER_FRAMES))
+        return min_frames, max(min_frames, max_frames)
+
+    def play(self, conn, frames, first: bool = False) -> asyncio.Future:
+        """
+        登记一路音频，返回全部帧发送完毕（或被打断）时完成的Future
+        设备端缓冲不足目标帧数时先立即补足，之后的帧按帧时长匀速发送
+        :param first: 一轮回复的第一段音频，设备端没有可接续的缓冲
+        """
+        period = frame_period(conn, frames)
+        now = self.loop.time()
+        done = self.loop.create_future()
+        stats = self.stats(conn)
+        play_start = now
+        if not first and stats.playback_end is not None:
+            if stats.playback_end > now:
+                # 接着设备缓冲中尚未播完的音频播放
+                play_start = stats.playback_end
+            elif now - stats.playback_end > period / 2:
+                # 句子之间设备缓冲已经播完，出现了断音
+                gap = now - stats.playback_end
+                stats.underruns += 1
+                stats.underrun_ms += gap * 1000
+                logger.bind(tag=TAG).debug(f"音频欠载: 设备缓冲已播完{gap * 1000:.0f}ms")
+
+        # 每帧比设备播放它的时间提前target帧发送，已到期的帧立即发送以补足缓冲
+        target = stats.link.target_frames(*self._prebuffer_range(conn), period)
+        start = play_start - target * period
+        burst = min(len(frames), max(0, int((now - start) / period + 0.5) + 1))
+        stream = _AudioStream(conn, frames, period, start, burst, play_start, done)
+        stats.playback_end = stream.playback_end(len(frames))
+        if self._active == 0 and self._timer is None:
+            self._epoch = now
+            self._tick = 0
+        self._active += 1
+        self._flush(stream, now)
+        if not stream.finished:
+            self._schedule(stream)
+        if self._timer is None and self._active:
+            self._timer = self.loop.call_at(self._tick_time(self._tick + 1), self._on_tick)
+        return done
+
+    def _schedule(self, stream: _AudioStream) -> None:
+        stream.due_tick = self._tick_for(stream.due_time(stream.index))
+        self._wheel[stream.due_tick % WHEEL_SLOTS].append(stream)
+
+    def _finish(self, stream: _AudioStream, error: BaseException = None) -> None:
+        if stream.finished:
+            return
+        stream.finished = True
+        self._active -= 1
+        if stream.index < len(stream.frames):
+            # 被打断或发送失败，设备只会播放已经发出的帧
+            stats = self.stats(stream.conn)
+            stats.playback_end = stream.playback_end(stream.index)
+        if stream.late_frames:
+            logger.bind(tag=TAG).debug(
+                f"音频发送迟到: {stream.late_frames}/{stream.index}帧，"
+                f"最大{stream.max_lateness * 1000:.0f}ms"
+            )
+        if stream.done.done():
+            # 等待方已经取消
+            return
+        if error is not None:
+            stream.done.set_exception(error)
+        else:
+            stream.done.set_result(stream.index)
+
+    def _flush(self, stream: _AudioStream, now: float) -> None:
+        """发送这路音频中所有已到期的帧"""
+        if stream.conn.client_abort or stream.done.cancelled():
+            self._finish(stream)
+            return
+        if stream.sending:
+            return
+        horizon = now + TICK_PERIOD / 2
+        end = stream.index
+        while end < len(stream.frames) and stream.due_time(end) <= horizon:
+            end += 1
+        if end == stream.index:
+            return
+
+        stats = self.stats(stream.conn)
+        # 预缓冲的帧本来就提前发送，不计算迟到
+        for index in range(max(stream.index, stream.pre_buffer), end):
+            lateness = now - stream.due_time(index)
+            # 超过半个帧时长才算迟到，节拍本身的取整误差不计入
+            if lateness > stream.frame_period / 2:
+                stream.late_frames += 1
+                stream.max_lateness = max(stream.max_lateness, lateness)
+                stats.late_frames += 1
+                stats.total_lateness_ms += lateness * 1000
+                stats.max_lateness_ms = max(stats.max_lateness_ms, lateness * 1000)
+        stats.frames += end - stream.index
+        batch = stream.frames[stream.index : end]
+        stream.index = end
+        # 重置没有声音的状态
+        stream.conn.last_activity_time = time.time() * 1000
+        stream.sending = True
+        self.loop.create_task(self._send(stream, batch))
+
+    async def _send(self, stream: _AudioStream, batch) -> None:
+        websocket = stream.conn.websocket
+        transport = getattr(websocket, "transport", None)
+        batcher = getattr(stream.conn, "message_batcher", None)
+        link = self.stats(stream.conn).link
+        try:
+            if batcher is not None:
+                # 排队中的控制消息与这一批帧合并为一次写入
+                sent_at = self.loop.time()
+                await batcher.send(batch)
+                link.on_send(
+                    self.loop.time() - sent_at,
+                    sum(map(len, batch)) / len(batch),
+                    transport.get_write_buffer_size() if transport else 0,
+                )
+            else:
+                for frame in batch:
+                    sent_at = self.loop.time()
+                    await websocket.send(frame)
+                    link.on_send(
+                        self.loop.time() - sent_at,
+                        len(frame),
+                        transport.get_write_buffer_size() if transport else 0,
+                    )
+        except Exception as e:
+            self._finish(stream, e)
+            return
+        finally:
+            stream.sending = False
+        if stream.index >= len(stream.frames):
+            self._finish(stream)
+
+    def _on_tick(self) -> None:
+        self._timer = None
+        self._tick += 1
+        now = self.loop.time()
+        # 事件循环严重阻塞时跳过错过的节拍，到期的帧在本节拍一起补发
+        behind = int((now - self._tick_time(self._tick)) / TICK_PERIOD)
+        for _ in range(max(0, behind)):
+            self._run_slot(now)
+            self._tick += 1
+        self._run_slot(now)
+        if self._active:
+            self._timer = self.loop.call_at(self._tick_time(self._tick + 1), self._on_tick)
+
+    def _run_slot(self, now: float) -> None:
+        slot = self._wheel[self._tick % WHEEL_SLOTS]
+        if not slot:
+            return
+        self._wheel[self._tick % WHEEL_SLOTS] = []
+        for stream in slot:
+            if stream.finished:
+                continue
+            if stream.due_tick > self._tick:
+                # 还没到期，等时间轮转到下一圈
+                self._wheel[stream.due_tick % WHEEL_SLOTS].append(stream)
+                continue
+            self._flush(stream, now)
+            if stream.finished:
+                continue
+            if stream.index >= len(stream.frames):
+                # 帧已全部交给发送任务，发送完成时结束
+                continue
+            if stream.sending and stream.due_time(stream.index) <= now:
+                # 上一批还在发送，下个节拍再试
+                stream.due_tick = self._tick + 1
+                self._wheel[stream.due_tick % WHEEL_SLOTS].append(stream)
+            else:
+                self._schedule(stream)
+
+
+_pacers: Dict[asyncio.AbstractEventLoop, AudioPacer] = {}
+
+
+def get_audio_pacer() -> AudioPacer:
+    """获取当前事件循环的节拍器"""
+    loop = asyncio.get_running_loop()
+    pacer = _pacers.get(loop)
+    if pacer is None:
+        pacer = AudioPacer(loop)
+        _pacers[loop] = pacer
+    return pacer
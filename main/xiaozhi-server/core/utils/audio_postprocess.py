@@ -0,0 +1,265 @@
+"""
+TTS音频后处理
+在解码为16kHz PCM之后、编码为opus之前处理合成的语音：
+- 去掉句首、句尾的静音，只保留少量句首静音和不超过上限的句尾停顿，缩短句子之间的空白
+- 按有声部分的RMS电平做响度归一化，不同TTS、不同音色的音量保持一致，并限制峰值避免削波
+- 统计处理前后的音频时长，了解去静音节省了多少播放时间
+"""
+
+import json
+import threading
+import numpy as np
+from typing import Optional
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+SAMPLE_RATE = 16000
+# 静音检测的窗口长度：10ms
+WINDOW_SAMPLES = SAMPLE_RATE // 100
+# 归一化后的峰值上限：-1dBFS
+PEAK_LIMIT = 32767 * 10 ** (-1 / 20)
+# 增益变化小于这个比例时不做处理
+MIN_GAIN_CHANGE = 0.05
+# 流式处理时有声窗口累计到500ms后锁定增益，之后只在会削波时下调
+GAIN_LOCK_WINDOWS = 50
+# 流式处理时增益变化在50ms内按dB线性过渡，避免句中音量跳变
+GAIN_RAMP_SAMPLES = 50 * SAMPLE_RATE // 1000
+# 每处理多少句输出一次统计
+STATS_LOG_EVERY = 100
+
+
+def _db_to_amplitude(db: float) -> float:
+    return 32768 * 10 ** (db / 20)
+
+
+def _peak(samples: np.ndarray) -> float:
+    # 转为int32再取绝对值，避免-32768溢出
+    return float(np.max(np.abs(samples.astype(np.int32)), initial=0))
+
+
+def _window_power(samples: np.ndarray) -> np.ndarray:
+    """每个10ms窗口的均方值，不足一个窗口的尾部单独计算"""
+    full = len(samples) // WINDOW_SAMPLES * WINDOW_SAMPLES
+    windows = samples[:full].astype(np.float64).reshape(-1, WINDOW_SAMPLES)
+    power = np.mean(windows * windows, axis=1)
+    if full < len(samples):
+        tail = samples[full:].astype(np.float64)
+        power = np.append(power, np.mean(tail * tail))
+    return power
+
+
+class AudioPostProcessor:
+    """TTS音频后处理配置与统计，进程内所有连接共享"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._config_snapshot = None
+        self.enabled = True
+        self.floor_power = _db_to_amplitude(-45) ** 2
+        self.keep_leading = 40 * SAMPLE_RATE // 1000
+        self.max_gap = 200 * SAMPLE_RATE // 1000
+        self.target_rms = _db_to_amplitude(-20)
+        self.max_gain = 10 ** (12 / 20)
+        self._stats = {
+            "clips": 0,
+            "input_ms": 0,
+            "output_ms": 0,
+            "leading_trimmed_ms": 0,
+            "trailing_trimmed_ms": 0,
+        }
+
+    def configure(self, config: Optional[dict]) -> None:
+        """根据配置文件中的tts_postprocess节初始化，配置未变化时直接返回"""
+        config = config or {}
+        snapshot = json.dumps(config, sort_keys=True, default=str)
+        if snapshot == self._config_snapshot:
+            return
+        self._config_snapshot = snapshot
+        self.enabled = str(config.get("enable", True)).lower() in ("true", "1", "yes")
+        self.floor_power = _db_to_amplitude(float(config.get("silence_floor_db", -45))) ** 2
+        self.keep_leading = int(config.get("keep_leading_ms", 40)) * SAMPLE_RATE // 1000
+        self.max_gap = int(config.get("max_gap_ms", 200)) * SAMPLE_RATE // 1000
+        target = config.get("target_rms_db", -20)
+        self.target_rms = _db_to_amplitude(float(target)) if target not in (None, "") else None
+        self.max_gain = 10 ** (float(config.get("max_gain_db", 12)) / 20)
+
+    def _gain(self, voiced_power: float, peak: float) -> float:
+        """把有声部分的RMS调整到目标电平所需的增益"""
+        if self.target_rms is None or voiced_power <= 0:
+            return 1.0
+        gain = self.target_rms / np.sqrt(voiced_power)
+        gain = min(max(gain, 1 / self.max_gain), self.max_gain)
+        if peak > 0:
+            gain = min(gain, PEAK_LIMIT / peak)
+        return 1.0 if abs(gain - 1) < MIN_GAIN_CHANGE else gain
+
+    @staticmethod
+    def _apply_gain(samples: np.ndarray, gain: float) -> np.ndarray:
+        if gain == 1.0:
+            return samples
+        scaled = np.rint(samples.astype(np.float32) * gain)
+        return np.clip(scaled, -32768, 32767).astype(np.int16)
+
+    def _record(self, input_samples, output_samples, leading, trailing):
+        with self._lock:
+            self._stats["clips"] += 1
+            self._stats["input_ms"] += int(input_samples) * 1000 // SAMPLE_RATE
+            self._stats["output_ms"] += int(output_samples) * 1000 // SAMPLE_RATE
+            self._stats["leading_trimmed_ms"] += int(leading) * 1000 // SAMPLE_RATE
+            self._stats["trailing_trimmed_ms"] += int(trailing) * 1000 // SAMPLE_RATE
+            clips = self._stats["clips"]
+        if clips % STATS_LOG_EVERY == 0:
+            logger.bind(tag=TAG).info(f"TTS后处理统计: {self.stats()}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["saved_ms"] = stats["input_ms"] - stats["output_ms"]
+        return stats
+
+    def process(self, pcm: bytes) -> bytes:
+        """处理一整句16kHz单声道16位PCM"""
+        if not self.enabled or len(pcm) < 2:
+            return pcm
+        samples = np.frombuffer(pcm[: len(pcm) // 2 * 2], dtype="<i2")
+        power = _window_power(samples)
+        voiced = np.flatnonzero(power > self.floor_power)
+        if len(voiced) == 0:
+            # 整句都是静音，不做处理
+            return pcm
+
+        voice_start = voiced[0] * WINDOW_SAMPLES
+        voice_end = min(len(samples), (voiced[-1] + 1) * WINDOW_SAMPLES)
+        start = max(0, voice_start - self.keep_leading)
+        end = min(len(samples), voice_end + self.max_gap)
+        output = samples[start:end]
+
+        gain = self._gain(float(np.mean(power[voiced])), _peak(output))
+        output = self._apply_gain(output, gain)
+        self._record(len(samples), len(output), start, len(samples) - end)
+        return output.tobytes()
+
+    def stream(self) -> Optional["StreamingPostProcessor"]:
+        """创建流式处理器，未启用时返回None"""
+        return StreamingPostProcessor(self) if self.enabled else None
+
+
+class StreamingPostProcessor:
+    """
+    边接收边处理一句话的PCM
+    句首静音在遇到第一段语音前一直丢弃；静音段先暂存，后面还有语音时原样输出，
+    到句尾时最多输出max_gap；增益按目前为止有声部分的RMS估计，
+    累计GAIN_LOCK_WINDOWS个有声窗口后锁定，每次变化都平滑过渡
+    """
+
+    def __init__(self, processor: AudioPostProcessor):
+        self.processor = processor
+        self._remainder = b""
+        self._started = False
+        self._silence = np.zeros(0, dtype=np.int16)
+        self._voiced_power_sum = 0.0
+        self._voiced_windows = 0
+        self._peak = 0.0
+        # 锁定后的增益，以及上一段输出结束时实际使用的增益
+        self._locked_gain = None
+        self._applied_gain = None
+        self._input_samples = 0
+        self._output_samples = 0
+        self._leading_trimmed = 0
+
+    def _emit(self, samples: np.ndarray) -> bytes:
+        self._output_samples += len(samples)
+        if not len(samples):
+            return b""
+        self._peak = max(self._peak, _peak(samples))
+        if self._locked_gain is None:
+            voiced_power = (
+                self._voiced_power_sum / self._voiced_windows if self._voiced_windows else 0
+            )
+            gain = self.processor._gain(voiced_power, self._peak)
+            if self._voiced_windows >= GAIN_LOCK_WINDOWS:
+                self._locked_gain = gain
+        else:
+            # 锁定后只在新的峰值会削波时下调
+            gain = self._locked_gain
+            if self._peak * gain > PEAK_LIMIT:
+                gain = self._locked_gain = PEAK_LIMIT / self._peak
+        return self._ramp_gain(samples, gain).tobytes()
+
+    def _ramp_gain(self, samples: np.ndarray, gain: float) -> np.ndarray:
+        """从上一段的增益过渡到gain，过渡段按dB线性变化"""
+        previous, self._applied_gain = self._applied_gain, gain
+        if previous is None or previous == gain:
+            return self.processor._apply_gain(samples, gain)
+        ramp = min(len(samples), GAIN_RAMP_SAMPLES)
+        gains = np.full(len(samples), gain, dtype=np.float32)
+        gains[:ramp] = np.geomspace(previous, gain, ramp + 1)[1:]
+        scaled = np.rint(samples.astype(np.float32) * gains)
+        return np.clip(scaled, -32768, 32767).astype(np.int16)
+
+    def feed(self, pcm: bytes) -> bytes:
+        """送入一段PCM，返回可以输出的部分"""
+        data = self._remainder + pcm
+        usable = len(data) // (WINDOW_SAMPLES * 2) * (WINDOW_SAMPLES * 2)
+        self._remainder = data[usable:]
+        if not usable:
+            return b""
+        samples = np.frombuffer(data[:usable], dtype="<i2")
+        self._input_samples += len(samples)
+        power = _window_power(samples)
+        voiced = np.flatnonzero(power > self.processor.floor_power)
+        if len(voiced) == 0:
+            self._hold_silence(samples)
+            return b""
+
+        self._voiced_power_sum += float(np.sum(power[voiced]))
+        self._voiced_windows += len(voiced)
+        voice_end = (voiced[-1] + 1) * WINDOW_SAMPLES
+        head = samples[:voice_end]
+        if not self._started:
+            # 第一段语音之前只保留keep_leading的静音
+            lead = np.concatenate((self._silence, head[: voiced[0] * WINDOW_SAMPLES]))
+            keep = min(len(lead), self.processor.keep_leading)
+            self._leading_trimmed += len(lead) - keep
+            head = np.concatenate((lead[len(lead) - keep :], head[voiced[0] * WINDOW_SAMPLES :]))
+            self._started = True
+        else:
+            head = np.concatenate((self._silence, head))
+        self._silence = np.zeros(0, dtype=np.int16)
+        self._hold_silence(samples[voice_end:])
+        return self._emit(head)
+
+    def _hold_silence(self, samples: np.ndarray) -> None:
+        self._silence = np.concatenate((self._silence, samples))
+        if not self._started and len(self._silence) > self.processor.keep_leading:
+            # 句首静音只需要保留最后keep_leading
+            drop = len(self._silence) - self.processor.keep_leading
+            self._leading_trimmed += drop
+            self._silence = self._silence[drop:]
+
+    def finish(self) -> bytes:
+        """这句话接收完毕，输出不超过max_gap的句尾静音"""
+        tail = np.frombuffer(
+            self._remainder[: len(self._remainder) // 2 * 2], dtype="<i2"
+        )
+        self._input_samples += len(tail)
+        self._remainder = b""
+        silence = np.concatenate((self._silence, tail))
+        self._silence = np.zeros(0, dtype=np.int16)
+        if not self._started:
+            # 整句都是静音
+            output = self._emit(silence)
+            trailing = 0
+        else:
+            keep = min(len(silence), self.processor.max_gap)
+            output = self._emit(silence[:keep])
+            trailing = len(silence) - keep
+        self.processor._record(
+            self._input_samples, self._output_samples, self._leading_trimmed, trailing
+        )
+        return output
+
+
+audio_postprocessor = AudioPostProcessor()
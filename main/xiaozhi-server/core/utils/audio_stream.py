@@ -0,0 +1,128 @@
+"""
+流式音频编码
+TTS接口分块返回的wav/pcm/mp3音频边解码边切分为60ms的帧并编码为opus，
+接口支持流式返回音频的TTS都可以复用，不必等整句合成完毕再统一解码；
+其他压缩格式收齐后在进程内整句解码。
+输出的帧与pcm_to_data一次性编码的结果一致。
+Ogg/Opus音频的参数与设备协商的一致时直接拆出opus数据包下发，不解码也不重新编码。
+"""
+
+from typing import List, Optional
+import opuslib_next
+from core.utils.audio_decoder import StreamingPCMDecoder, TARGET_SAMPLE_RATE
+from core.utils.audio_postprocess import audio_postprocessor
+from core.utils.ogg_opus import OggOpusDemuxer, opus_stream_matches
+from core.utils.opus_encoder_utils import opus_encoder_pool, split_pcm_frames
+
+# 帧时长（毫秒）与每帧PCM字节数（16位单声道）
+FRAME_DURATION = 60
+FRAME_SAMPLES = TARGET_SAMPLE_RATE * FRAME_DURATION // 1000
+FRAME_BYTES = FRAME_SAMPLES * 2
+# 与pcm_to_data使用同一种编码器
+_ENCODER_KEY = (TARGET_SAMPLE_RATE, 1, opuslib_next.APPLICATION_AUDIO)
+# 可以尝试原样下发的格式
+_OGG_OPUS_TYPES = ("opus", "ogg")
+
+
+class StreamingAudioEncoder:
+    """把分块到达的音频数据编码为opus帧（或16kHz PCM帧）"""
+
+    def __init__(
+        self,
+        file_type: str,
+        is_opus: bool = True,
+        sample_rate: int = TARGET_SAMPLE_RATE,
+        opus_params: Optional[dict] = None,
+    ):
+        """
+        :param file_type: 接口返回的音频格式，如mp3、wav、pcm
+        :param is_opus: True输出opus帧，False输出PCM帧
+        :param sample_rate: file_type为pcm时的原始采样率
+        :param opus_params: 设备协商的frame_duration、sample_rate，决定ogg/opus能否原样下发
+        """
+        self.decoder = StreamingPCMDecoder(file_type, sample_rate)
+        # 去除首尾静音、归一化响度，未启用时为None
+        self.postprocess = audio_postprocessor.stream()
+        self.encoder = (
+            opus_encoder_pool.acquire(*_ENCODER_KEY) if is_opus else None
+        )
+        self._pcm = bytearray()
+        # 确认能否原样下发之前保留收到的原始数据，不能时交给解码器
+        self._demuxer = None
+        self._raw = None
+        self._passthrough = False
+        if is_opus and (file_type or "").lower() in _OGG_OPUS_TYPES:
+            self._demuxer = OggOpusDemuxer()
+            self._raw = bytearray()
+            self._opus_params = opus_params or {
+                "frame_duration": FRAME_DURATION,
+                "sample_rate": TARGET_SAMPLE_RATE,
+            }
+
+    def _take_frames(self, final: bool) -> List[bytes]:
+        # 流结束时连同不足一帧的尾部一起切分（补零），否则只取完整帧
+        usable = len(self._pcm) if final else len(self._pcm) - len(self._pcm) % FRAME_BYTES
+        if not usable:
+            return []
+        frames = split_pcm_frames(bytes(self._pcm[:usable]), FRAME_SAMPLES)
+        del self._pcm[:usable]
+        if self.encoder is None:
+            return [frame.tobytes() for frame in frames]
+        return [self.encoder.encode(frame.tobytes(), FRAME_SAMPLES) for frame in frames]
+
+    def _decode(self, data: bytes) -> None:
+        pcm = self.decoder.feed(data)
+        if self.postprocess is not None:
+            pcm = self.postprocess.feed(pcm)
+        self._pcm.extend(pcm)
+
+    def _demux(self, data: bytes) -> Optional[List[bytes]]:
+        """尝试原样下发opus数据包，需要解码时返回None"""
+        if self._passthrough:
+            return self._demuxer.feed(data)
+        self._raw.extend(data)
+        try:
+            packets = self._demuxer.feed(data)
+        except ValueError:
+            packets = None
+        if packets == []:
+            # 还没有收到音频数据包，暂时无法判断
+            return []
+        if packets and opus_stream_matches(self._demuxer, packets, **self._opus_params):
+            self._passthrough = True
+            self._raw = None
+            return packets
+        self._demuxer = None
+        return None
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """送入一块音频数据，返回已凑满的帧"""
+        if self._demuxer is not None:
+            packets = self._demux(data)
+            if packets is not None:
+                return packets
+            data, self._raw = bytes(self._raw), None
+        self._decode(data)
+        return self._take_frames(final=False)
+
+    def finish(self) -> List[bytes]:
+        """音频接收完毕，返回剩余的帧"""
+        if self._passthrough:
+            return []
+        if self._demuxer is not None:
+            # 直到结束都没有解析出opus数据包，按普通音频解码
+            self._demuxer = None
+            data, self._raw = bytes(self._raw), None
+            self._decode(data)
+        pcm = self.decoder.finish()
+        if self.postprocess is not None:
+            pcm = self.postprocess.feed(pcm) + self.postprocess.finish()
+        self._pcm.extend(pcm)
+        return self._take_frames(final=True)
+
+    def close(self) -> None:
+        """释放解码资源，编码器归还到编码器池"""
+        self.decoder.close()
+        if self.encoder is not None:
+            opus_encoder_pool.release(self.encoder, *_ENCODER_KEY)
+            self.encoder = None
@@ -0,0 +1,226 @@
+"""
+TTS音频缓存
+按 TTS类型 + 音色/语速/音调等参数 + 规范化文本 计算内容地址，缓存最终的音频帧列表。
+内存中按LRU和字节数限制淘汰，被淘汰的opus帧以p3格式落盘，下次命中时再读回内存。
+"""
+
+import os
+import re
+import json
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+from core.utils import p3
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class TTSAudioCache:
+    """TTS音频缓存，进程内所有连接共享"""
+
+    def __init__(self):
+        self._logger = None
+        self._lock = threading.RLock()
+        self._memory: "OrderedDict[str, Tuple[Tuple[bytes, ...], bool]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._config_snapshot = None
+        self.enabled = False
+        self.max_memory_bytes = 64 * 1024 * 1024
+        self.max_entries = 2000
+        self.disk_dir = None
+        self.max_disk_bytes = 512 * 1024 * 1024
+        self._stats = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "spills": 0,
+        }
+
+    @property
+    def logger(self):
+        """延迟初始化 logger 以避免循环导入"""
+        if self._logger is None:
+            from config.logger import setup_logging
+
+            self._logger = setup_logging()
+        return self._logger
+
+    def configure(self, config: Optional[dict]) -> None:
+        """根据配置文件中的tts_cache节初始化，配置未变化时直接返回"""
+        config = config or {}
+        snapshot = json.dumps(config, sort_keys=True, default=str)
+        if snapshot == self._config_snapshot:
+            return
+        with self._lock:
+            self._config_snapshot = snapshot
+            self.enabled = str(config.get("enable", True)).lower() in (
+                "true",
+                "1",
+                "yes",
+            )
+            self.max_memory_bytes = int(
+                float(config.get("max_memory_mb", 64)) * 1024 * 1024
+            )
+            self.max_entries = int(config.get("max_entries", 2000))
+            self.max_disk_bytes = int(float(config.get("max_disk_mb", 512)) * 1024 * 1024)
+            self.disk_dir = config.get("disk_dir") or None
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._load_disk_index()
+
+    def _load_disk_index(self):
+        """扫描落盘目录，按修改时间恢复淘汰顺序"""
+        self._disk.clear()
+        self._disk_bytes = 0
+        if not self.enabled or not self.disk_dir:
+            return
+        os.makedirs(self.disk_dir, exist_ok=True)
+        files = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(".p3"):
+                path = os.path.join(self.disk_dir, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name[:-3], stat.st_size))
+        for _, key, size in sorted(files):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    @staticmethod
+    def make_key(provider: str, params: Dict, text: str) -> str:
+        """计算缓存键：TTS类型、合成参数和规范化文本共同决定合成结果"""
+        normalized = _WHITESPACE.sub(" ", text).strip()
+        raw = json.dumps(
+            [provider, params, normalized],
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, ...]]:
+        """获取缓存的音频帧，未命中返回None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._stats["hits"] += 1
+                self._maybe_log_stats()
+                return entry[0]
+            on_disk = key in self._disk
+
+        frames = self._read_disk(key) if on_disk else None
+        with self._lock:
+            if frames is None:
+                self._stats["misses"] += 1
+                self._maybe_log_stats()
+                return None
+            self._stats["hits"] += 1
+            self._stats["disk_hits"] += 1
+            if key in self._disk:
+                self._disk.move_to_end(key)
+        self.put(key, frames, is_opus=True)
+        return frames
+
+    def put(self, key: str, frames: Iterable[bytes], is_opus: bool = True) -> None:
+        """写入缓存，超出限制时淘汰最久未使用的条目"""
+        if not self.enabled:
+            return
+        frames = tuple(frames)
+        size = sum(len(frame) for frame in frames)
+        if size == 0 or size > self.max_memory_bytes:
+            return
+        spilled = []
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= sum(len(frame) for frame in old[0])
+            self._memory[key] = (frames, is_opus)
+            self._memory_bytes += size
+            while self._memory and (
+                self._memory_bytes > self.max_memory_bytes
+                or len(self._memory) > self.max_entries
+            ):
+                old_key, (old_frames, old_is_opus) = self._memory.popitem(last=False)
+                self._memory_bytes -= sum(len(frame) for frame in old_frames)
+                self._stats["evictions"] += 1
+                if old_is_opus and self.disk_dir and old_key not in self._disk:
+                    spilled.append((old_key, old_frames))
+
+        for old_key, old_frames in spilled:
+            self._write_disk(old_key, old_frames)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.p3")
+
+    def _read_disk(self, key: str) -> Optional[Tuple[bytes, ...]]:
+        try:
+            frames, _ = p3.decode_opus_from_file(self._path(key))
+            return tuple(frames)
+        except Exception as e:
+            self.logger.debug(f"读取TTS缓存文件失败: {e}")
+            with self._lock:
+                size = self._disk.pop(key, None)
+                if size:
+                    self._disk_bytes -= size
+            return None
+
+    def _write_disk(self, key: str, frames: Tuple[bytes, ...]) -> None:
+        """以p3格式落盘：每帧4字节头[类型, 保留, 长度]"""
+        data = b"".join(
+            struct.pack(">BBH", 0, 0, len(frame)) + frame for frame in frames
+        )
+        path = self._path(key)
+        try:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            self.logger.warning(f"写入TTS缓存文件失败: {e}")
+            return
+
+        removed = []
+        with self._lock:
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+            self._stats["spills"] += 1
+            while self._disk and self._disk_bytes > self.max_disk_bytes:
+                old_key, old_size = self._disk.popitem(last=False)
+                self._disk_bytes -= old_size
+                removed.append(old_key)
+        for old_key in removed:
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass
+
+    def _maybe_log_stats(self):
+        total = self._stats["hits"] + self._stats["misses"]
+        if total and total % 100 == 0:
+            self.logger.info(f"TTS缓存统计: {self.get_stats()}")
+
+    def get_stats(self) -> Dict:
+        """获取缓存统计信息"""
+        with self._lock:
+            total = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": f"{self._stats['hits'] / total * 100:.1f}%"
+                if total
+                else "0%",
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+# 创建全局TTS音频缓存实例
+tts_audio_cache = TTSAudioCache()
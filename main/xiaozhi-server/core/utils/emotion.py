@@ -0,0 +1,646 @@
+"""
+文本情绪识别
+所有情绪关键词、特殊句型、表情符号和标点在导入时编译为一个Aho-Corasick自动机，
+每句话只需扫描一遍就能得到各关键词的出现次数（与str.count相同，不重叠计数），
+再按原有规则判断情绪：表情符号 > 特殊句型 > 标点 > 关键词加权打分。
+"""
+
+from typing import Dict, List, Tuple
+
+emoji_map = {
+    "neutral": "😶",
+    "happy": "🙂",
+    "laughing": "😆",
+    "funny": "😂",
+    "sad": "😔",
+    "angry": "😠",
+    "crying": "😭",
+    "loving": "😍",
+    "embarrassed": "😳",
+    "surprised": "😲",
+    "shocked": "😱",
+    "thinking": "🤔",
+    "winking": "😉",
+    "cool": "😎",
+    "relaxed": "😌",
+    "delicious": "🤤",
+    "kissy": "😘",
+    "confident": "😏",
+    "sleepy": "😴",
+    "silly": "😜",
+    "confused": "🙄",
+}
+
+# 情感关键词（中英文），同一个词可能属于多种情绪，也可能在同一情绪中重复出现（重复时按次数加分）
+EMOTION_KEYWORDS = {
+    "happy": [
+        "开心",
+        "高兴",
+        "快乐",
+        "愉快",
+        "幸福",
+        "满意",
+        "棒",
+        "好",
+        "不错",
+        "完美",
+        "棒极了",
+        "太好了",
+        "好呀",
+        "好的",
+        "happy",
+        "joy",
+        "great",
+        "good",
+        "nice",
+        "awesome",
+        "fantastic",
+        "wonderful",
+    ],
+    "laughing": [
+        "哈哈",
+        "哈哈哈",
+        "呵呵",
+        "嘿嘿",
+        "嘻嘻",
+        "笑死",
+        "太好笑了",
+        "笑死我了",
+        "lol",
+        "lmao",
+        "haha",
+        "hahaha",
+        "hehe",
+        "rofl",
+        "funny",
+        "laugh",
+    ],
+    "funny": [
+        "搞笑",
+        "滑稽",
+        "逗",
+        "幽默",
+        "笑点",
+        "段子",
+        "笑话",
+        "太逗了",
+        "hilarious",
+        "joke",
+        "comedy",
+    ],
+    "sad": [
+        "伤心",
+        "难过",
+        "悲哀",
+        "悲伤",
+        "忧郁",
+        "郁闷",
+        "沮丧",
+        "失望",
+        "想哭",
+        "难受",
+        "不开心",
+        "唉",
+        "呜呜",
+        "sad",
+        "upset",
+        "unhappy",
+        "depressed",
+        "sorrow",
+        "gloomy",
+    ],
+    "angry": [
+        "生气",
+        "愤怒",
+        "气死",
+        "讨厌",
+        "烦人",
+        "可恶",
+        "烦死了",
+        "恼火",
+        "暴躁",
+        "火大",
+        "愤怒",
+        "气炸了",
+        "angry",
+        "mad",
+        "annoyed",
+        "furious",
+        "pissed",
+        "hate",
+    ],
+    "crying": [
+        "哭泣",
+        "泪流",
+        "大哭",
+        "伤心欲绝",
+        "泪目",
+        "流泪",
+        "哭死",
+        "哭晕",
+        "想哭",
+        "泪崩",
+        "cry",
+        "crying",
+        "tears",
+        "sob",
+        "weep",
+    ],
+    "loving": [
+        "爱你",
+        "喜欢",
+        "爱",
+        "亲爱的",
+        "宝贝",
+        "么么哒",
+        "抱抱",
+        "想你",
+        "思念",
+        "最爱",
+        "亲亲",
+        "喜欢你",
+        "love",
+        "like",
+        "adore",
+        "darling",
+        "sweetie",
+        "honey",
+        "miss you",
+        "heart",
+    ],
+    "embarrassed": [
+        "尴尬",
+        "不好意思",
+        "害羞",
+        "脸红",
+        "难为情",
+        "社死",
+        "丢脸",
+        "出丑",
+        "embarrassed",
+        "awkward",
+        "shy",
+        "blush",
+    ],
+    "surprised": [
+        "惊讶",
+        "吃惊",
+        "天啊",
+        "哇塞",
+        "哇",
+        "居然",
+        "竟然",
+        "没想到",
+        "出乎意料",
+        "surprise",
+        "wow",
+        "omg",
+        "oh my god",
+        "amazing",
+        "unbelievable",
+    ],
+    "shocked": [
+        "震惊",
+        "吓到",
+        "惊呆了",
+        "不敢相信",
+        "震撼",
+        "吓死",
+        "恐怖",
+        "害怕",
+        "吓人",
+        "shocked",
+        "shocking",
+        "scared",
+        "frightened",
+        "terrified",
+        "horror",
+    ],
+    "thinking": [
+        "思考",
+        "考虑",
+        "想一下",
+        "琢磨",
+        "沉思",
+        "冥想",
+        "想",
+        "思考中",
+        "在想",
+        "think",
+        "thinking",
+        "consider",
+        "ponder",
+        "meditate",
+    ],
+    "winking": [
+        "调皮",
+        "眨眼",
+        "你懂的",
+        "坏笑",
+        "邪恶",
+        "奸笑",
+        "使眼色",
+        "wink",
+        "teasing",
+        "naughty",
+        "mischievous",
+    ],
+    "cool": [
+        "酷",
+        "帅",
+        "厉害",
+        "棒极了",
+        "真棒",
+        "牛逼",
+        "强",
+        "优秀",
+        "杰出",
+        "出色",
+        "完美",
+        "cool",
+        "awesome",
+        "amazing",
+        "great",
+        "impressive",
+        "perfect",
+    ],
+    "relaxed": [
+        "放松",
+        "舒服",
+        "惬意",
+        "悠闲",
+        "轻松",
+        "舒适",
+        "安逸",
+        "自在",
+        "relax",
+        "relaxed",
+        "comfortable",
+        "cozy",
+        "chill",
+        "peaceful",
+    ],
+    "delicious": [
+        "好吃",
+        "美味",
+        "香",
+        "馋",
+        "可口",
+        "香甜",
+        "大餐",
+        "大快朵颐",
+        "流口水",
+        "垂涎",
+        "delicious",
+        "yummy",
+        "tasty",
+        "yum",
+        "appetizing",
+        "mouthwatering",
+    ],
+    "kissy": [
+        "亲亲",
+        "么么",
+        "吻",
+        "mua",
+        "muah",
+        "亲一下",
+        "飞吻",
+        "kiss",
+        "xoxo",
+        "hug",
+        "muah",
+        "smooch",
+    ],
+    "confident": [
+        "自信",
+        "肯定",
+        "确定",
+        "毫无疑问",
+        "当然",
+        "必须的",
+        "毫无疑问",
+        "确信",
+        "坚信",
+        "confident",
+        "sure",
+        "certain",
+        "definitely",
+        "positive",
+    ],
+    "sleepy": [
+        "困",
+        "睡觉",
+        "晚安",
+        "想睡",
+        "好累",
+        "疲惫",
+        "疲倦",
+        "困了",
+        "想休息",
+        "睡意",
+        "sleep",
+        "sleepy",
+        "tired",
+        "exhausted",
+        "bedtime",
+        "good night",
+    ],
+    "silly": [
+        "傻",
+        "笨",
+        "呆",
+        "憨",
+        "蠢",
+        "二",
+        "憨憨",
+        "傻乎乎",
+        "呆萌",
+        "silly",
+        "stupid",
+        "dumb",
+        "foolish",
+        "goofy",
+        "ridiculous",
+    ],
+    "confused": [
+        "疑惑",
+        "不明白",
+        "不懂",
+        "困惑",
+        "疑问",
+        "为什么",
+        "怎么回事",
+        "啥意思",
+        "不清楚",
+        "confused",
+        "puzzled",
+        "doubt",
+        "question",
+        "what",
+        "why",
+        "how",
+    ],
+}
+
+# 特殊句型（中英文），按顺序判断，命中即返回对应情绪
+SPECIAL_PHRASES = [
+    (
+        # 赞美他人
+        "loving",
+        [
+            "你真",
+            "你好",
+            "您真",
+            "你真棒",
+            "你好厉害",
+            "你太强了",
+            "你真好",
+            "你真聪明",
+            "you are",
+            "you're",
+            "you look",
+            "you seem",
+            "so smart",
+            "so kind",
+        ],
+    ),
+    (
+        # 自我赞美
+        "cool",
+        [
+            "我真",
+            "我最",
+            "我太棒了",
+            "我厉害",
+            "我聪明",
+            "我优秀",
+            "i am",
+            "i'm",
+            "i feel",
+            "so good",
+            "so happy",
+        ],
+    ),
+    (
+        # 晚安/睡觉相关
+        "sleepy",
+        [
+            "睡觉",
+            "晚安",
+            "睡了",
+            "好梦",
+            "休息了",
+            "去睡了",
+            "sleep",
+            "good night",
+            "bedtime",
+            "go to bed",
+        ],
+    ),
+]
+
+# 多个情感同分时的优先级
+PRIORITY_ORDER = [
+    "laughing",
+    "crying",
+    "angry",
+    "surprised",
+    "shocked",  # 强烈情感优先
+    "loving",
+    "happy",
+    "funny",
+    "cool",  # 积极情感
+    "sad",
+    "embarrassed",
+    "confused",  # 消极情感
+    "thinking",
+    "winking",
+    "relaxed",  # 中性情感
+    "delicious",
+    "kissy",
+    "confident",
+    "sleepy",
+    "silly",  # 特殊场景
+]
+
+EXCLAMATIONS = ("!", "！")
+QUESTIONS = ("?", "？")
+ELLIPSES = ("...", "…")
+# 感叹句中判断积极/消极内容的关键词所属情绪
+POSITIVE_EMOTIONS = ("happy", "laughing", "cool")
+NEGATIVE_EMOTIONS = ("angry", "sad", "crying")
+# 长文本中重复出现的关键词额外加分
+LONG_TEXT_LENGTH = 20
+REPEAT_WEIGHT = 0.5
+
+
+class KeywordAutomaton:
+    """Aho-Corasick自动机，一次扫描统计所有关键词的出现次数"""
+
+    def __init__(self, keywords: List[str]):
+        self.keywords = keywords
+        self._lengths = [len(keyword) for keyword in keywords]
+        self._goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for kid, keyword in enumerate(keywords):
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(kid)
+
+        # 按广度优先顺序计算失败指针，并把失败指针上的输出合并进来
+        self._fail = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail
+                outputs[next_state].extend(outputs[fail])
+                queue.append(next_state)
+        self._outputs = [tuple(output) for output in outputs]
+
+    def count(self, text: str) -> Dict[int, int]:
+        """
+        统计每个关键词在text中不重叠出现的次数
+        :return: {关键词序号: 次数}，只包含出现过的关键词
+        """
+        goto, fail, outputs, lengths = self._goto, self._fail, self._outputs, self._lengths
+        counts: Dict[int, int] = {}
+        last_end: Dict[int, int] = {}
+        state = 0
+        for end, char in enumerate(text, 1):
+            next_state = goto[state].get(char)
+            while next_state is None and state:
+                state = fail[state]
+                next_state = goto[state].get(char)
+            state = next_state or 0
+            output = outputs[state]
+            if not output:
+                continue
+            for kid in output:
+                # 与上一次计数的位置重叠时不计数
+                if end - lengths[kid] >= last_end.get(kid, 0):
+                    counts[kid] = counts.get(kid, 0) + 1
+                    last_end[kid] = end
+        return counts
+
+
+class EmotionClassifier:
+    """基于关键词自动机的情绪识别，导入时构建一次，所有连接共享"""
+
+    def __init__(self):
+        keywords: List[str] = []
+        index: Dict[str, int] = {}
+
+        def keyword_id(keyword: str) -> int:
+            if keyword not in index:
+                index[keyword] = len(keywords)
+                keywords.append(keyword)
+            return index[keyword]
+
+        self._emojis = {
+            keyword_id(emoji): rank for rank, emoji in enumerate(emoji_map.values())
+        }
+        self._emotions_by_emoji = list(emoji_map.keys())
+        self._exclamations = {keyword_id(mark) for mark in EXCLAMATIONS}
+        self._questions = {keyword_id(mark) for mark in QUESTIONS}
+        self._ellipses = {keyword_id(mark) for mark in ELLIPSES}
+        self._special: List[Tuple[str, set]] = [
+            (emotion, {keyword_id(phrase) for phrase in phrases})
+            for emotion, phrases in SPECIAL_PHRASES
+        ]
+        # 关键词 -> [(情绪, 在该情绪中出现的次数)]
+        self._listings: Dict[int, Dict[str, int]] = {}
+        for emotion, words in EMOTION_KEYWORDS.items():
+            for word in words:
+                listing = self._listings.setdefault(keyword_id(word), {})
+                listing[emotion] = listing.get(emotion, 0) + 1
+        self._positive = {
+            kid
+            for emotion in POSITIVE_EMOTIONS
+            for kid in map(index.get, EMOTION_KEYWORDS[emotion])
+        }
+        self._negative = {
+            kid
+            for emotion in NEGATIVE_EMOTIONS
+            for kid in map(index.get, EMOTION_KEYWORDS[emotion])
+        }
+        self._priority = {emotion: rank for rank, emotion in enumerate(PRIORITY_ORDER)}
+        self.automaton = KeywordAutomaton(keywords)
+
+    def analyze(self, text) -> str:
+        """分析文本情感并返回对应的情绪名称（支持中英文）"""
+        if not text or not isinstance(text, str):
+            return "neutral"
+
+        # 转小写、去掉首尾空白不影响表情符号和标点的判断，一次扫描即可
+        text = text.lower().strip()
+        counts = self.automaton.count(text)
+        found = counts.keys()
+
+        # 检查是否包含现有emoji，按emoji_map的顺序取第一个
+        emoji_ranks = [self._emojis[kid] for kid in found if kid in self._emojis]
+        if emoji_ranks:
+            return self._emotions_by_emoji[min(emoji_ranks)]
+
+        # 特殊句型判断
+        for emotion, phrases in self._special:
+            if not phrases.isdisjoint(found):
+                return emotion
+
+        # 标点符号分析
+        has_exclamation = not self._exclamations.isdisjoint(found)
+        has_question = not self._questions.isdisjoint(found)
+        # 疑问句
+        if has_question and not has_exclamation:
+            return "thinking"
+        # 强烈情感（感叹号）
+        if has_exclamation and not has_question:
+            if not self._positive.isdisjoint(found):
+                return "laughing"
+            if not self._negative.isdisjoint(found):
+                return "angry"
+            return "surprised"
+        # 省略号（表示犹豫或思考）
+        if not self._ellipses.isdisjoint(found):
+            return "thinking"
+
+        # 关键词匹配（带权重）：出现即加1分，长文本中每出现一次再加0.5分
+        long_text = len(text) > LONG_TEXT_LENGTH
+        scores = {emotion: 0 for emotion in emoji_map.keys()}
+        for kid, count in counts.items():
+            listing = self._listings.get(kid)
+            if not listing:
+                continue
+            weight = 1 + (count * REPEAT_WEIGHT if long_text else 0)
+            for emotion, times in listing.items():
+                scores[emotion] += weight * times
+
+        max_score = max(scores.values())
+        if max_score == 0:
+            return "happy"  # 默认
+
+        # 可能有多个情感同分，按优先级选择，都不在优先级列表里时返回第一个
+        top_emotions = [e for e, s in scores.items() if s == max_score]
+        return min(
+            top_emotions,
+            key=lambda emotion: self._priority.get(emotion, len(self._priority)),
+        )
+
+
+emotion_classifier = EmotionClassifier()
+
+
+def analyze_emotion(text) -> str:
+    """分析文本情感并返回对应的情绪名称（支持中英文）"""
+    return emotion_classifier.analyze(text)
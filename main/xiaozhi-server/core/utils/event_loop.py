@@ -0,0 +1,86 @@
+"""
+后台事件循环
+ASR/TTS 的识别、合成经常运行在临时创建的事件循环或工作线程中，
+而 websocket、HTTP 连接池这类长连接对象只能在创建它的事件循环中使用。
+这里提供常驻后台线程的事件循环，长连接统一放在后台循环中创建和使用，
+任意线程、任意事件循环都可以把协程提交过来执行；
+以及工作线程专属的常驻事件循环，避免每次asyncio.run都新建、销毁事件循环。
+"""
+
+import asyncio
+import threading
+import concurrent.futures
+from typing import Dict
+
+
+class BackgroundEventLoop:
+    """运行在独立守护线程中的事件循环"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._run, name=f"bg-loop-{name}", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def in_loop(self) -> bool:
+        """当前是否运行在后台循环中"""
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """提交协程到后台循环，返回线程安全的Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def run(self, coro):
+        """在任意事件循环中等待协程在后台循环中执行完成"""
+        if self.in_loop():
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def run_sync(self, coro, timeout=None):
+        """在普通线程中阻塞等待协程在后台循环中执行完成"""
+        return self.submit(coro).result(timeout)
+
+    def call_soon(self, callback, *args):
+        """线程安全地在后台循环中调度回调，回调按提交顺序执行"""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+
+_loops: Dict[str, BackgroundEventLoop] = {}
+_loops_lock = threading.Lock()
+_thread_local = threading.local()
+
+
+def get_background_loop(name: str = "io") -> BackgroundEventLoop:
+    """获取（必要时创建）指定名称的后台事件循环"""
+    with _loops_lock:
+        bg_loop = _loops.get(name)
+        if bg_loop is None:
+            bg_loop = BackgroundEventLoop(name)
+            _loops[name] = bg_loop
+        return bg_loop
+
+
+def get_thread_loop() -> asyncio.AbstractEventLoop:
+    """获取当前工作线程专属的常驻事件循环，替代每次调用asyncio.run新建循环"""
+    loop = getattr(_thread_local, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        _thread_local.loop = loop
+    return loop
+
+
+def run_in_thread_loop(coro, timeout=None):
+    """在当前线程的常驻事件循环中执行协程，可设置单次调用超时"""
+    if timeout:
+        coro = asyncio.wait_for(coro, timeout)
+    return get_thread_loop().run_until_complete(coro)
@@ -0,0 +1,160 @@
+"""
+共享HTTP客户端
+按目标地址（scheme://host:port）复用aiohttp会话，保持keep-alive长连接，
+避免每次请求都重新建立TCP/TLS连接，并限制单个地址的并发连接数。
+会话统一运行在后台事件循环中，任意线程、任意事件循环都可以直接调用request/stream。
+"""
+
+import json
+import asyncio
+import aiohttp
+from typing import AsyncIterator, Dict
+from multidict import CIMultiDict
+from urllib.parse import urlsplit
+from config.logger import setup_logging
+from core.utils.event_loop import get_background_loop
+
+TAG = __name__
+logger = setup_logging()
+
+# 单个目标地址的最大并发连接数
+DEFAULT_LIMIT_PER_HOST = 32
+# 空闲keep-alive连接保留时间（秒）
+DEFAULT_KEEPALIVE_TIMEOUT = 60
+
+_sessions: Dict[str, aiohttp.ClientSession] = {}
+_settings = {
+    "limit_per_host": DEFAULT_LIMIT_PER_HOST,
+    "keepalive_timeout": DEFAULT_KEEPALIVE_TIMEOUT,
+}
+_STREAM_END = object()
+
+
+class HttpStatusError(Exception):
+    """流式请求返回了错误状态码"""
+
+    def __init__(self, status: int, content: bytes):
+        self.status = status
+        self.content = content
+        super().__init__(
+            f"HTTP {status}: {content.decode('utf-8', errors='replace')[:500]}"
+        )
+
+
+def configure(config: dict = None) -> None:
+    """根据配置调整连接池参数，只影响之后新建的会话"""
+    config = config or {}
+    _settings["limit_per_host"] = int(
+        config.get("limit_per_host", DEFAULT_LIMIT_PER_HOST)
+    )
+    _settings["keepalive_timeout"] = float(
+        config.get("keepalive_timeout", DEFAULT_KEEPALIVE_TIMEOUT)
+    )
+
+
+class HttpResponse:
+    """已读取完毕的HTTP响应，headers不区分大小写"""
+
+    def __init__(self, status: int, reason: str, headers: CIMultiDict, content: bytes):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_session(url: str) -> aiohttp.ClientSession:
+    """获取目标地址对应的共享会话，只能在后台事件循环中调用"""
+    origin = _origin(url)
+    session = _sessions.get(origin)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit_per_host=_settings["limit_per_host"],
+            keepalive_timeout=_settings["keepalive_timeout"],
+        )
+        session = aiohttp.ClientSession(connector=connector)
+        _sessions[origin] = session
+        logger.bind(tag=TAG).debug(f"创建共享HTTP会话: {origin}")
+    return session
+
+
+async def _request(method: str, url: str, timeout: float, **kwargs) -> HttpResponse:
+    session = get_session(url)
+    async with session.request(
+        method, url, timeout=aiohttp.ClientTimeout(total=timeout), **kwargs
+    ) as response:
+        content = await response.read()
+        return HttpResponse(
+            response.status, response.reason, CIMultiDict(response.headers), content
+        )
+
+
+async def request(method: str, url: str, timeout: float = 30, **kwargs) -> HttpResponse:
+    """
+    发送HTTP请求并读取完整响应
+    :param method: 请求方法
+    :param url: 请求地址
+    :param timeout: 总超时时间（秒）
+    :param kwargs: 透传给aiohttp的参数，如headers、params、data、json
+    """
+    return await get_background_loop().run(_request(method, url, timeout, **kwargs))
+
+
+async def stream(
+    method: str, url: str, timeout: float = 30, chunk_size: int = 4096, **kwargs
+) -> AsyncIterator[bytes]:
+    """
+    发送HTTP请求并边接收边返回响应体，适合音频等较大的响应
+    响应状态码不是2xx时抛出HttpStatusError
+    """
+    bg_loop = get_background_loop()
+    caller_loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue()
+
+    def emit(item):
+        caller_loop.call_soon_threadsafe(chunks.put_nowait, item)
+
+    async def produce():
+        try:
+            session = get_session(url)
+            async with session.request(
+                method, url, timeout=aiohttp.ClientTimeout(total=timeout), **kwargs
+            ) as response:
+                if not 200 <= response.status < 300:
+                    raise HttpStatusError(response.status, await response.read())
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    emit(chunk)
+            emit(_STREAM_END)
+        except BaseException as e:
+            emit(e)
+
+    if bg_loop.in_loop():
+        producer = asyncio.ensure_future(produce())
+    else:
+        producer = bg_loop.submit(produce())
+    try:
+        while True:
+            item = await chunks.get()
+            if item is _STREAM_END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # 调用方提前停止读取时中断请求
+        producer.cancel()
@@ -0,0 +1,189 @@
+"""
+进程内共享的LLM实例注册表
+主模型、意图识别和记忆总结使用的LLM按配置指纹（类型、地址、模型、密钥及参数）共享，
+配置相同的连接共用同一个实例和它的HTTP连接池，不再每个连接各建一个客户端：
+- acquire获取实例并增加引用计数，连接关闭时release
+- 连接使用服务器级的主LLM时通过retain持有引用，配置热更新后旧实例在连接关闭前不会被回收
+- 没有引用的实例继续缓存，超过max_instances时回收最久未使用的
+- 配置热更新后回收新配置中已不存在、且没有引用的实例
+- 回收实例时关闭它的HTTP连接池
+"""
+
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict
+from config.logger import setup_logging
+from core.utils import llm
+
+TAG = __name__
+logger = setup_logging()
+
+# 最多缓存的不同LLM配置数
+MAX_INSTANCES = 32
+
+
+class _Entry:
+    __slots__ = ("name", "provider", "refs")
+
+    def __init__(self, name, provider):
+        self.name = name
+        self.provider = provider
+        self.refs = 0
+
+
+class LLMRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 配置指纹 -> 实例，按最近使用排序
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # id(实例) -> 配置指纹
+        self._keys: Dict[int, str] = {}
+        self.max_instances = MAX_INSTANCES
+
+    @staticmethod
+    def llm_type(name: str, config: dict) -> str:
+        return config.get("type", name)
+
+    @classmethod
+    def fingerprint(cls, name: str, config: dict) -> str:
+        """LLM类型和全部配置项的摘要，密钥也参与计算但不会出现在日志中"""
+        payload = json.dumps(
+            {"type": cls.llm_type(name, config), "config": config},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def acquire(self, name: str, config: dict):
+        """获取配置对应的共享实例，用完后调用release"""
+        key = self.fingerprint(name, config)
+        provider = self._take(key)
+        if provider is not None:
+            return provider
+        # 创建实例可能较慢（初始化客户端、读取本地模型等），不占用全局锁
+        provider = llm.create_instance(self.llm_type(name, config), config)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _Entry(name, provider)
+                self._entries[key] = entry
+                self._keys[id(provider)] = key
+                logger.bind(tag=TAG).info(
+                    f"创建共享LLM实例: {name}, 当前共{len(self._entries)}个"
+                )
+                duplicate = None
+            else:
+                # 其他线程已经创建了同一配置的实例，使用先创建的
+                self._entries.move_to_end(key)
+                duplicate = provider
+            entry.refs += 1
+            removed = self._evict()
+            provider = entry.provider
+        self._close_all(removed + ([duplicate] if duplicate is not None else []))
+        return provider
+
+    def _take(self, key: str):
+        """已有实例时增加引用计数并返回，否则返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            entry.refs += 1
+            return entry.provider
+
+    def retain(self, provider) -> bool:
+        """为其他地方acquire得到的实例增加一个引用，用完后同样调用release；不是注册表中的实例时返回False"""
+        if provider is None:
+            return False
+        with self._lock:
+            key = self._keys.get(id(provider))
+            entry = self._entries.get(key) if key is not None else None
+            if entry is None or entry.provider is not provider:
+                return False
+            entry.refs += 1
+            return True
+
+    def release(self, provider) -> None:
+        """释放acquire获取的实例，不是注册表中的实例时忽略"""
+        if provider is None:
+            return
+        with self._lock:
+            key = self._keys.get(id(provider))
+            entry = self._entries.get(key) if key is not None else None
+            if entry is None or entry.provider is not provider:
+                return
+            entry.refs = max(entry.refs - 1, 0)
+            removed = self._evict() if entry.refs == 0 else []
+        self._close_all(removed)
+
+    def _evict(self) -> list:
+        """超出上限时从最久未使用的开始回收没有引用的实例，返回回收的实例"""
+        overflow = len(self._entries) - self.max_instances
+        if overflow <= 0:
+            return []
+        keys = [k for k, e in self._entries.items() if e.refs == 0][:overflow]
+        return [self._remove(key) for key in keys]
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._keys.pop(id(entry.provider), None)
+        logger.bind(tag=TAG).info(f"回收共享LLM实例: {entry.name}")
+        return entry.provider
+
+    @staticmethod
+    def _close_all(providers) -> None:
+        """在锁外关闭回收实例的HTTP连接池"""
+        for provider in providers:
+            client = getattr(provider, "client", None)
+            close = getattr(client, "close", None)
+            if not callable(close):
+                continue
+            try:
+                close()
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"关闭LLM连接池失败: {e}")
+
+    def refresh(self, config: dict) -> None:
+        """配置热更新后调用，回收新配置中已不存在且没有引用的实例"""
+        settings = config.get("llm_registry") or {}
+        try:
+            self.max_instances = max(int(settings.get("max_instances", MAX_INSTANCES)), 1)
+        except (ValueError, TypeError):
+            self.max_instances = MAX_INSTANCES
+
+        current = set()
+        for name, llm_config in (config.get("LLM") or {}).items():
+            if isinstance(llm_config, str):
+                try:
+                    llm_config = json.loads(llm_config)
+                except ValueError:
+                    continue
+            if isinstance(llm_config, dict):
+                current.add(self.fingerprint(name, llm_config))
+
+        with self._lock:
+            removed = [
+                self._remove(k)
+                for k in [
+                    k for k, e in self._entries.items() if e.refs == 0 and k not in current
+                ]
+            ]
+            removed += self._evict()
+        self._close_all(removed)
+        logger.bind(tag=TAG).info(f"共享LLM实例统计: {self.stats()}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "instances": len(self._entries),
+                "in_use": sum(1 for e in self._entries.values() if e.refs > 0),
+                "refs": sum(e.refs for e in self._entries.values()),
+            }
+
+
+# 全局LLM实例注册表
+llm_registry = LLMRegistry()
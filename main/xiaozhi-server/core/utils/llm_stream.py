@@ -0,0 +1,74 @@
+"""
+LLM流式回复的解析
+同步（线程池）和异步（事件循环）两种聊天方式共用：逐块送入回复，
+累积工具调用的名称和参数，返回需要朗读的文本。
+"""
+
+import json
+import uuid
+from typing import List, Optional
+
+from core.utils.util import extract_json_from_string
+
+
+class LLMStreamParser:
+    def __init__(self, with_functions: bool):
+        self.with_functions = with_functions
+        self.tool_call = False
+        self.function_name = None
+        self.function_id = None
+        self.function_arguments = ""
+        self.content_arguments = ""
+        # 本轮回复中朗读的文本，结束后写入对话历史
+        self.response_message: List[str] = []
+
+    def feed(self, response) -> Optional[str]:
+        """送入一块回复，返回其中的文本内容"""
+        if not self.with_functions:
+            content = response
+        else:
+            content, tools_call = response
+            if "content" in response:
+                content = response["content"]
+                tools_call = None
+            if content is not None and len(content) > 0:
+                self.content_arguments += content
+
+            if not self.tool_call and self.content_arguments.startswith("<tool_call>"):
+                self.tool_call = True
+
+            if tools_call is not None and len(tools_call) > 0:
+                self.tool_call = True
+                if tools_call[0].id is not None:
+                    self.function_id = tools_call[0].id
+                if tools_call[0].function.name is not None:
+                    self.function_name = tools_call[0].function.name
+                if tools_call[0].function.arguments is not None:
+                    self.function_arguments += tools_call[0].function.arguments
+
+        if content is not None and len(content) > 0 and not self.tool_call:
+            self.response_message.append(content)
+        return content
+
+    def function_call_data(self) -> Optional[dict]:
+        """回复结束后取出工具调用，解析失败时返回None，原文计入回复文本"""
+        if self.function_id is None:
+            a = extract_json_from_string(self.content_arguments)
+            if a is None:
+                self.response_message.append(self.content_arguments)
+                return None
+            try:
+                content_arguments_json = json.loads(a)
+                self.function_name = content_arguments_json["name"]
+                self.function_arguments = json.dumps(
+                    content_arguments_json["arguments"], ensure_ascii=False
+                )
+                self.function_id = str(uuid.uuid4().hex)
+            except Exception:
+                self.response_message.append(a)
+                return None
+        return {
+            "name": self.function_name,
+            "id": self.function_id,
+            "arguments": self.function_arguments,
+        }
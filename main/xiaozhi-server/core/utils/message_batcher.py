@@ -0,0 +1,164 @@
+"""
+设备websocket消息合并发送
+每句话的控制消息（llm情绪、tts sentence_start/sentence_end/stop）先序列化后排队，
+与相邻的音频帧在同一次写入中发出，消息之间的先后顺序与逐条发送时完全一致：
+- 安装了orjson时用它序列化，否则使用标准库json
+- 不带文本的tts状态消息（如stop）每个会话只序列化一次
+- websockets连接上多条消息编码后合并为一次socket写入，并照常执行写缓冲的流量控制。
+  合并写入用到websockets asyncio实现的内部接口，只在验证过的版本上启用，
+  其他版本或其他websocket实现通过公开的send逐条发送
+"""
+
+import json
+import time
+import asyncio
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from websockets.asyncio.connection import Connection as _WebsocketConnection
+    from websockets.version import version as _websockets_version
+except ImportError:
+    _WebsocketConnection = None
+    _websockets_version = ""
+
+Payload = Union[bytes, str, dict]
+
+# 验证过合并写入的websockets主版本
+_BATCH_WRITE_VERSIONS = ("14",)
+_BATCH_WRITE_ATTRS = ("send_context", "protocol", "transport", "fragmented_send_waiter")
+
+
+def supports_batch_write(websocket) -> bool:
+    """是否可以把多条消息合并为一次socket写入"""
+    if _WebsocketConnection is None or not isinstance(websocket, _WebsocketConnection):
+        return False
+    if _websockets_version.split(".")[0] not in _BATCH_WRITE_VERSIONS:
+        return False
+    return all(hasattr(websocket, attr) for attr in _BATCH_WRITE_ATTRS)
+
+
+def encode_message(message: dict) -> bytes:
+    """序列化一条控制消息为UTF-8编码的JSON"""
+    if orjson is not None:
+        return orjson.dumps(message)
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class MessageBatcher:
+    """每个连接一个，合并控制消息与音频帧的写入"""
+
+    def __init__(self, websocket=None):
+        self.websocket = websocket
+        self._pending: List[bytes] = []
+        self._cache: Dict[tuple, bytes] = {}
+        # 每次写入后的回调，用于检查发送积压
+        self.on_write: Optional[Callable[[], None]] = None
+        # 发送统计：消息数、帧数、socket写入次数
+        self.messages = 0
+        self.frames = 0
+        self.writes = 0
+        self.send_seconds = 0.0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def cached(self, key: tuple, build: Callable[[], dict]) -> bytes:
+        """序列化内容不变的消息，同一个key只序列化一次"""
+        payload = self._cache.get(key)
+        if payload is None:
+            payload = encode_message(build())
+            self._cache[key] = payload
+        return payload
+
+    def queue(self, message: Payload) -> None:
+        """控制消息排队，随下一次发送一起写入，str为已序列化的JSON文本"""
+        if isinstance(message, str):
+            message = message.encode()
+        elif not isinstance(message, bytes):
+            message = encode_message(message)
+        self._pending.append(message)
+
+    async def send_message(self, message: Payload) -> None:
+        """立即发送一条控制消息（连同之前排队的消息）
+        所有发往设备的文本消息都应通过这里发送，不能绕过排队中的消息直接调用websocket.send
+        """
+        self.queue(message)
+        await self.send()
+
+    async def flush(self) -> None:
+        """发送所有排队的控制消息"""
+        if self._pending:
+            await self.send()
+
+    async def send(self, frames: Sequence[bytes] = ()) -> None:
+        """按顺序发送排队的控制消息和音频帧"""
+        messages, self._pending = self._pending, []
+        if not messages and not frames:
+            return
+        self.messages += len(messages)
+        self.frames += len(frames)
+        start = time.monotonic()
+        try:
+            websocket = self.websocket
+            if supports_batch_write(websocket):
+                await self._write(websocket, messages, frames)
+            else:
+                # 其他websocket实现或版本逐条发送
+                for message in messages:
+                    await websocket.send(message.decode())
+                for frame in frames:
+                    await websocket.send(frame)
+                self.writes += len(messages) + len(frames)
+        finally:
+            self.send_seconds += time.monotonic() - start
+        if self.on_write is not None:
+            self.on_write()
+
+    async def _write(self, websocket, messages, frames) -> None:
+        # 与Connection.send一致：分片消息发送期间不插入其他消息
+        while websocket.fragmented_send_waiter is not None:
+            await asyncio.shield(websocket.fragmented_send_waiter)
+        # websockets的send_context检查连接状态，退出时等待写缓冲降到水位以下
+        async with websocket.send_context():
+            protocol = websocket.protocol
+            for message in messages:
+                protocol.send_text(message)
+            for frame in frames:
+                protocol.send_binary(frame)
+            self._write_data(websocket.transport, protocol.data_to_send())
+        self.writes += 1
+
+    @staticmethod
+    def _write_data(transport, chunks) -> None:
+        """合并写入待发送的数据，空bytes表示之后关闭TCP连接，与Connection.send_data的处理一致"""
+        buffer = []
+        for chunk in chunks:
+            if chunk:
+                buffer.append(chunk)
+                continue
+            if buffer:
+                transport.write(b"".join(buffer))
+                buffer = []
+            if transport.can_write_eof():
+                try:
+                    transport.write_eof()
+                except (OSError, RuntimeError):
+                    pass
+            else:
+                transport.close()
+        if buffer:
+            transport.write(b"".join(buffer))
+
+    def stats(self) -> dict:
+        return {
+            "messages": self.messages,
+            "frames": self.frames,
+            "writes": self.writes,
+            "send_ms": round(self.send_seconds * 1000, 1),
+        }
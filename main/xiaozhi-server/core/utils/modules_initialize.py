@@ -1,6 +1,7 @@
 from typing import Dict, Any
 from config.logger import setup_logging
-from core.utils import tts, llm, intent, memory, vad, asr
+from core.utils import tts, intent, memory, vad, asr
+from core.utils.llm_registry import llm_registry
 import json
 
 TAG = __name__
@@ -42,13 +43,9 @@ def initialize_modules(
         if isinstance(config["LLM"][select_llm_module], str):
             config["LLM"][select_llm_module] = json.loads(config["LLM"][select_llm_module])
 
-        llm_type = (
-            select_llm_module
-            if "type" not in config["LLM"][select_llm_module]
-            else config["LLM"][select_llm_module]["type"]
-        )
-        modules["llm"] = llm.create_instance(
-            llm_type,
+        # 相同配置的LLM在进程内共享，持有者不再使用时需要release
+        modules["llm"] = llm_registry.acquire(
+            select_llm_module,
             config["LLM"][select_llm_module],
         )
         logger.bind(tag=TAG).info(f"初始化组件: llm成功 {select_llm_module}")
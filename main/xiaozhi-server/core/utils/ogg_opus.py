@@ -0,0 +1,261 @@
+"""
+Ogg/Opus 封装与解封装
+设备上传的本身就是opus数据包，直接封装为Ogg容器即可交给支持ogg/opus的接口，
+无需先解码为PCM再上传，数据量约为WAV的十分之一。
+反过来，TTS返回的Ogg/Opus音频直接拆出opus数据包，帧时长与设备一致时原样下发，
+省去解码、重新编码的开销和二次编码的音质损失。
+参考：RFC 3533（Ogg）、RFC 7845（Ogg Opus）
+"""
+
+import struct
+from typing import List, Optional
+
+# Ogg页校验使用的CRC32（多项式0x04C11DB7，不反转，初值0）
+_CRC_TABLE = []
+for _i in range(256):
+    _r = _i << 24
+    for _ in range(8):
+        _r = ((_r << 1) ^ 0x04C11DB7) if _r & 0x80000000 else (_r << 1)
+    _CRC_TABLE.append(_r & 0xFFFFFFFF)
+
+# TOC中config对应的单帧时长（48kHz采样点数）
+_SILK_SAMPLES = (480, 960, 1920, 2880)
+_HYBRID_SAMPLES = (480, 960)
+_CELT_SAMPLES = (120, 240, 480, 960)
+
+OPUS_PRE_SKIP = 312
+_MAX_PACKETS_PER_PAGE = 50
+_SERIAL_NO = 0x5A485858
+
+
+def _ogg_crc(data: bytes) -> int:
+    crc = 0
+    table = _CRC_TABLE
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ table[((crc >> 24) ^ byte) & 0xFF]
+    return crc
+
+
+def opus_packet_samples(packet: bytes) -> int:
+    """根据TOC字节计算opus数据包包含的采样点数（按48kHz计）"""
+    if not packet:
+        return 0
+    toc = packet[0]
+    config = toc >> 3
+    if config < 12:
+        frame_samples = _SILK_SAMPLES[config & 3]
+    elif config < 16:
+        frame_samples = _HYBRID_SAMPLES[config & 1]
+    else:
+        frame_samples = _CELT_SAMPLES[config & 3]
+    code = toc & 3
+    if code == 0:
+        frames = 1
+    elif code in (1, 2):
+        frames = 2
+    else:
+        frames = packet[1] & 0x3F if len(packet) > 1 else 0
+    return frame_samples * frames
+
+
+def _build_page(
+    packets: List[bytes], granule: int, seq: int, header_type: int
+) -> bytes:
+    lacing = bytearray()
+    for packet in packets:
+        size = len(packet)
+        lacing.extend(b"\xff" * (size // 255))
+        lacing.append(size % 255)
+    header = struct.pack(
+        "<4sBBqIIIB",
+        b"OggS",
+        0,
+        header_type,
+        granule,
+        _SERIAL_NO,
+        seq,
+        0,
+        len(lacing),
+    )
+    page = bytearray(header)
+    page.extend(lacing)
+    for packet in packets:
+        page.extend(packet)
+    struct.pack_into("<I", page, 22, _ogg_crc(page))
+    return bytes(page)
+
+
+def opus_packets_to_ogg(
+    packets: List[bytes], sample_rate: int = 16000, channels: int = 1
+) -> bytes:
+    """将opus数据包封装为Ogg/Opus文件"""
+    opus_head = struct.pack(
+        "<8sBBHIhB",
+        b"OpusHead",
+        1,
+        channels,
+        OPUS_PRE_SKIP,
+        sample_rate,
+        0,
+        0,
+    )
+    vendor = b"xiaozhi-esp32-server"
+    opus_tags = struct.pack("<8sI", b"OpusTags", len(vendor)) + vendor + b"\x00" * 4
+
+    pages = [
+        _build_page([opus_head], 0, 0, 0x02),
+        _build_page([opus_tags], 0, 1, 0x00),
+    ]
+    packets = [packet for packet in packets if packet]
+    seq = 2
+    granule = 0
+    page_packets = []
+    page_segments = 0
+    for packet in packets:
+        segments = len(packet) // 255 + 1
+        if page_packets and (
+            page_segments + segments > 255
+            or len(page_packets) >= _MAX_PACKETS_PER_PAGE
+        ):
+            pages.append(_build_page(page_packets, granule, seq, 0x00))
+            seq += 1
+            page_packets = []
+            page_segments = 0
+        page_packets.append(packet)
+        page_segments += segments
+        granule += opus_packet_samples(packet)
+    # 最后一页必须带EOS标记，即使没有音频数据
+    pages.append(_build_page(page_packets, granule, seq, 0x04))
+    return b"".join(pages)
+
+
+class OggOpusDemuxer:
+    """
+    增量解析Ogg/Opus，数据可以分块送入，返回其中完整的opus数据包
+    跳过OpusHead、OpusTags头部包，跨页的数据包会拼接完整后再返回
+    按RFC 7845丢弃pre_skip和结束页granule之外的采样点：数据包原样下发无法截取包内的一部分，
+    只丢弃完全落在跳过范围内的数据包，不足一个包的部分（通常为312个采样点，约6.5ms的编码器预热）仍会播放
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._packet = bytearray()
+        self._tags_seen = False
+        # OpusHead中的声道数、原始采样率、pre_skip，解析到之前为None
+        self.channels = None
+        self.sample_rate = None
+        self.pre_skip = None
+        # 还需要跳过的pre_skip采样点数，以及已解析出的音频采样点总数（48kHz）
+        self._skip_left = 0
+        self._samples = 0
+
+    @property
+    def head_parsed(self) -> bool:
+        return self.channels is not None
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """送入一块数据，返回已经完整的opus数据包；不是Ogg/Opus数据时抛出ValueError"""
+        buffer = self._buffer
+        buffer.extend(data)
+        packets = []
+        while len(buffer) >= 27:
+            if buffer[:4] != b"OggS":
+                raise ValueError("不是Ogg数据")
+            segment_count = buffer[26]
+            header_size = 27 + segment_count
+            if len(buffer) < header_size:
+                break
+            lacing = buffer[27:header_size]
+            page_size = header_size + sum(lacing)
+            if len(buffer) < page_size:
+                break
+            header_type = buffer[5]
+            granule = struct.unpack_from("<q", buffer, 6)[0]
+            if not header_type & 0x01:
+                # 不是续页，丢弃上一页没有结束的残缺数据包
+                self._packet.clear()
+            page_start = len(packets)
+            offset = header_size
+            for size in lacing:
+                self._packet.extend(buffer[offset : offset + size])
+                offset += size
+                if size < 255:
+                    self._on_packet(bytes(self._packet), packets)
+                    self._packet.clear()
+            del buffer[:page_size]
+            if header_type & 0x04 and granule >= 0:
+                self._trim_end(packets, page_start, granule)
+        return packets
+
+    def _trim_end(self, packets: List[bytes], page_start: int, granule: int) -> None:
+        """结束页的granule之后是编码补齐的采样点，丢弃完全落在其中的数据包"""
+        excess = self._samples - granule
+        while len(packets) > page_start:
+            samples = opus_packet_samples(packets[-1])
+            if samples > excess:
+                break
+            packets.pop()
+            excess -= samples
+
+    def _on_packet(self, packet: bytes, packets: List[bytes]) -> None:
+        if not self.head_parsed:
+            if not packet.startswith(b"OpusHead") or len(packet) < 19:
+                raise ValueError("Ogg中不是opus音频")
+            _, _, self.channels, self.pre_skip, self.sample_rate = struct.unpack_from(
+                "<8sBBHI", packet
+            )
+            self._skip_left = self.pre_skip
+            return
+        if not self._tags_seen and packet.startswith(b"OpusTags"):
+            self._tags_seen = True
+            return
+        if not packet:
+            return
+        samples = opus_packet_samples(packet)
+        self._samples += samples
+        if samples <= self._skip_left:
+            # 整个数据包都在pre_skip范围内
+            self._skip_left -= samples
+            return
+        self._skip_left = 0
+        packets.append(packet)
+
+
+def opus_packet_matches(packet: bytes, frame_duration: int) -> bool:
+    """opus数据包是否为单声道且时长等于frame_duration毫秒"""
+    # TOC第3位为立体声标记
+    return (
+        bool(packet)
+        and not packet[0] & 0x04
+        and opus_packet_samples(packet) == frame_duration * 48
+    )
+
+
+def opus_stream_matches(
+    demuxer: OggOpusDemuxer, packets: List[bytes], sample_rate: int, frame_duration: int
+) -> bool:
+    """Ogg/Opus的参数与设备协商的一致时可以原样下发；原始采样率为0表示未声明"""
+    return (
+        demuxer.channels == 1
+        and demuxer.sample_rate in (0, sample_rate)
+        and all(opus_packet_matches(packet, frame_duration) for packet in packets)
+    )
+
+
+def ogg_opus_passthrough(
+    data: bytes, sample_rate: int = 16000, frame_duration: int = 60
+) -> Optional[List[bytes]]:
+    """
+    从完整的Ogg/Opus数据中取出可以直接下发给设备的opus帧
+    不是Ogg/Opus或参数与设备不一致（需要重新编码）时返回None
+    """
+    if not data.startswith(b"OggS"):
+        return None
+    demuxer = OggOpusDemuxer()
+    try:
+        packets = demuxer.feed(data)
+    except ValueError:
+        return None
+    if not packets or not opus_stream_matches(demuxer, packets, sample_rate, frame_duration):
+        return None
+    return packets
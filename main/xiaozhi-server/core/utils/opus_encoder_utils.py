@@ -4,14 +4,76 @@ Opus编码工具类
 """
 
 import logging
+import threading
 import traceback
+from contextlib import contextmanager
 
 import numpy as np
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from opuslib_next import Encoder
 from opuslib_next import constants
 
 
+def split_pcm_frames(pcm_data: bytes, frame_size: int, channels: int = 1) -> np.ndarray:
+    """
+    将16位PCM切分为等长帧，最后一帧不足时补零
+    返回形状为(帧数, frame_size * channels)的int16矩阵，每行是一帧
+    """
+    samples = np.frombuffer(pcm_data, dtype=np.int16, count=len(pcm_data) // 2)
+    total_frame_size = frame_size * channels
+    tail = len(samples) % total_frame_size
+    if tail:
+        samples = np.concatenate(
+            [samples, np.zeros(total_frame_size - tail, dtype=np.int16)]
+        )
+    return samples.reshape(-1, total_frame_size)
+
+
+class OpusEncoderPool:
+    """
+    Opus编码器池，按(采样率, 通道数, 应用类型)复用编码器
+    归还时重置编码状态，避免每次编码都重新创建编码器
+    """
+
+    def __init__(self, max_idle: int = 16):
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._idle: Dict[Tuple[int, int, int], List[Encoder]] = {}
+
+    def acquire(self, sample_rate: int, channels: int, application: int) -> Encoder:
+        key = (sample_rate, channels, application)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+        return Encoder(sample_rate, channels, application)
+
+    def release(self, encoder: Encoder, sample_rate: int, channels: int, application: int):
+        try:
+            encoder.reset_state()
+        except Exception as e:
+            logging.warning(f"重置Opus编码器失败，丢弃该编码器: {e}")
+            return
+        key = (sample_rate, channels, application)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(encoder)
+
+    @contextmanager
+    def encoder(self, sample_rate: int, channels: int, application: int):
+        """借用一个编码器，用完自动归还"""
+        encoder = self.acquire(sample_rate, channels, application)
+        try:
+            yield encoder
+        finally:
+            self.release(encoder, sample_rate, channels, application)
+
+
+# 全局Opus编码器池
+opus_encoder_pool = OpusEncoderPool()
+
+
 class OpusEncoderUtils:
     """PCM到Opus的编码器"""
 
@@ -36,8 +98,9 @@ class OpusEncoderUtils:
         self.bitrate = 24000  # bps
         self.complexity = 10  # 最高质量
 
-        # 缓冲区初始化为空
-        self.buffer = np.array([], dtype=np.int16)
+        # 固定大小的缓冲区，只保存不足一帧的剩余样本
+        self.buffer = np.zeros(self.total_frame_size, dtype=np.int16)
+        self.buffered = 0
 
         try:
             # 创建Opus编码器
@@ -54,7 +117,7 @@ class OpusEncoderUtils:
     def reset_state(self):
         """重置编码器状态"""
         self.encoder.reset_state()
-        self.buffer = np.array([], dtype=np.int16)
+        self.buffered = 0
 
     def encode_pcm_to_opus(self, pcm_data: bytes, end_of_stream: bool) -> List[bytes]:
         """
@@ -70,36 +133,47 @@ class OpusEncoderUtils:
         # 将字节数据转换为short数组
         new_samples = self._convert_bytes_to_shorts(pcm_data)
 
-        # 校验PCM数据
-        self._validate_pcm_data(new_samples)
-
-        # 将新数据追加到缓冲区
-        self.buffer = np.append(self.buffer, new_samples)
-
         opus_packets = []
         offset = 0
 
-        # 处理所有完整帧
-        while offset <= len(self.buffer) - self.total_frame_size:
-            frame = self.buffer[offset : offset + self.total_frame_size]
-            output = self._encode(frame)
-            if output:
-                opus_packets.append(output)
-            offset += self.total_frame_size
+        # 先用新数据补满缓冲区中上次剩下的半帧
+        if self.buffered:
+            take = min(self.total_frame_size - self.buffered, len(new_samples))
+            self.buffer[self.buffered : self.buffered + take] = new_samples[:take]
+            self.buffered += take
+            offset = take
+            if self.buffered == self.total_frame_size:
+                output = self._encode(self.buffer)
+                if output:
+                    opus_packets.append(output)
+                self.buffered = 0
+
+        # 剩余数据中的完整帧直接按帧切分编码，不经过缓冲区
+        full = (len(new_samples) - offset) // self.total_frame_size
+        if full:
+            frames = new_samples[
+                offset : offset + full * self.total_frame_size
+            ].reshape(full, self.total_frame_size)
+            for frame in frames:
+                output = self._encode(frame)
+                if output:
+                    opus_packets.append(output)
+            offset += full * self.total_frame_size
 
         # 保留未处理的样本
-        self.buffer = self.buffer[offset:]
+        rest = len(new_samples) - offset
+        if rest:
+            self.buffer[:rest] = new_samples[offset:]
+            self.buffered = rest
 
         # 流结束时处理剩余数据
-        if end_of_stream and len(self.buffer) > 0:
-            # 创建最后一帧并用0填充
-            last_frame = np.zeros(self.total_frame_size, dtype=np.int16)
-            last_frame[: len(self.buffer)] = self.buffer
-
-            output = self._encode(last_frame)
+        if end_of_stream and self.buffered > 0:
+            # 最后一帧用0填充
+            self.buffer[self.buffered :] = 0
+            output = self._encode(self.buffer)
             if output:
                 opus_packets.append(output)
-            self.buffer = np.array([], dtype=np.int16)
+            self.buffered = 0
 
         return opus_packets
 
@@ -121,15 +195,6 @@ class OpusEncoderUtils:
         # 假设输入是小端字节序的16位PCM
         return np.frombuffer(bytes_data, dtype=np.int16)
 
-    def _validate_pcm_data(self, pcm_shorts: np.ndarray) -> None:
-        """验证PCM数据是否有效"""
-        # 16位PCM数据范围是 -32768 到 32767
-        if np.any((pcm_shorts < -32768) | (pcm_shorts > 32767)):
-            invalid_samples = pcm_shorts[(pcm_shorts < -32768) | (pcm_shorts > 32767)]
-            logging.warning(f"发现无效PCM样本: {invalid_samples[:5]}...")
-            # 在实际应用中可以选择裁剪而不是抛出异常
-            # np.clip(pcm_shorts, -32768, 32767, out=pcm_shorts)
-
     def close(self):
         """关闭编码器并释放资源"""
         # opuslib没有明确的关闭方法，Python的垃圾回收会处理
@@ -0,0 +1,191 @@
+"""
+设备连接的发送背压
+每次写入后按TCP发送缓冲（transport的写缓冲）中积压的字节数判断客户端是否跟得上：
+- 积压超过高水位时暂停上游的TTS合成与投递，降到低水位以下再恢复，避免服务端内存和播放延迟不断增长
+- 暂停期间定时检查积压，不依赖新的写入
+- 持续暂停超过max_slow_seconds时按策略处理：wait继续等待，drop丢弃本轮回复尚未发送的音频，disconnect断开连接
+- 记录慢客户端日志和全局统计
+"""
+
+import asyncio
+import threading
+from config.logger import setup_logging
+from core.handle.abortHandle import handleAbortMessage
+
+TAG = __name__
+logger = setup_logging()
+
+DEFAULT_SETTINGS = {
+    "high_water_kb": 8,
+    "low_water_kb": 2,
+    "max_slow_seconds": 15,
+    "policy": "drop",
+}
+POLICIES = ("wait", "drop", "disconnect")
+# 暂停期间检查积压的间隔（秒）
+POLL_INTERVAL = 0.05
+# 每发生多少次慢客户端事件输出一次全局统计
+STATS_LOG_EVERY = 10
+
+
+class SlowClientMetrics:
+    """所有连接共享的慢客户端统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {
+            "slow_events": 0,
+            "paused_ms": 0,
+            "dropped_replies": 0,
+            "disconnects": 0,
+            "max_backlog_bytes": 0,
+        }
+
+    def add(self, key: str, value: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += int(value)
+            events = self._stats["slow_events"]
+        if key == "slow_events" and events % STATS_LOG_EVERY == 0:
+            logger.bind(tag=TAG).info(f"慢客户端统计: {self.stats()}")
+
+    def backlog(self, size: int) -> None:
+        with self._lock:
+            if size > self._stats["max_backlog_bytes"]:
+                self._stats["max_backlog_bytes"] = size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+slow_client_metrics = SlowClientMetrics()
+
+
+class SendBackpressure:
+    """每个连接一个，在事件循环中记录写缓冲积压，TTS线程据此暂停"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._writable = threading.Event()
+        self._writable.set()
+        self._poll_handle = None
+        self._paused_at = None
+        self._deadline = None
+        self.backlog_bytes = 0
+        self.max_backlog_bytes = 0
+        self.slow_events = 0
+        self.configure(None)
+
+    def configure(self, config) -> None:
+        """根据配置文件中的send_backpressure节初始化"""
+        settings = dict(DEFAULT_SETTINGS)
+        settings.update(config or {})
+        self.high_water = int(float(settings["high_water_kb"]) * 1024)
+        self.low_water = min(int(float(settings["low_water_kb"]) * 1024), self.high_water)
+        self.max_slow_seconds = float(settings["max_slow_seconds"])
+        self.policy = str(settings["policy"]).lower()
+        if self.policy not in POLICIES:
+            logger.bind(tag=TAG).warning(f"未知的慢客户端处理策略: {self.policy}，使用wait")
+            self.policy = "wait"
+
+    @property
+    def paused(self) -> bool:
+        return not self._writable.is_set()
+
+    def _transport(self):
+        return getattr(getattr(self.conn, "websocket", None), "transport", None)
+
+    def on_write(self) -> None:
+        """每次写入后在事件循环中调用"""
+        transport = self._transport()
+        if transport is None or self.high_water <= 0:
+            return
+        size = transport.get_write_buffer_size()
+        self.backlog_bytes = size
+        if size > self.max_backlog_bytes:
+            self.max_backlog_bytes = size
+            slow_client_metrics.backlog(size)
+        if self.paused:
+            if size <= self.low_water or transport.is_closing():
+                self._resume()
+            else:
+                self._check_deadline()
+        elif size > self.high_water:
+            self._pause(size)
+
+    def _pause(self, size: int) -> None:
+        self._writable.clear()
+        self._paused_at = asyncio.get_running_loop().time()
+        self._deadline = self._paused_at + self.max_slow_seconds
+        self.slow_events += 1
+        slow_client_metrics.add("slow_events")
+        logger.bind(tag=TAG).warning(
+            f"客户端接收过慢，发送积压{size}字节，暂停TTS: {self.conn.session_id}"
+        )
+        self._schedule_poll()
+
+    def _resume(self) -> None:
+        loop = asyncio.get_running_loop()
+        paused_ms = (loop.time() - self._paused_at) * 1000
+        self._paused_at = None
+        self._writable.set()
+        if self._poll_handle is not None:
+            self._poll_handle.cancel()
+            self._poll_handle = None
+        slow_client_metrics.add("paused_ms", paused_ms)
+        logger.bind(tag=TAG).info(
+            f"发送积压已消化，恢复TTS，暂停{paused_ms:.0f}ms: {self.conn.session_id}"
+        )
+
+    def _schedule_poll(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._poll_handle = loop.call_later(POLL_INTERVAL, self._poll)
+
+    def _poll(self) -> None:
+        self._poll_handle = None
+        if not self.paused:
+            return
+        self.on_write()
+        if self.paused:
+            self._schedule_poll()
+
+    def _check_deadline(self) -> None:
+        now = asyncio.get_running_loop().time()
+        if self.policy == "wait" or now < self._deadline:
+            return
+        # 仍然没有恢复时，每隔max_slow_seconds再处理一次
+        self._deadline = now + self.max_slow_seconds
+        elapsed = now - self._paused_at
+        conn = self.conn
+        if self.policy == "drop":
+            slow_client_metrics.add("dropped_replies")
+            logger.bind(tag=TAG).warning(
+                f"客户端持续{elapsed:.0f}秒接收过慢，丢弃本轮回复未发送的音频: {conn.session_id}"
+            )
+            # 按设备打断处理：丢弃尚未发送的句子，并发送tts stop让设备回到聆听状态
+            asyncio.get_running_loop().create_task(handleAbortMessage(conn))
+        else:
+            slow_client_metrics.add("disconnects")
+            logger.bind(tag=TAG).warning(
+                f"客户端持续{elapsed:.0f}秒接收过慢，断开连接: {conn.session_id}"
+            )
+            # 不再等待TTS线程，直接断开
+            self._writable.set()
+            transport = self._transport()
+            if transport is not None:
+                transport.abort()
+
+    def wait_writable(self) -> bool:
+        """TTS线程调用，发送积压时阻塞，连接关闭或被打断时返回False"""
+        while not self._writable.wait(timeout=0.5):
+            if self.conn.stop_event.is_set() or self.conn.client_abort:
+                return False
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "paused": self.paused,
+            "backlog_bytes": self.backlog_bytes,
+            "max_backlog_bytes": self.max_backlog_bytes,
+            "slow_events": self.slow_events,
+        }
@@ -0,0 +1,171 @@
+"""
+流式分句器
+LLM逐token输出时，每个字符只处理一次，总开销与回复长度成线性关系：
+- 第一句遇到逗号等短停顿就切分，尽快开始合成；之后只在句末标点处切分
+- 括号（中英文）和 *...* 中的语气、动作描述不朗读，未闭合时其中的标点不切分
+- 数字中的分隔符（如 1,000、3~5、10:30）不切分
+- 只剩引号、标点或表情的片段直接丢弃
+送入的文本先经过StreamingTextNormalizer去掉思考过程和Markdown标记，
+同时记录引号的配对情况，切分出的句子同时带有送TTS的文本和下发设备显示的文本。
+"""
+
+from typing import List, Optional
+from core.utils.textUtils import get_string_no_punctuation_or_emoji
+from core.utils.text_normalizer import NormalizedText, StreamingTextNormalizer
+
+_OPEN_BRACKETS = ("(", "（")
+_CLOSE_BRACKETS = (")", "）")
+_ACTION_MARK = "*"
+# 前一个字符是数字时，需要看下一个字符才能确定是否切分
+_NUMBER_SEPARATORS = (",", "~", "～", ":", "：")
+_QUOTES = "“”‘’'\""
+# 显示文本只保留成对的中文引号，英文双引号和不成对的引号不显示
+_QUOTE_PAIRS = {"“": "”", "‘": "’"}
+_CLOSE_QUOTES = frozenset(_QUOTE_PAIRS.values())
+_HIDDEN_QUOTE = '"'
+
+
+def _clean_segment(raw: str) -> Optional[str]:
+    segment = get_string_no_punctuation_or_emoji(raw)
+    # 只剩引号时不送TTS，否则部分TTS会报错
+    if not segment.strip(_QUOTES).strip():
+        return None
+    return segment
+
+
+class SentenceSegmenter:
+    def __init__(self, first_punctuations, punctuations):
+        """
+        :param first_punctuations: 第一句使用的切分标点，包含逗号等短停顿
+        :param punctuations: 之后使用的切分标点
+        """
+        self.first_punctuations = frozenset(first_punctuations)
+        self.punctuations = frozenset(punctuations)
+        self.normalizer = StreamingTextNormalizer(self._push)
+        self.reset()
+
+    def reset(self):
+        """开始新的一轮回复"""
+        self.normalizer.reset()
+        self.is_first_sentence = True
+        self._speech = []  # 尚未切分的可朗读字符
+        self._quotes = []  # _speech中尚未配对的左引号位置
+        self._pairs = []  # _speech中已配对的引号位置
+        self._hidden = set()  # _speech中不显示的引号位置
+        self._cut = 0  # _speech中已确认的切分位置
+        self._openers = []  # 未闭合的括号和*
+        self._held = []  # 括号或*...*中的字符，闭合后丢弃
+        self._pending_number = False
+        self._segments = []
+
+    def _emit(self, end: int) -> Optional[NormalizedText]:
+        speech = self._speech[:end]
+        del self._speech[:end]
+        self._cut = 0
+        # 这一句中没有配对的左引号不显示，之后的右引号也就不再配对
+        hidden = self._hidden.union(i for i in self._quotes if i < end)
+        pairs = [pair for pair in self._pairs if pair[1] < end]
+        self._quotes = [i - end for i in self._quotes if i >= end]
+        self._pairs = [(i - end, j - end) for i, j in self._pairs if i >= end]
+        self._hidden = {i - end for i in hidden if i >= end}
+
+        raw = "".join(speech)
+        segment = _clean_segment(raw)
+        if segment is None or not (hidden or pairs):
+            return None if segment is None else NormalizedText(segment)
+        start = raw.find(segment)
+        stop = start + len(segment)
+        for i, j in pairs:
+            # 一侧引号在句子首尾被去掉时，另一侧也不显示
+            if i < start or j >= stop:
+                hidden.update((i, j))
+        display = "".join(
+            speech[i] for i in range(start, stop) if i not in hidden
+        )
+        return NormalizedText(segment, display)
+
+    def _track_quote(self, char: str):
+        index = len(self._speech) - 1
+        if char in _QUOTE_PAIRS:
+            self._quotes.append(index)
+        elif char in _CLOSE_QUOTES:
+            if self._quotes and _QUOTE_PAIRS[self._speech[self._quotes[-1]]] == char:
+                self._pairs.append((self._quotes.pop(), index))
+            else:
+                self._hidden.add(index)
+        elif char == _HIDDEN_QUOTE:
+            self._hidden.add(index)
+
+    def _confirm_cut(self):
+        if self.is_first_sentence:
+            # 第一句单独成段，不与后面的句子合并
+            segment = self._emit(len(self._speech))
+            if segment:
+                self._segments.append(segment)
+            self.is_first_sentence = False
+        else:
+            self._cut = len(self._speech)
+
+    def _push(self, char: str):
+        if self._openers:
+            top = self._openers[-1]
+            if top == _ACTION_MARK:
+                if char == _ACTION_MARK:
+                    self._openers.pop()
+            elif char in _OPEN_BRACKETS:
+                self._openers.append(char)
+            elif char in _CLOSE_BRACKETS:
+                self._openers.pop()
+            if self._openers:
+                self._held.append(char)
+            else:
+                self._held.clear()
+            return
+
+        if self._pending_number:
+            self._pending_number = False
+            if not char.isdigit():
+                self._confirm_cut()
+
+        if char in _OPEN_BRACKETS or char == _ACTION_MARK:
+            self._openers.append(char)
+            self._held.append(char)
+            return
+        if char in _CLOSE_BRACKETS:
+            # 没有对应左括号的右括号直接忽略
+            return
+
+        self._speech.append(char)
+        if char in _QUOTES:
+            self._track_quote(char)
+        boundaries = (
+            self.first_punctuations if self.is_first_sentence else self.punctuations
+        )
+        if char in boundaries:
+            if (
+                char in _NUMBER_SEPARATORS
+                and len(self._speech) > 1
+                and self._speech[-2].isdigit()
+            ):
+                self._pending_number = True
+            else:
+                self._confirm_cut()
+
+    def feed(self, text: str) -> List[NormalizedText]:
+        """送入新到达的文本，返回已经完整的句子，同一次送入的多句合并为一段"""
+        self.normalizer.feed(text)
+        if self._cut:
+            segment = self._emit(self._cut)
+            if segment:
+                self._segments.append(segment)
+        segments, self._segments = self._segments, []
+        return segments
+
+    def flush(self) -> Optional[NormalizedText]:
+        """回复结束，返回剩余的文本；未闭合的括号中的内容也一并朗读"""
+        self.normalizer.flush()
+        if self._openers:
+            self._speech.extend(self._held[1:])
+        segment = self._emit(len(self._speech))
+        self.reset()
+        return segment
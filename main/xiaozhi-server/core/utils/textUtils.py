@@ -1,4 +1,4 @@
-import json
+import re
 
 TAG = __name__
 EMOJI_MAP = {
@@ -24,26 +24,35 @@ EMOJI_MAP = {
     "😘": "kissy",
     "😏": "confident",
 }
+# 一次扫描找出文本中第一个EMOJI_MAP中的表情
+_EMOJI_MAP_PATTERN = re.compile("[" + "".join(map(re.escape, EMOJI_MAP)) + "]")
 
 
-def get_string_no_punctuation_or_emoji(s):
-    """去除字符串首尾的空格、标点符号和表情符号"""
-    chars = list(s)
-    # 处理开头的字符
-    start = 0
-    while start < len(chars) and is_punctuation_or_emoji(chars[start]):
-        start += 1
-    # 处理结尾的字符
-    end = len(chars) - 1
-    while end >= start and is_punctuation_or_emoji(chars[end]):
-        end -= 1
-    return "".join(chars[start : end + 1])
+# 表情符号所在的码位区间
+EMOJI_RANGES = (
+    (0x1F600, 0x1F64F),
+    (0x1F300, 0x1F5FF),
+    (0x1F680, 0x1F6FF),
+    (0x1F900, 0x1F9FF),
+    (0x1FA70, 0x1FAFF),
+    (0x2600, 0x26FF),
+    (0x2700, 0x27BF),
+)
+# 所有空白字符都在U+3000及以内
+_WHITESPACE_CHARS = "".join(chr(c) for c in range(0x3001) if chr(c).isspace())
+_EMOJI_CHARS = "".join(
+    chr(c) for start, end in EMOJI_RANGES for c in range(start, end + 1)
+)
 
 
-def is_punctuation_or_emoji(char):
-    """检查字符是否为空格、指定标点或表情符号"""
-    # 定义需要去除的中英文标点（包括全角/半角）
-    punctuation_set = {
+def build_strip_chars(punctuation) -> str:
+    """预先算好需要去除的全部字符（空白、指定标点、表情符号），供str.strip使用"""
+    return _WHITESPACE_CHARS + "".join(punctuation) + _EMOJI_CHARS
+
+
+# 定义需要去除的中英文标点（包括全角/半角）
+_PUNCTUATION_SET = frozenset(
+    (
         "，",
         ",",  # 中文逗号 + 英文逗号
         "。",
@@ -62,42 +71,38 @@ def is_punctuation_or_emoji(char):
         "]",  # 方括号
         "【",
         "】",  # 中文方括号
-    }
-    if char.isspace() or char in punctuation_set:
-        return True
-    # 检查表情符号（保留原有逻辑）
-    code_point = ord(char)
-    emoji_ranges = [
-        (0x1F600, 0x1F64F),
-        (0x1F300, 0x1F5FF),
-        (0x1F680, 0x1F6FF),
-        (0x1F900, 0x1F9FF),
-        (0x1FA70, 0x1FAFF),
-        (0x2600, 0x26FF),
-        (0x2700, 0x27BF),
-    ]
-    return any(start <= code_point <= end for start, end in emoji_ranges)
+    )
+)
+_STRIP_CHARS = build_strip_chars(_PUNCTUATION_SET)
+_STRIP_SET = frozenset(_STRIP_CHARS)
+
+
+def get_string_no_punctuation_or_emoji(s):
+    """去除字符串首尾的空格、标点符号和表情符号"""
+    return s.strip(_STRIP_CHARS)
+
+
+def is_punctuation_or_emoji(char):
+    """检查字符是否为空格、指定标点或表情符号"""
+    return char in _STRIP_SET
 
 
 async def get_emotion(conn, text):
     """获取文本内的情绪消息"""
     emoji = "🙂"
     emotion = "happy"
-    for char in text:
-        if char in EMOJI_MAP:
-            emoji = char
-            emotion = EMOJI_MAP[char]
-            break
+    match = _EMOJI_MAP_PATTERN.search(text)
+    if match:
+        emoji = match.group()
+        emotion = EMOJI_MAP[emoji]
     try:
-        await conn.websocket.send(
-            json.dumps(
-                {
-                    "type": "llm",
-                    "text": emoji,
-                    "emotion": emotion,
-                    "session_id": conn.session_id,
-                }
-            )
+        await conn.message_batcher.send_message(
+            {
+                "type": "llm",
+                "text": emoji,
+                "emotion": emotion,
+                "session_id": conn.session_id,
+            }
         )
     except Exception as e:
         conn.logger.bind(tag=TAG).warning(f"发送情绪表情失败，错误:{e}")
@@ -0,0 +1,213 @@
+"""
+LLM输出的流式文本归一化
+逐token送入，每个字符只处理一次，边接收边输出可以朗读的字符（交给分句器）：
+- <think>...</think> 中的思考过程整段丢弃
+- 代码块 ```...``` 整段丢弃，行内代码、粗体的标记符号去掉、保留内容
+- 行首的标题#、引用>、列表符号去掉
+- 链接 [文字](地址) 只保留文字，图片 ![说明](地址) 整段丢弃
+- 表格每行的单元格用逗号连接、句号结尾，分隔行丢弃
+标记可能被拆在两个token中，不能确定时先暂存，等后续字符到达后再判断。
+"""
+
+from typing import Callable, Optional
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+CODE_FENCE = "```"
+# 链接文字超过这个长度或遇到换行时，按普通文本处理
+MAX_LINK_TEXT = 100
+
+_INLINE_MARKERS = (THINK_OPEN, THINK_CLOSE, CODE_FENCE, "`", "**", "__", "![", "[")
+_LINE_START_MARKERS = _INLINE_MARKERS + ("#", ">", "- ", "* ", "+ ", "|")
+_TABLE_MARKERS = (THINK_OPEN, THINK_CLOSE, "`", "**", "__", "|")
+_LINK_MARKERS = ("](", "]")
+_URL_MARKERS = (")",)
+_LINE_SPACES = (" ", "\t", "　")
+# 表格中只由这些字符组成的单元格属于分隔行
+_TABLE_RULE_CHARS = frozenset("-: ")
+
+
+def _by_length(markers):
+    # 同时匹配时优先最长的标记，如```优先于`
+    return tuple(sorted(markers, key=len, reverse=True))
+
+
+_INLINE_MARKERS = _by_length(_INLINE_MARKERS)
+_LINE_START_MARKERS = _by_length(_LINE_START_MARKERS)
+_TABLE_MARKERS = _by_length(_TABLE_MARKERS)
+_LINK_MARKERS = _by_length(_LINK_MARKERS)
+# 各状态下可能开始一个标记的字符，其余字符不需要暂存
+_MARKER_STARTS = {
+    markers: frozenset(marker[0] for marker in markers)
+    for markers in (
+        (THINK_CLOSE,),
+        (CODE_FENCE,),
+        _URL_MARKERS,
+        _LINK_MARKERS,
+        _TABLE_MARKERS,
+        _LINE_START_MARKERS,
+        _INLINE_MARKERS,
+    )
+}
+
+
+class NormalizedText(str):
+    """
+    分句器输出的句子：字符串本身是送TTS的文本，display是下发设备显示的文本
+    已经归一化过，后续不需要再做Markdown清理和显示文本清理
+    """
+
+    def __new__(cls, text: str, display: Optional[str] = None):
+        obj = super().__new__(cls, text)
+        obj.display = text if display is None else display
+        return obj
+
+
+class StreamingTextNormalizer:
+    """逐字符过滤思考过程和Markdown标记，可以朗读的字符通过emit回调输出"""
+
+    def __init__(self, emit: Callable[[str], None]):
+        self.emit = emit
+        self.reset()
+
+    def reset(self):
+        """开始新的一轮回复"""
+        self._pending = ""  # 可能是标记开头的字符
+        self._in_think = False
+        self._in_code = False
+        self._line_start = True
+        self._link = None  # 正在收集的链接文字
+        self._image = False
+        self._in_url = False
+        self._row = None  # 正在收集的表格行的单元格
+        self._cell = []
+
+    def _markers(self):
+        if self._in_think:
+            return (THINK_CLOSE,)
+        if self._in_code:
+            return (CODE_FENCE,)
+        if self._in_url:
+            return _URL_MARKERS
+        if self._link is not None:
+            return _LINK_MARKERS
+        if self._row is not None:
+            return _TABLE_MARKERS
+        return _LINE_START_MARKERS if self._line_start else _INLINE_MARKERS
+
+    def feed(self, text: str) -> None:
+        """送入新到达的文本"""
+        for char in text:
+            if self._pending or char in _MARKER_STARTS[self._markers()]:
+                self._pending += char
+                self._resolve()
+            else:
+                self._text(char)
+
+    def flush(self) -> None:
+        """回复结束，输出暂存的字符；未闭合的链接和表格行按已收到的内容输出"""
+        self._resolve(final=True)
+        if self._link is not None and not self._in_url:
+            self._abort_link()
+        if self._row is not None:
+            self._end_row()
+        self.reset()
+
+    def _resolve(self, final: bool = False) -> None:
+        while self._pending:
+            pending = self._pending
+            markers = self._markers()
+            if not final and any(
+                len(marker) > len(pending) and marker.startswith(pending)
+                for marker in markers
+            ):
+                # 还不能确定是不是标记，等待后续字符
+                return
+            for marker in markers:
+                if pending.startswith(marker):
+                    self._pending = pending[len(marker) :]
+                    self._marker(marker)
+                    break
+            else:
+                self._pending = pending[1:]
+                self._text(pending[0])
+
+    def _marker(self, marker: str) -> None:
+        if marker == THINK_OPEN:
+            self._in_think = True
+        elif marker == THINK_CLOSE:
+            # 只有结束标记时同样丢弃标记本身
+            self._in_think = False
+            self._line_start = True
+        elif marker == CODE_FENCE:
+            self._in_code = not self._in_code
+            self._line_start = True
+        elif marker in ("![", "["):
+            self._link = []
+            self._image = marker == "!["
+        elif marker == "](":
+            self._in_url = True
+        elif marker == "]":
+            self._abort_link("]")
+        elif marker == ")":
+            link, image = self._link, self._image
+            self._link = None
+            self._in_url = False
+            if not image:
+                self._plain("".join(link))
+        elif marker == "|":
+            if self._row is None:
+                self._row = []
+                self._line_start = False
+            else:
+                self._end_cell()
+        # 其余标记（`、**、__、行首的#、>、列表符号）直接丢弃
+
+    def _text(self, char: str) -> None:
+        if self._in_think or self._in_code or self._in_url:
+            return
+        if self._link is not None:
+            if char == "\n" or len(self._link) >= MAX_LINK_TEXT:
+                self._abort_link()
+                self._text(char)
+            else:
+                self._link.append(char)
+            return
+        if self._row is not None:
+            if char == "\n":
+                self._end_row()
+                self._line_start = True
+            else:
+                self._cell.append(char)
+            return
+        if char == "\n":
+            self._line_start = True
+            self.emit(char)
+        elif self._line_start and char in _LINE_SPACES:
+            return
+        else:
+            self._line_start = False
+            self.emit(char)
+
+    def _plain(self, text: str) -> None:
+        for char in text:
+            self._line_start = False
+            self.emit(char)
+
+    def _abort_link(self, suffix: str = "") -> None:
+        """不是链接，把收集到的文字原样输出"""
+        link, image = self._link, self._image
+        self._link = None
+        self._plain(("![" if image else "[") + "".join(link) + suffix)
+
+    def _end_cell(self) -> None:
+        cell = "".join(self._cell).strip()
+        self._cell = []
+        if cell and not _TABLE_RULE_CHARS.issuperset(cell):
+            self._row.append(cell)
+
+    def _end_row(self) -> None:
+        self._end_cell()
+        row, self._row = self._row, None
+        if row:
+            self._plain("，".join(row) + "。")
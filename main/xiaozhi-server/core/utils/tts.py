@@ -2,6 +2,7 @@ import os
 import re
 import sys
 from config.logger import setup_logging
+from core.utils.text_normalizer import NormalizedText
 import importlib
 
 logger = setup_logging()
@@ -106,7 +107,10 @@ class MarkdownCleaner:
     def clean_markdown(text: str) -> str:
         """
         主入口方法：依序执行所有正则，移除或替换 Markdown 元素
+        分句器输出的句子在流式归一化时已经去掉了 Markdown 标记，直接返回
         """
+        if isinstance(text, NormalizedText):
+            return text
         for regex, replacement in MarkdownCleaner.REGEXES:
             text = regex.sub(replacement, text)
         return text.strip()
\ No newline at end of file
@@ -4,6 +4,7 @@ from config.logger import setup_logging
 from core.connection import ConnectionHandler
 from config.config_loader import get_config_from_api
 from core.utils.modules_initialize import initialize_modules
+from core.utils.llm_registry import llm_registry
 from core.utils.util import check_vad_update, check_asr_update
 
 TAG = __name__
@@ -14,6 +15,7 @@ class WebSocketServer:
         self.config = config
         self.logger = setup_logging()
         self.config_lock = asyncio.Lock()
+        llm_registry.refresh(self.config)
         modules = initialize_modules(
             self.logger,
             self.config,
@@ -62,6 +64,8 @@ class WebSocketServer:
         finally:
             # 确保从活动连接集合中移除
             self.active_connections.discard(handler)
+            # 提前返回、没有执行close的连接也要释放共享LLM的引用
+            handler.release_shared_llms()
             # 强制关闭连接（如果还没有关闭的话）
             try:
                 # 安全地检查WebSocket状态并关闭
@@ -126,11 +130,14 @@ class WebSocketServer:
                 if "asr" in modules:
                     self._asr = modules["asr"]
                 if "llm" in modules:
+                    llm_registry.release(self._llm)
                     self._llm = modules["llm"]
                 if "intent" in modules:
                     self._intent = modules["intent"]
                 if "memory" in modules:
                     self._memory = modules["memory"]
+                # 回收新配置中已不再使用的共享LLM实例
+                llm_registry.refresh(new_config)
                 self.logger.bind(tag=TAG).info(f"更新配置任务执行完毕")
                 return True
         except Exception as e:
@@ -0,0 +1,118 @@
+"""
+Opus编码微基准
+对比旧实现（每次新建编码器、逐帧切片补零、np.append累积缓冲区）与当前实现
+（编码器池、numpy一次性分帧、固定缓冲区）每秒音频的编码耗时。
+用法：python performance_tester_opus.py [音频秒数] [重复次数]
+"""
+
+import sys
+import time
+
+import numpy as np
+import opuslib_next
+from tabulate import tabulate
+
+from core.utils.opus_encoder_utils import OpusEncoderUtils
+from core.utils.util import pcm_to_data
+
+SAMPLE_RATE = 16000
+FRAME_SIZE = 960
+
+
+def legacy_pcm_to_data(raw_data, is_opus=True):
+    """优化前的pcm_to_data"""
+    encoder = opuslib_next.Encoder(16000, 1, opuslib_next.APPLICATION_AUDIO)
+    datas = []
+    for i in range(0, len(raw_data), FRAME_SIZE * 2):
+        chunk = raw_data[i : i + FRAME_SIZE * 2]
+        if len(chunk) < FRAME_SIZE * 2:
+            chunk += b"\x00" * (FRAME_SIZE * 2 - len(chunk))
+        if is_opus:
+            np_frame = np.frombuffer(chunk, dtype=np.int16)
+            frame_data = encoder.encode(np_frame.tobytes(), FRAME_SIZE)
+        else:
+            frame_data = chunk if isinstance(chunk, bytes) else bytes(chunk)
+        datas.append(frame_data)
+    return datas
+
+
+class LegacyStreamEncoder(OpusEncoderUtils):
+    """优化前的OpusEncoderUtils：np.append累积缓冲区"""
+
+    def encode_pcm_to_opus(self, pcm_data, end_of_stream):
+        new_samples = np.frombuffer(pcm_data, dtype=np.int16)
+        self.legacy_buffer = np.append(
+            getattr(self, "legacy_buffer", np.array([], dtype=np.int16)), new_samples
+        )
+        packets = []
+        offset = 0
+        while offset <= len(self.legacy_buffer) - self.total_frame_size:
+            frame = self.legacy_buffer[offset : offset + self.total_frame_size]
+            packets.append(self._encode(frame))
+            offset += self.total_frame_size
+        self.legacy_buffer = self.legacy_buffer[offset:]
+        if end_of_stream and len(self.legacy_buffer) > 0:
+            last_frame = np.zeros(self.total_frame_size, dtype=np.int16)
+            last_frame[: len(self.legacy_buffer)] = self.legacy_buffer
+            packets.append(self._encode(last_frame))
+            self.legacy_buffer = np.array([], dtype=np.int16)
+        return packets
+
+
+def make_pcm(seconds):
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.05 * np.random.randn(len(t))
+    return (signal * 32767).astype("<i2").tobytes()
+
+
+def bench(func, pcm, seconds, repeat):
+    func(pcm)  # 预热
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(pcm)
+    elapsed = (time.perf_counter() - start) / repeat
+    return elapsed / seconds * 1000
+
+
+def stream_encode(encoder_cls, chunk_bytes):
+    def run(pcm):
+        encoder = encoder_cls(SAMPLE_RATE, 1, 60)
+        for i in range(0, len(pcm), chunk_bytes):
+            encoder.encode_pcm_to_opus(pcm[i : i + chunk_bytes], False)
+        encoder.encode_pcm_to_opus(b"", True)
+
+    return run
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    pcm = make_pcm(seconds)
+    # 流式TTS每次返回的PCM块大小不固定，这里取约100ms
+    chunk_bytes = 3202
+
+    cases = [
+        ("pcm_to_data 转opus", lambda d: legacy_pcm_to_data(d), lambda d: pcm_to_data(d)),
+        (
+            "pcm_to_data 仅分帧",
+            lambda d: legacy_pcm_to_data(d, False),
+            lambda d: pcm_to_data(d, False),
+        ),
+        (
+            "OpusEncoderUtils 流式编码",
+            stream_encode(LegacyStreamEncoder, chunk_bytes),
+            stream_encode(OpusEncoderUtils, chunk_bytes),
+        ),
+    ]
+    rows = []
+    for name, legacy, current in cases:
+        before = bench(legacy, pcm, seconds, repeat)
+        after = bench(current, pcm, seconds, repeat)
+        rows.append([name, f"{before:.3f}", f"{after:.3f}", f"{before / after:.2f}x"])
+
+    print(f"音频时长 {seconds}s，重复 {repeat} 次，单位：毫秒/每秒音频")
+    print(tabulate(rows, headers=["场景", "优化前", "优化后", "加速比"], tablefmt="github"))
+
+
+if __name__ == "__main__":
+    main()
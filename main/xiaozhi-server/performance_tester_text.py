@@ -0,0 +1,160 @@
+"""
+句子文本清理（sendAudioHandle.handle_text）的一致性校验与基准
+先用固定语料和随机生成的句子校验当前实现与旧实现输出完全一致，
+再对比不同句子长度下两者的耗时。
+用法：python performance_tester_text.py [随机句子数] [重复次数]
+"""
+
+import re
+import sys
+import time
+import random
+
+from tabulate import tabulate
+
+from core.handle.sendAudioHandle import clean_sentence_text
+
+# 固定语料：覆盖括号、成对/孤立引号、省略号、英文双引号、末尾换行等情况
+GOLDEN_CORPUS = [
+    "",
+    "你好",
+    "  你好呀  ",
+    "（笑）今天天气真好",
+    "今天（轻声）天气（叹气）真好（",
+    "他说“你好”然后走了",
+    "他说“你好然后走了",
+    "他说你好”然后走了",
+    "‘单引号’和“双引号”",
+    "“嵌套‘引号’的句子”",
+    "“错位‘引号”的句子’",
+    '英文"双引号"总是被删除',
+    "省略号…在中间",
+    "…",
+    "...",
+    "结尾的省略号…",
+    "结尾的省略号...",
+    "…开头的省略号",
+    "两个点..和一个点.",
+    "English (with brackets) text.",
+    "末尾换行…\n",
+    "末尾换行...\n",
+    "“引号里的(括号)和…省略号”",
+    "“”",
+    "（）",
+    "(半角括号)",
+]
+
+
+def legacy_handle_text(text):
+    """优化前的handle_text"""
+    if not text or len(text) == 0:
+        return text
+
+    text = re.sub(r"（[^）]*）|$[^)]*$", "", text)
+
+    stack = []
+    chars = list(text)
+    quote_pairs = {'"': '"', "“": "”", "‘": "’"}
+    quote_positions = {}
+
+    for i, ch in enumerate(chars):
+        if ch in quote_pairs:
+            stack.append((i, ch))
+        elif ch in quote_pairs.values():
+            if stack and quote_pairs.get(stack[-1][1]) == ch:
+                left_idx, left_quote = stack.pop()
+                quote_positions[left_idx] = i
+                quote_positions[i] = left_idx
+            else:
+                chars[i] = "\x00DELETE\x00"
+
+    for pos, _ in stack:
+        chars[pos] = "\x00DELETE\x00"
+
+    temp_text = "".join([c for c in chars if c != "\x00DELETE\x00"])
+
+    cleaned_parts = []
+    i = 0
+    while i < len(temp_text):
+        matched = False
+        in_quotes = any(start <= i <= end for start, end in quote_positions.items())
+        if not in_quotes:
+            symbol_match = re.match(r"[‘’\"()（）….]", temp_text[i:])
+            if symbol_match:
+                ellipsis_match = re.match(r"(…|\.\.\.|…)", temp_text[i:])
+                if ellipsis_match:
+                    ellipsis = ellipsis_match.group(0)
+                    start_pos = i
+                    end_pos = i + len(ellipsis)
+                    if 0 < start_pos or end_pos < len(temp_text):
+                        cleaned_parts.append(ellipsis)
+                        i += len(ellipsis)
+                        matched = True
+                    else:
+                        i += len(ellipsis)
+                        matched = True
+                else:
+                    i += 1
+                    matched = True
+
+        if not matched:
+            cleaned_parts.append(temp_text[i])
+            i += 1
+
+    return "".join(cleaned_parts).strip()
+
+
+_ALPHABET = list("好的今天天气ab ,，。\"“”‘’()（）….\n") + ["..."]
+
+
+def random_sentence(length):
+    return "".join(random.choice(_ALPHABET) for _ in range(length))
+
+
+def long_sentence(length):
+    """带成对引号、括号和省略号的长句子"""
+    unit = "他说“今天天气很好（笑）”，我们去公园吧…然后‘散步’。"
+    return (unit * (length // len(unit) + 1))[:length]
+
+
+def check(count):
+    mismatches = []
+    for text in GOLDEN_CORPUS + [random_sentence(random.randint(0, 40)) for _ in range(count)]:
+        expected = legacy_handle_text(text)
+        actual = clean_sentence_text(text)
+        if expected != actual:
+            mismatches.append((text, expected, actual))
+    return mismatches
+
+
+def bench(func, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(text)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    random.seed(0)
+
+    mismatches = check(count)
+    print(f"一致性校验：固定语料{len(GOLDEN_CORPUS)}条，随机句子{count}条，不一致{len(mismatches)}条")
+    for text, expected, actual in mismatches[:10]:
+        print(f"  输入{text!r} 旧{expected!r} 新{actual!r}")
+    if mismatches:
+        sys.exit(1)
+
+    rows = []
+    for length in (20, 100, 500, 2000):
+        text = long_sentence(length)
+        before = bench(legacy_handle_text, text, repeat)
+        after = bench(clean_sentence_text, text, repeat)
+        rows.append([length, f"{before:.3f}", f"{after:.3f}", f"{before / after:.1f}x"])
+    print(f"重复 {repeat} 次，单位：毫秒/句")
+    print(tabulate(rows, headers=["句子长度", "优化前", "优化后", "加速比"], tablefmt="github"))
+
+
+if __name__ == "__main__":
+    main()